@@ -0,0 +1,70 @@
+"""
+This module contains the interface for asynchronous calendar handlers.
+It mirrors CalendarHandler for use from async code, such as the API
+routes.
+"""
+
+from typing import Optional
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+
+class AsyncCalendarHandler(ABC):
+    """Interface for asynchronous calendar handlers"""
+
+    @abstractmethod
+    def __init__(self):
+        pass
+
+    @abstractmethod
+    async def add_event(
+        self,
+        title: str,
+        description: str,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        color_id: int,
+        calendar_id: Optional[str],
+        location: Optional[str] = None,
+    ):
+        """Adds an event to the calendar"""
+
+    @abstractmethod
+    async def get_event_by_id(
+        self, event_id: str, calendar_id: str, profile: str = "full"
+    ):
+        """Gets an event from the calendar by its ID"""
+
+    @abstractmethod
+    async def delete_event_by_id(self, event_id: str, calendar_id: str):
+        """Deletes an event from the calendar by its ID"""
+
+    @abstractmethod
+    async def update_event_by_id(
+        self,
+        event_id: str,
+        title: str,
+        description: str,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        location: Optional[str],
+        calendar_id: str,
+    ):
+        """Updates the details of an event in the calendar"""
+
+    @abstractmethod
+    async def update_event_color(
+        self,
+        event_id: str,
+        color_id: str,
+        calendar_id: str,
+    ):
+        """Updates the color of an event in the calendar"""
+
+    @abstractmethod
+    async def get_todays_events(self, calendar_id: str) -> list:
+        """Gets today's events from the calendar"""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Closes the handler's connections"""
@@ -0,0 +1,65 @@
+"""This module contains the abstract base class for asynchronous database
+handlers.
+"""
+
+from abc import ABC, abstractmethod
+
+
+class AsyncDbHandler(ABC):
+    """Abstract base class for asynchronous database handlers."""
+
+    @abstractmethod
+    async def add_collection(self, collection_name: str) -> bool:
+        """Create a new collection in the database."""
+
+    @abstractmethod
+    async def add_document(self, collection_name: str, document: dict) -> bool:
+        """Add a new document to the specified collection in the
+        database.
+        """
+
+    @abstractmethod
+    async def add_documents(
+        self, collection_name: str, documents: list[dict]
+    ) -> set[int]:
+        """Add many documents to the specified collection in the
+        database.
+        """
+
+    @abstractmethod
+    async def get_document(self, collection_name: str, query: dict):
+        """Get a document from the specified collection in the
+        database.
+        """
+
+    @abstractmethod
+    async def get_documents(self, collection_name: str, query: dict) -> list:
+        """Get the documents matching a query from the specified
+        collection in the database.
+        """
+
+    @abstractmethod
+    async def update_document(
+        self, collection_name: str, query: dict, new_values: dict
+    ) -> bool:
+        """Update a document in the specified collection in the
+        database.
+        """
+
+    @abstractmethod
+    async def delete_document(self, collection_name: str, query: dict) -> bool:
+        """Delete a document from the specified collection in the
+        database.
+        """
+
+    @abstractmethod
+    async def create_index(
+        self, collection_name: str, field_name: str
+    ) -> bool:
+        """Create an index on a field in the specified collection in
+        the database.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the connections to the database."""
@@ -0,0 +1,515 @@
+"""This module handles asynchronous requests to the Google Calendar API."""
+
+from asyncio import Lock, sleep, to_thread
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import quote
+from async_calendar_handler import AsyncCalendarHandler
+from etag_store import ETagStore
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_calendar_handler import (
+    CALENDAR_RATE_LIMIT,
+    EVENT_FIELDS,
+    MAX_RATE_LIMIT_RETRIES,
+    NOT_MODIFIED,
+    PRECONDITION_FAILED,
+    USER_AGENT,
+    load_credentials,
+)
+from httpx import (
+    AsyncClient,
+    HTTPError,
+    HTTPStatusError,
+    Limits,
+    Response,
+    Timeout,
+)
+from rate_limiter import RateLimiter, bucket_key
+
+CALENDAR_API_URL: str = "https://www.googleapis.com/calendar/v3"
+
+
+def is_rate_limited(response: Response) -> bool:
+    """Check whether a response says a quota was exceeded.
+
+    Args:
+        response (Response): The response.
+
+    Returns:
+        bool: True for 429 responses and 403 rate limit responses.
+    """
+
+    if response.status_code == 429:
+        return True
+    return (
+        response.status_code == 403 and b"ateLimitExceeded" in response.content
+    )
+
+
+class AsyncGoogleCalendarHandler(AsyncCalendarHandler):
+    """Handles requests to the Google Calendar API without blocking.
+
+    Requests go over a shared httpx connection pool, so one event loop
+    can keep many requests in flight. Reads and colour writes are
+    conditional on the stored ETag of the event, like those of the
+    synchronous handler, whose credentials and ETag store can be shared.
+
+    Args:
+        scopes (list): The scopes to request access to.
+        token_file_path (str): The path to the file to store the
+        token in.
+        service_account_file_path (str): The path to the service
+        account file.
+        max_connections (int): The most concurrent connections to the
+        API.
+        timeout (float): The request timeout in seconds.
+        rate_limiter (Optional[RateLimiter]): The rate limiter shared
+        with the other processes using the same credentials.
+        credentials (Optional[Credentials]): Credentials to share, loaded
+        from the token file if None.
+        etag_store (Optional[ETagStore]): The ETag store to share, a new
+        one if None.
+    """
+
+    def __init__(
+        self,
+        scopes: list,
+        token_file_path: str,
+        service_account_file_path: str,
+        max_connections: int = 100,
+        timeout: float = 30.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        credentials: Optional[Credentials] = None,
+        etag_store: Optional[ETagStore] = None,
+    ):
+        self._creds: Credentials = credentials or load_credentials(
+            scopes, token_file_path, service_account_file_path
+        )
+        self._etag_store: ETagStore = (
+            etag_store if etag_store is not None else ETagStore()
+        )
+        self._rate_limiter: Optional[RateLimiter] = rate_limiter
+        # The same key as the synchronous handler's, so both draw from
+        # one bucket per set of credentials.
+        self._quota_key: str = bucket_key(
+            self._creds.client_id or token_file_path
+        )
+        self._refresh_lock: Lock = Lock()
+        self._client: AsyncClient = AsyncClient(
+            base_url=CALENDAR_API_URL,
+            headers={"User-Agent": USER_AGENT},
+            limits=Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=Timeout(timeout),
+        )
+
+    async def _access_token(self) -> str:
+        """Get a valid access token, refreshing it if it has expired.
+
+        The refresh is a blocking call, so it runs in a worker thread,
+        and only one coroutine refreshes at a time.
+
+        Returns:
+            str: The access token.
+        """
+
+        if not self._creds.valid:
+            async with self._refresh_lock:
+                if not self._creds.valid:
+                    await to_thread(self._creds.refresh, Request())
+
+        return self._creds.token
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        json: Optional[dict] = None,
+        headers: Optional[dict] = None,
+    ) -> Response:
+        """Send an authorized request to the API.
+
+        The request first waits for the shared rate limit. If it is
+        rejected by a quota it is retried after backing off.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path relative to the API URL.
+            params (Optional[dict]): The query parameters.
+            json (Optional[dict]): The request body.
+            headers (Optional[dict]): Extra request headers.
+
+        Returns:
+            Response: The response.
+
+        Raises:
+            HTTPError: If the request fails or returns an error status.
+        """
+
+        attempt: int = 0
+
+        while True:
+            if self._rate_limiter:
+                await self._rate_limiter.acquire_async(
+                    CALENDAR_RATE_LIMIT, self._quota_key
+                )
+
+            response: Response = await self._client.request(
+                method,
+                path,
+                params={
+                    key: value
+                    for key, value in (params or {}).items()
+                    if value is not None
+                },
+                json=json,
+                headers={
+                    **(headers or {}),
+                    "Authorization": f"Bearer {await self._access_token()}",
+                },
+            )
+
+            if not is_rate_limited(response) or (
+                attempt >= MAX_RATE_LIMIT_RETRIES
+            ):
+                response.raise_for_status()
+                return response
+
+            await self._back_off(response, attempt)
+            attempt += 1
+
+    async def _back_off(self, response: Response, attempt: int) -> None:
+        """Back off after hitting a quota.
+
+        With a rate limiter the shared bucket is blocked, so every
+        process sharing the quota backs off together.
+
+        Args:
+            response (Response): The rate limit response.
+            attempt (int): The number of the failed attempt, from 0.
+        """
+
+        try:
+            delay: float = float(response.headers["retry-after"])
+        except (KeyError, ValueError):
+            delay = float(min(2**attempt, 30))
+
+        if self._rate_limiter:
+            await to_thread(
+                self._rate_limiter.block,
+                CALENDAR_RATE_LIMIT,
+                self._quota_key,
+                delay,
+            )
+        else:
+            await sleep(delay)
+
+    def _conditional(
+        self,
+        header: str,
+        calendar_id: str,
+        event_id: str,
+        profile: Optional[str] = None,
+    ) -> dict:
+        """Build the header making a request conditional on a stored ETag.
+
+        Args:
+            header (str): If-None-Match for reads, If-Match for writes.
+            calendar_id (str): The ID of the calendar.
+            event_id (str): The ID of the event.
+            profile (Optional[str]): Only use an ETag stored with this
+            field profile, so a 304 can be answered with a matching body.
+
+        Returns:
+            dict: The header, empty if no ETag is stored.
+        """
+
+        etag: Optional[str] = self._etag_store.get_etag(
+            calendar_id, event_id, profile
+        )
+        return {header: etag} if etag else {}
+
+    async def add_event(
+        self,
+        title: str,
+        description: str,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        color_id: int = 7,
+        calendar_id: Optional[str] = "primary",
+        location: Optional[str] = None,
+    ) -> Optional[str]:
+        """Add an event to the calendar.
+
+        Args:
+            title (str): The title of the event.
+            description (str): The description of the event.
+            start_datetime (datetime): The start time of the event.
+            end_datetime (datetime): The end time of the event.
+            color_id (str): The color id of the event.
+            calendar_id (str): The ID of the calendar to add the
+            event to.
+            location (str): The location of the event.
+
+        Returns:
+            str: The ID of the event that was added, None if it could not
+            be added.
+        """
+
+        event_to_add: dict = {
+            "summary": title,
+            "location": location,
+            "description": description,
+            "colorId": str(color_id),
+            "start": {
+                "dateTime": start_datetime.isoformat(),
+                "timeZone": "Europe/London",
+            },
+            "end": {
+                "dateTime": end_datetime.isoformat(),
+                "timeZone": "Europe/London",
+            },
+        }
+
+        try:
+            response: Response = await self._request(
+                "POST",
+                f"/calendars/{quote(calendar_id, safe='')}/events",
+                params={"fields": EVENT_FIELDS["sync"]},
+                json=event_to_add,
+            )
+            added_event: dict = response.json()
+            self._etag_store.put(calendar_id, added_event, "sync")
+            return added_event.get("id")
+
+        except HTTPError as e:
+            print(f"An error occurred: {e}")
+            return None
+
+    async def get_event_by_id(
+        self,
+        event_id: str,
+        calendar_id: str = "primary",
+        profile: str = "full",
+    ) -> dict:
+        """Get an event by its ID.
+
+        The request carries the stored ETag of the event, if any, so an
+        unchanged event costs a bodiless 304 response.
+
+        Args:
+            event_id (str): The ID of the event to retrieve.
+            calendar_id (str): The ID of the calendar to retrieve the
+            event from.
+            profile (str): The field profile to request the event with.
+
+        Returns:
+            dict: The event details, empty if it could not be retrieved.
+        """
+
+        try:
+            response: Response = await self._request(
+                "GET",
+                self._event_path(event_id, calendar_id),
+                params={"fields": EVENT_FIELDS[profile]},
+                headers=self._conditional(
+                    "If-None-Match", calendar_id, event_id, profile
+                ),
+            )
+
+        except HTTPStatusError as e:
+            cached_event: Optional[dict] = self._etag_store.get(
+                calendar_id, event_id, profile
+            )
+            if (
+                e.response.status_code == NOT_MODIFIED
+                and cached_event is not None
+            ):
+                return cached_event
+
+            print(f"An error occurred: {e}")
+            return {}
+
+        except HTTPError as e:
+            print(f"An error occurred: {e}")
+            return {}
+
+        event: dict = response.json()
+        self._etag_store.put(calendar_id, event, profile)
+        return event
+
+    async def delete_event_by_id(
+        self, event_id: str, calendar_id: str = "primary"
+    ) -> dict:
+        """Delete an event by its ID.
+
+        Args:
+            event_id (str): The ID of the event to delete.
+            calendar_id (str): The ID of the calendar to delete the
+            event from.
+
+        Returns:
+            dict: The status, empty if the event could not be deleted.
+        """
+
+        try:
+            await self._request(
+                "DELETE", self._event_path(event_id, calendar_id)
+            )
+            self._etag_store.discard(calendar_id, event_id)
+            return {"status": "Event deleted successfully"}
+
+        except HTTPError as e:
+            print(f"An error occurred: {e}")
+            return {}
+
+    async def update_event_by_id(
+        self,
+        event_id: str,
+        title: str,
+        description: str,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        location: Optional[str] = None,
+        calendar_id: str = "primary",
+    ) -> dict:
+        """Update the details of an event.
+
+        Only the given details are sent, as a patch, so the event's
+        colour and any other fields are kept.
+
+        Args:
+            event_id (str): The ID of the event to update.
+            title (str): The title of the event.
+            description (str): The description of the event.
+            start_datetime (datetime): The start time of the event.
+            end_datetime (datetime): The end time of the event.
+            location (Optional[str]): The location of the event.
+            calendar_id (str): The ID of the calendar the event is in.
+
+        Returns:
+            dict: The updated event, empty if it could not be updated.
+        """
+
+        try:
+            response: Response = await self._request(
+                "PATCH",
+                self._event_path(event_id, calendar_id),
+                json={
+                    "summary": title,
+                    "location": location,
+                    "description": description,
+                    "start": {
+                        "dateTime": start_datetime.isoformat(),
+                        "timeZone": "Europe/London",
+                    },
+                    "end": {
+                        "dateTime": end_datetime.isoformat(),
+                        "timeZone": "Europe/London",
+                    },
+                },
+            )
+
+        except HTTPError as e:
+            print(f"An error occurred: {e}")
+            return {}
+
+        updated_event: dict = response.json()
+        self._etag_store.put(calendar_id, updated_event, "full")
+        return updated_event
+
+    async def update_event_color(
+        self, event_id: str, color_id: str, calendar_id: str = "primary"
+    ) -> dict:
+        """Update the color of an event.
+
+        If the event's ETag is known the patch is conditional on it, so
+        it fails instead of overwriting a concurrent edit.
+
+        Args:
+            event_id (str): The ID of the event to update.
+            color_id (str): The ID of the color to use.
+            calendar_id (str): The ID of the calendar the event is in.
+
+        Returns:
+            dict: The updated event, empty if it could not be updated.
+        """
+
+        try:
+            response: Response = await self._request(
+                "PATCH",
+                self._event_path(event_id, calendar_id),
+                params={"fields": EVENT_FIELDS["sync"]},
+                json={"colorId": str(color_id)},
+                headers=self._conditional("If-Match", calendar_id, event_id),
+            )
+
+        except HTTPError as e:
+            if (
+                isinstance(e, HTTPStatusError)
+                and e.response.status_code == PRECONDITION_FAILED
+            ):
+                self._etag_store.discard(calendar_id, event_id)
+
+            print(f"An error occurred: {e}")
+            return {}
+
+        updated_event: dict = response.json()
+        self._etag_store.put(calendar_id, updated_event, "sync")
+        return updated_event
+
+    async def get_todays_events(self, calendar_id: str = "primary") -> list:
+        """Get today's events from the calendar.
+
+        Args:
+            calendar_id (str): The ID of the calendar to retrieve
+            events from.
+
+        Returns:
+            list: A list of events for today.
+        """
+
+        now: datetime = datetime.utcnow()
+
+        try:
+            response: Response = await self._request(
+                "GET",
+                f"/calendars/{quote(calendar_id, safe='')}/events",
+                params={
+                    "timeMin": now.isoformat() + "Z",
+                    "timeMax": (now + timedelta(days=1)).isoformat() + "Z",
+                    "singleEvents": "true",
+                    "orderBy": "startTime",
+                },
+            )
+            return response.json().get("items", [])
+
+        except HTTPError as e:
+            print(f"An error occurred: {e}")
+            return []
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+
+        await self._client.aclose()
+
+    @staticmethod
+    def _event_path(event_id: str, calendar_id: str) -> str:
+        """Build the API path of an event.
+
+        Args:
+            event_id (str): The ID of the event.
+            calendar_id (str): The ID of the calendar the event is in.
+
+        Returns:
+            str: The path.
+        """
+
+        return (
+            f"/calendars/{quote(calendar_id, safe='')}"
+            f"/events/{quote(event_id, safe='')}"
+        )
@@ -0,0 +1,59 @@
+"""Adapts the size of API batch requests to observed latency and errors."""
+
+from threading import Lock
+
+
+class AdaptiveBatchSizer:
+    """Chooses batch sizes using additive increase, multiplicative decrease.
+
+    The size grows by a fixed step after every fast, error free batch and
+    shrinks when a batch is slow or has failed sub-requests.
+
+    Args:
+        initial_size (int): The starting batch size.
+        min_size (int): The smallest batch size to use.
+        max_size (int): The largest batch size to use.
+        target_latency (float): The batch latency in seconds above which
+        the size is reduced.
+        step (int): The amount to grow the size by after a good batch.
+    """
+
+    def __init__(
+        self,
+        initial_size: int = 50,
+        min_size: int = 5,
+        max_size: int = 1000,
+        target_latency: float = 2.0,
+        step: int = 5,
+    ):
+        self._min_size: int = min_size
+        self._max_size: int = max_size
+        self._target_latency: float = target_latency
+        self._step: int = step
+        self._size: int = max(min_size, min(initial_size, max_size))
+        self._lock: Lock = Lock()
+
+    @property
+    def size(self) -> int:
+        """The batch size to use for the next batch."""
+
+        return self._size
+
+    def record(
+        self, latency: float, batch_size: int, error_count: int
+    ) -> None:
+        """Record the outcome of a batch and adjust the batch size.
+
+        Args:
+            latency (float): The time in seconds the batch took.
+            batch_size (int): The number of requests in the batch.
+            error_count (int): The number of failed sub-requests.
+        """
+
+        with self._lock:
+            if error_count:
+                self._size = max(self._min_size, self._size // 2)
+            elif latency > self._target_latency:
+                self._size = max(self._min_size, (self._size * 3) // 4)
+            elif batch_size >= self._size:
+                self._size = min(self._max_size, self._size + self._step)
@@ -2,20 +2,19 @@
 
 from abc import ABC, abstractmethod
 from typing import List
-from data_models import BoardCard, BoardList, Board
+from data_models import BoardCard, BoardList, Board, BoardSnapshot
 
 
 class BoardHandler(ABC):
     """Abstract base class for API handlers."""
 
     @abstractmethod
-    def __init__(self, api_key: str, api_secret: str, token: str):
+    def __init__(self, api_key: str, token: str):
         """
         Initialize the AbstractHandler.
 
         Args:
             api_key (str): The API key.
-            api_secret (str): The API secret.
             token (str): The authentication token.
         """
 
@@ -62,3 +61,15 @@ class BoardHandler(ABC):
             card_id (str): The ID of the card.
             new_list_id (str): The ID of the new list.
         """
+
+    @abstractmethod
+    def get_board_snapshot(self, board_id: str) -> BoardSnapshot:
+        """
+        Get a board with its open lists and cards.
+
+        Args:
+            board_id (str): The ID of the board.
+
+        Returns:
+            BoardSnapshot: The board, its open lists and its open cards.
+        """
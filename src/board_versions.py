@@ -0,0 +1,129 @@
+"""Versions of boards and their lists, shared by the API and readers."""
+
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+from typing import Optional
+from data_models import BoardAction
+from logging_funcs import log_warning
+from mongodb_handler import MongoDbHandler
+from pymongo.errors import PyMongoError
+
+BOARD_VERSIONS_COLLECTION: str = "board_versions"
+
+# Webhook actions that change the lists of a board.
+LIST_ACTIONS: frozenset[str] = frozenset(
+    {"createList", "updateList", "moveListFromBoard", "moveListToBoard"}
+)
+
+# Webhook actions that change the board itself.
+BOARD_ACTIONS: frozenset[str] = frozenset({"updateBoard"})
+
+# The version of the set of boards, bumped when any board changes.
+ALL_BOARDS: str = "boards"
+
+# The version of everything, bumped when a change names no board.
+EVERYTHING: str = "*"
+
+
+class BoardVersions:
+    """Counters bumped whenever a board or its lists change.
+
+    The API bumps them from board webhooks, and any process caching
+    boards and lists keys its entries on them, so a change seen by the
+    API retires the cached entries of every process. Readers reload the
+    counters at most once per check interval, so a read is served from
+    memory and is stale for no longer than the webhook's delay plus the
+    interval.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        check_interval (float): How long the loaded counters are used
+        for, in seconds.
+    """
+
+    def __init__(
+        self, db_handler: MongoDbHandler, check_interval: float = 1.0
+    ):
+        self._db_handler: MongoDbHandler = db_handler
+        self._check_interval: float = check_interval
+        self._versions: dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock: Lock = Lock()
+
+    def record(self, board_action: BoardAction) -> bool:
+        """Bump the versions a board webhook action changes.
+
+        Args:
+            board_action (BoardAction): The webhook action.
+
+        Returns:
+            bool: True if the action changed a board or its lists.
+        """
+
+        action_type: str = board_action.action_type
+
+        if action_type not in LIST_ACTIONS | BOARD_ACTIONS:
+            return False
+
+        if board_action.board_id is None:
+            keys: list[str] = [EVERYTHING]
+        elif action_type in BOARD_ACTIONS:
+            keys = [board_action.board_id, ALL_BOARDS]
+        else:
+            keys = [board_action.board_id]
+
+        for key in keys:
+            self._db_handler.modify_document(
+                BOARD_VERSIONS_COLLECTION,
+                {"_id": key},
+                {
+                    "$inc": {"version": 1},
+                    "$set": {"updated_at": datetime.utcnow()},
+                },
+                projection={"_id": 1},
+            )
+
+        return True
+
+    def version(self, key: str) -> tuple[int, int]:
+        """Get the current version of a board, or of the set of boards.
+
+        Args:
+            key (str): The board ID, or ALL_BOARDS.
+
+        Returns:
+            tuple[int, int]: The version of the key and the version of
+            everything.
+        """
+
+        with self._lock:
+            if (
+                self._loaded_at is None
+                or monotonic() - self._loaded_at >= self._check_interval
+            ):
+                self._load()
+
+            return self._versions.get(key, 0), self._versions.get(
+                EVERYTHING, 0
+            )
+
+    def _load(self) -> None:
+        """Reload every counter, keeping the last ones on a database error.
+
+        Versions only go up, so an entry keyed on an old version is
+        never served once the newer one has been loaded.
+        """
+
+        try:
+            self._versions = {
+                document["_id"]: document["version"]
+                for chunk in self._db_handler.iter_documents(
+                    BOARD_VERSIONS_COLLECTION, {}, {"_id": 1, "version": 1}
+                )
+                for document in chunk
+            }
+        except PyMongoError as error:
+            log_warning(f"Unable to load the board versions: {error}")
+
+        self._loaded_at = monotonic()
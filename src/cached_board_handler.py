@@ -0,0 +1,113 @@
+"""Caches the board and list reads of a board handler."""
+
+from typing import List
+from board_handler import BoardHandler
+from board_versions import ALL_BOARDS, BoardVersions
+from data_models import Board, BoardCard, BoardList, BoardSnapshot
+from ttl_cache import TTLCache
+
+
+class CachedBoardHandler(BoardHandler):
+    """Serves boards and lists from a cache in front of another handler.
+
+    Boards and lists rarely change, so they are cached until they expire
+    or a board webhook reports a change to them. Entries are keyed on the
+    board versions the webhooks bump, so a change received by the API
+    process retires the entries of this one. Cards change all the time
+    and are always read from the wrapped handler.
+
+    Args:
+        board_handler (BoardHandler): The handler to read through to.
+        cache (TTLCache): The cache of boards and lists.
+        versions (BoardVersions): The versions of the boards.
+    """
+
+    def __init__(
+        self,
+        board_handler: BoardHandler,
+        cache: TTLCache,
+        versions: BoardVersions,
+    ):
+        self._board_handler: BoardHandler = board_handler
+        self._cache: TTLCache = cache
+        self._versions: BoardVersions = versions
+
+    def get_cards_in_list(
+        self, board_id: str, list_id: str
+    ) -> List[BoardCard]:
+        """Get the cards in a list from the wrapped handler.
+
+        Args:
+            board_id (str): The ID of the board.
+            list_id (str): The ID of the list.
+
+        Returns:
+            List[BoardCard]: The cards in the list.
+        """
+
+        return self._board_handler.get_cards_in_list(board_id, list_id)
+
+    def get_all_boards(self) -> List[Board]:
+        """Get all the boards, from the cache if possible.
+
+        Returns:
+            List[Board]: All the boards.
+        """
+
+        return list(
+            self._cache.get_or_load(
+                ("boards", *self._versions.version(ALL_BOARDS)),
+                self._board_handler.get_all_boards,
+            )
+        )
+
+    def get_all_lists(self, board_id: str) -> List[BoardList]:
+        """Get all the lists in a board, from the cache if possible.
+
+        Args:
+            board_id (str): The ID of the board.
+
+        Returns:
+            List[BoardList]: All the lists in the board.
+        """
+
+        return list(
+            self._cache.get_or_load(
+                ("lists", board_id, *self._versions.version(board_id)),
+                lambda: self._board_handler.get_all_lists(board_id),
+            )
+        )
+
+    def update_card_list(self, card_id: str, new_list_id: str) -> BoardCard:
+        """Move a card to another list through the wrapped handler.
+
+        Args:
+            card_id (str): The ID of the card.
+            new_list_id (str): The ID of the new list.
+
+        Returns:
+            BoardCard: The updated card.
+        """
+
+        return self._board_handler.update_card_list(card_id, new_list_id)
+
+    def get_board_snapshot(self, board_id: str) -> BoardSnapshot:
+        """Get a board with its lists and cards from the wrapped handler.
+
+        Args:
+            board_id (str): The ID of the board.
+
+        Returns:
+            BoardSnapshot: The board, its open lists and its open cards.
+        """
+
+        return self._board_handler.get_board_snapshot(board_id)
+
+    def cache_stats(self) -> dict:
+        """Get the size and hit counters of the cache.
+
+        Returns:
+            dict: The number of entries, hits, misses and evictions.
+        """
+
+        return self._cache.stats()
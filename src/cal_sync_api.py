@@ -1,17 +1,59 @@
 """Sets up the API for the calendar sync service."""
 
+from asyncio import Queue, QueueFull, create_task, gather
 from datetime import datetime
 from os import environ
 from typing import Optional
+from async_google_calendar_handler import AsyncGoogleCalendarHandler
+from board_versions import BoardVersions
+from calendar_channel_index import CalendarChannelIndex
+from card_move_coalescer import CardMoveCoalescer
 from config import Config, get_config
+from cycle_tracer import TRACES_COLLECTION, chrome_trace, recent_traces_query
+from data_models import BoardAction
+from event_mirror import MIRROR_PROFILE, MIRROR_PROJECTION, mirror_update
 from dotenv import load_dotenv
-from factorys import calendar_handler_factory, db_handler_factory
-from fastapi import FastAPI, Header, HTTPException
+from factorys import (
+    async_calendar_handler_factory,
+    async_db_handler_factory,
+    calendar_handler_factory,
+    db_handler_factory,
+)
+from fastapi import (
+    BackgroundTasks,
+    FastAPI,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+)
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from google_calendar_handler import GoogleCalendarHandler
-from logging_funcs import log_decorator, log_error, log_info
+from logging_funcs import (
+    log_debug,
+    log_decorator,
+    log_error,
+    log_info,
+    log_warning,
+)
+from metrics import (
+    BATCH_SIZE,
+    METRICS_ENABLED,
+    REGISTRY,
+    merge_families,
+    register_handler_metrics,
+    render_prometheus,
+)
+from metrics_publisher import METRICS_COLLECTION, live_snapshots_query
 from mongodb_handler import MongoDbHandler
+from outbox_dispatcher import new_outbox_entry
+from motor_db_handler import MotorDbHandler
 from pydantic import BaseModel
+from sync_request_queue import SyncRequestQueue
+from sync_state import mark_dirty
+from trello_webhook_parser import parse_board_action
 from uvicorn import run
 
 load_dotenv("./.env")
@@ -24,6 +66,10 @@ APP.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+APP.add_middleware(
+    GZipMiddleware,
+    minimum_size=int(environ.get("API_GZIP_MIN_SIZE", "1000")),
+)
 
 CALENDAR_HANDLER: Optional[GoogleCalendarHandler] = calendar_handler_factory(
     environ.get("CALENDAR_TYPE")
@@ -31,7 +77,46 @@ CALENDAR_HANDLER: Optional[GoogleCalendarHandler] = calendar_handler_factory(
 DB_HANDLER: Optional[MongoDbHandler] = db_handler_factory(
     environ.get("DB_TYPE")
 )
+# The routes use the asynchronous handlers, so upstream requests never
+# hold a threadpool slot; the synchronous ones serve the background work.
+# The calendar handlers share their credentials, rate limiter and ETags.
+ASYNC_CALENDAR_HANDLER: Optional[AsyncGoogleCalendarHandler] = (
+    async_calendar_handler_factory(
+        environ.get("CALENDAR_TYPE"), CALENDAR_HANDLER
+    )
+)
+ASYNC_DB_HANDLER: Optional[MotorDbHandler] = async_db_handler_factory(
+    environ.get("DB_TYPE")
+)
 CONFIG: Config = get_config()
+CHANNEL_INDEX: CalendarChannelIndex = CalendarChannelIndex(DB_HANDLER)
+BOARD_VERSIONS: BoardVersions = BoardVersions(DB_HANDLER)
+SYNC_REQUEST_QUEUE: SyncRequestQueue = SyncRequestQueue(DB_HANDLER)
+
+CARD_MOVE_COALESCER: CardMoveCoalescer = CardMoveCoalescer(
+    DB_HANDLER,
+    CALENDAR_HANDLER,
+    CONFIG,
+    quiet_window=float(environ.get("BOARD_WEBHOOK_QUIET_WINDOW", "2")),
+    max_delay=float(environ.get("BOARD_WEBHOOK_MAX_DELAY", "10")),
+)
+
+# Whether add_event queues events in the outbox for the outbox
+# dispatcher instead of adding them to the calendar itself.
+OUTBOX_ENABLED: bool = environ.get("OUTBOX_ENABLED", "false").lower() == "true"
+
+# The most events POST /events/bulk accepts in one request.
+BULK_MAX_EVENTS: int = int(environ.get("API_BULK_MAX_EVENTS", "1000"))
+
+# How old a process's metrics snapshot can be before it is left out of
+# /metrics; a few publish intervals, so one slow publish is not missed.
+METRICS_STALE_AFTER: float = 3 * float(
+    environ.get("METRICS_PUBLISH_INTERVAL", "15")
+)
+
+# Card moves waiting to be coalesced. Created on startup so it belongs
+# to the server's event loop.
+CARD_MOVE_QUEUE: Optional[Queue] = None
 
 
 class Event(BaseModel):
@@ -50,32 +135,58 @@ class Event(BaseModel):
     created_at: datetime = datetime.now()
 
 
-class WebhookRequest(BaseModel):
-    """Webhook request model."""
+@APP.on_event("startup")
+async def start_card_move_coalescer() -> None:
+    """Start the task that applies card moves from board webhooks."""
+
+    global CARD_MOVE_QUEUE  # pylint: disable=global-statement
+    CARD_MOVE_QUEUE = Queue(
+        maxsize=int(environ.get("BOARD_WEBHOOK_QUEUE_SIZE", "1000"))
+    )
+    create_task(CARD_MOVE_COALESCER.run(CARD_MOVE_QUEUE))
+
+
+@APP.on_event("startup")
+async def register_api_metrics() -> None:
+    """Export the counters kept by the API process's handlers."""
+
+    register_handler_metrics(calendar_handler=CALENDAR_HANDLER)
+
+
+@APP.on_event("shutdown")
+async def close_async_handlers() -> None:
+    """Close the connection pools of the asynchronous handlers."""
 
-    action: dict
-    model: dict
-    webhook: dict
+    if ASYNC_CALENDAR_HANDLER:
+        await ASYNC_CALENDAR_HANDLER.close()
+    if ASYNC_DB_HANDLER:
+        ASYNC_DB_HANDLER.close()
 
 
 @APP.post("/add_event")
 @log_decorator
-def add_event(event: Event) -> dict:
+async def add_event(event: Event) -> dict:
     """Add an event to the calendar and database.
 
+    In outbox mode the event is only written to the database, and the
+    outbox dispatcher adds it to the calendar in a later batch.
+
     Args:
         event (Event): The event to add.
 
     Returns:
-        dict: The added event.
+        dict: The added event, without an event ID in outbox mode.
     """
 
-    if not CALENDAR_HANDLER or not DB_HANDLER:
+    if not ASYNC_CALENDAR_HANDLER or not ASYNC_DB_HANDLER:
         error_msg: str = "Calendar or database handler not found"
         log_error(error_msg, item_id=event.card_id)
         raise HTTPException(status_code=400, detail=error_msg)
 
-    event_id: Optional[str] = CALENDAR_HANDLER.add_event(
+    if OUTBOX_ENABLED:
+        return await queue_event(event)
+
+    event_id: Optional[str] = await ASYNC_CALENDAR_HANDLER.add_event(
         event.title,
         event.description,
         event.start_datetime,
@@ -87,8 +198,8 @@ def add_event(event: Event) -> dict:
     event.event_id = event_id
 
     if event_id:
-        db_result: bool = DB_HANDLER.add_document(
-            "calendar_events", event.model_dump()
+        db_result: bool = await ASYNC_DB_HANDLER.add_document(
+            "calendar_events", mark_dirty(event.model_dump())
         )
 
         if db_result:
@@ -101,7 +212,9 @@ def add_event(event: Event) -> dict:
         else:
             error_msg = "Unable to add calendar event to database"
             log_error(error_msg, "database_error", item_id=event.card_id)
-            CALENDAR_HANDLER.delete_event_by_id(event_id, event.calendar_id)
+            await ASYNC_CALENDAR_HANDLER.delete_event_by_id(
+                event_id, event.calendar_id
+            )
             raise HTTPException(status_code=400, detail=error_msg)
 
     else:
@@ -110,31 +223,207 @@ def add_event(event: Event) -> dict:
         raise HTTPException(status_code=400, detail=error_msg)
 
 
+async def queue_event(event: Event) -> dict:
+    """Write an event to the outbox for the outbox dispatcher.
+
+    Args:
+        event (Event): The event to add.
+
+    Returns:
+        dict: The queued event.
+
+    Raises:
+        HTTPException: If the event could not be written.
+    """
+
+    event.event_id = None
+
+    if not await ASYNC_DB_HANDLER.add_document(
+        "calendar_events",
+        {**mark_dirty(event.model_dump()), **new_outbox_entry()},
+    ):
+        error_msg: str = "Unable to add calendar event to database"
+        log_error(error_msg, "database_error", item_id=event.card_id)
+        raise HTTPException(status_code=400, detail=error_msg)
+
+    log_info("Queued calendar event in the outbox", item_id=event.card_id)
+    return event.model_dump()
+
+
+@APP.post("/events/bulk")
+@log_decorator
+async def add_events(events: list[Event]) -> dict:
+    """Add many events to the calendar and database.
+
+    The events are inserted into the calendar with batched requests and
+    written to the database with one unordered insert. Cards that
+    already have an event are skipped, and an event that cannot be
+    written to the database is removed from the calendar again.
+
+    Args:
+        events (list[Event]): The events to add.
+
+    Returns:
+        dict: The status of each event, in the order they were given,
+        and the number of events added.
+
+    Raises:
+        HTTPException: If the handlers are missing or there are too
+        many events.
+    """
+
+    if (
+        not CALENDAR_HANDLER
+        or not ASYNC_CALENDAR_HANDLER
+        or not ASYNC_DB_HANDLER
+    ):
+        error_msg: str = "Calendar or database handler not found"
+        log_error(error_msg)
+        raise HTTPException(status_code=400, detail=error_msg)
+
+    if len(events) > BULK_MAX_EVENTS:
+        error_msg = f"At most {BULK_MAX_EVENTS} events can be added at once"
+        log_error(error_msg)
+        raise HTTPException(status_code=413, detail=error_msg)
+
+    BATCH_SIZE.observe(len(events), operation="api_bulk_add")
+
+    existing_card_ids: set = {
+        document["card_id"]
+        for document in await ASYNC_DB_HANDLER.get_documents(
+            "calendar_events",
+            {"card_id": {"$in": [event.card_id for event in events]}},
+            {"_id": 0, "card_id": 1},
+        )
+    }
+    results: list[dict] = [
+        {"card_id": event.card_id, "status": "exists", "event_id": None}
+        for event in events
+    ]
+    new_events: list[tuple[int, Event]] = []
+    for index, event in enumerate(events):
+        if event.card_id not in existing_card_ids:
+            existing_card_ids.add(event.card_id)
+            new_events.append((index, event))
+
+    added: list[tuple[Optional[str], Optional[Exception]]] = (
+        await run_in_threadpool(
+            CALENDAR_HANDLER.add_events,
+            [
+                {
+                    "title": event.title,
+                    "description": event.description,
+                    "start_datetime": event.start_datetime,
+                    "end_datetime": event.end_datetime,
+                    "color_id": CONFIG.get_status_colour_id(
+                        event.current_status
+                    ),
+                    "calendar_id": event.calendar_id,
+                    "location": event.location,
+                }
+                for _, event in new_events
+            ],
+        )
+    )
+
+    added_events: list[tuple[int, Event]] = []
+    for (index, event), (event_id, error) in zip(new_events, added):
+        if event_id:
+            event.event_id = event_id
+            added_events.append((index, event))
+        else:
+            results[index].update(status="failed", error=str(error))
+            log_error(
+                f"Unable to add calendar event to calendar: {error}",
+                item_id=event.card_id,
+            )
+
+    failed_positions: set[int] = await ASYNC_DB_HANDLER.add_documents(
+        "calendar_events",
+        [mark_dirty(event.model_dump()) for _, event in added_events],
+    )
+    orphaned_events: list[Event] = []
+    for position, (index, event) in enumerate(added_events):
+        if position in failed_positions:
+            results[index].update(
+                status="failed",
+                error="Unable to add calendar event to database",
+            )
+            orphaned_events.append(event)
+        else:
+            results[index].update(status="created", event_id=event.event_id)
+
+    await gather(
+        *(
+            ASYNC_CALENDAR_HANDLER.delete_event_by_id(
+                event.event_id, event.calendar_id
+            )
+            for event in orphaned_events
+        )
+    )
+
+    created: int = len(added_events) - len(orphaned_events)
+    log_info(f"Added {created} of {len(events)} calendar events")
+    return {"created": created, "results": results}
+
+
 @APP.get("/get_event/{event_id}")
 @log_decorator
-def get_event(trello_card_id: str) -> dict:
-    """Get an event from the database.
+async def get_event(trello_card_id: str, fresh: bool = False) -> dict:
+    """Get an event from the event mirror.
+
+    The event is read from the mirror kept by the sync, so a read is a
+    single database lookup. Events that are not mirrored yet are fetched
+    from the calendar and mirrored.
 
     Args:
         trello_card_id (str): The Trello card ID.
+        fresh (bool): Fetch the full event from the calendar instead of
+        the mirror.
 
     Returns:
         dict: The event.
     """
 
-    if not DB_HANDLER or not CALENDAR_HANDLER:
+    if not ASYNC_DB_HANDLER or not ASYNC_CALENDAR_HANDLER:
         error_msg: str = "Calendar or database handler not found"
         log_error(error_msg, item_id=trello_card_id)
         raise HTTPException(status_code=400, detail=error_msg)
 
-    event_data: dict = DB_HANDLER.get_document(
-        "calendar_events", {"trello_card_id": trello_card_id}
+    event_data: Optional[dict] = await ASYNC_DB_HANDLER.get_document(
+        "calendar_events",
+        {"card_id": trello_card_id},
+        MIRROR_PROJECTION,
     )
 
-    calendar_event: dict = CALENDAR_HANDLER.get_event_by_id(
-        event_data["event_id"], event_data["calendar_id"]
+    if event_data is None:
+        error_msg = "Calendar event not found"
+        log_warning(error_msg, item_id=trello_card_id)
+        raise HTTPException(status_code=404, detail=error_msg)
+
+    if not event_data.get("event_id"):
+        error_msg = "Calendar event has not been added to the calendar yet"
+        log_warning(error_msg, item_id=trello_card_id)
+        raise HTTPException(status_code=404, detail=error_msg)
+
+    if event_data.get("mirror") and not fresh:
+        log_debug("Served event from the event mirror", item_id=trello_card_id)
+        return event_data["mirror"]
+
+    calendar_event: dict = await ASYNC_CALENDAR_HANDLER.get_event_by_id(
+        event_data["event_id"],
+        event_data["calendar_id"],
+        "full" if fresh else MIRROR_PROFILE,
     )
 
+    if calendar_event and not fresh:
+        await ASYNC_DB_HANDLER.update_document(
+            "calendar_events",
+            *mirror_update(
+                {"event_id": event_data["event_id"]}, calendar_event
+            ),
+        )
+
     log_info(
         "Successfully retrieved event from calendar and database",
         item_id=trello_card_id,
@@ -144,7 +433,7 @@ def get_event(trello_card_id: str) -> dict:
 
 @APP.delete("/delete_event/{event_id}")
 @log_decorator
-def delete_event(trello_card_id: str) -> dict:
+async def delete_event(trello_card_id: str) -> dict:
     """Delete an event from the calendar and database.
 
     Args:
@@ -153,22 +442,33 @@ def delete_event(trello_card_id: str) -> dict:
     Returns:
         dict: The deleted event.
     """
-    if not DB_HANDLER or not CALENDAR_HANDLER:
+    if not ASYNC_DB_HANDLER or not ASYNC_CALENDAR_HANDLER:
         error_msg: str = "Calendar or database handler not found"
         log_error(error_msg)
         raise HTTPException(status_code=400, detail=error_msg)
 
-    event_data: dict = DB_HANDLER.get_document(
-        "calendar_events", {"trello_card_id": trello_card_id}
+    event_data: Optional[dict] = await ASYNC_DB_HANDLER.get_document(
+        "calendar_events", {"card_id": trello_card_id}
     )
 
-    deleted_from_calendar: dict = CALENDAR_HANDLER.delete_event_by_id(
-        event_data["event_id"], event_data["calendar_id"]
+    if event_data is None:
+        error_msg = "Calendar event not found"
+        log_warning(error_msg, item_id=trello_card_id)
+        raise HTTPException(status_code=404, detail=error_msg)
+
+    # An event still in the outbox is only removed from the database; if
+    # the dispatcher is adding it, the dispatcher deletes it again.
+    deleted_from_calendar: dict = (
+        await ASYNC_CALENDAR_HANDLER.delete_event_by_id(
+            event_data["event_id"], event_data["calendar_id"]
+        )
+        if event_data.get("event_id")
+        else {"status": "queued"}
     )
 
     if deleted_from_calendar:
-        deleted_event_data: bool = DB_HANDLER.delete_document(
-            "calendar_events", {"trello_card_id": trello_card_id}
+        deleted_event_data: bool = await ASYNC_DB_HANDLER.delete_document(
+            "calendar_events", {"card_id": trello_card_id}
         )
 
         if deleted_event_data:
@@ -198,8 +498,23 @@ def delete_event(trello_card_id: str) -> dict:
 
 @APP.put("/update_event/{event_id}")
 @log_decorator
-def update_event(event_id: str, event: Event) -> dict:
-    return CALENDAR_HANDLER.update_event_by_id(
+async def update_event(event_id: str, event: Event) -> dict:
+    """Update the details of an event in the calendar.
+
+    Args:
+        event_id (str): The ID of the calendar event.
+        event (Event): The new details of the event.
+
+    Returns:
+        dict: The updated event.
+    """
+
+    if not ASYNC_CALENDAR_HANDLER:
+        error_msg: str = "Calendar handler not found"
+        log_error(error_msg, item_id=event.card_id)
+        raise HTTPException(status_code=400, detail=error_msg)
+
+    return await ASYNC_CALENDAR_HANDLER.update_event_by_id(
         event_id,
         event.title,
         event.description,
@@ -207,9 +522,6 @@ def update_event(event_id: str, event: Event) -> dict:
         event.end_datetime,
         event.location,
         event.calendar_id,
-        event.card_id,
-        event.board_id,
-        event.event_id,
     )
 
 
@@ -225,58 +537,208 @@ async def add_board_webhook() -> dict:
 
 
 @APP.post("/board_webhook/")
-async def receive_board_webhook(web_hook_request: WebhookRequest) -> dict:
+async def receive_board_webhook(request: Request) -> dict:
     """Receives the board webhooks.
 
+    Only the action type, board, card and destination list are read
+    from the payload. Changes to a board or its lists bump the board's
+    version, which retires the boards and lists cached by every process.
+    Card moves are queued for the card move coalescer and acknowledged
+    without waiting for them to be applied.
+
     Args:
-        web_hook_request (WebhookRequest): The webhook request.
+        request (Request): The webhook request.
 
     Returns:
         dict: The response.
+
+    Raises:
+        HTTPException: If the card move queue is full, so Trello retries
+        the webhook later.
     """
-    log_info(f"Received webhook: {web_hook_request.model_dump()}")
+
+    board_action: Optional[BoardAction] = parse_board_action(
+        await request.body()
+    )
+
+    if board_action and await run_in_threadpool(
+        BOARD_VERSIONS.record, board_action
+    ):
+        log_debug(
+            f"Bumped the board version after {board_action.action_type}",
+            item_id=board_action.board_id,
+        )
+
+    if board_action and board_action.card_id and board_action.list_after_id:
+        try:
+            CARD_MOVE_QUEUE.put_nowait(board_action)
+        except QueueFull as error:
+            error_msg: str = "Card move queue is full"
+            log_warning(error_msg, item_id=board_action.card_id)
+            raise HTTPException(status_code=503, detail=error_msg) from error
+
     return {"message": "Webhook received successfully"}
 
 
 @APP.post("/calendar_webhook/")
 async def receive_calendar_webhook(
+    background_tasks: BackgroundTasks,
     x_goog_channel_id: str = Header(None),
-    x_goog_channel_token: str = Header(None),
-    x_goog_channel_expiration: str = Header(None),
     x_goog_resource_id: str = Header(None),
-    x_goog_resource_uri: str = Header(None),
     x_goog_resource_state: str = Header(None),
     x_goog_message_number: int = Header(None),
-    content_length: int = Header(None),
-    content_type: str = Header(None),
-):
+) -> dict:
     """Receives the calendar webhooks.
 
+    The notification is acknowledged straight away. Checking it against
+    the channel index and queueing a targeted sync of its calendar run
+    after the response has been sent.
+
     Args:
-        headers (WebhookHeaders): The webhook headers.
-        content_type (str): The content type.
+        background_tasks (BackgroundTasks): Tasks to run after responding.
+        x_goog_channel_id (str): The ID of the notification channel.
+        x_goog_resource_id (str): The ID of the watched resource.
+        x_goog_resource_state (str): The kind of notification.
+        x_goog_message_number (int): The channel's message number.
 
     Returns:
         dict: The response.
     """
 
-    if content_type == "application/json; utf-8":
-        # Handle JSON body here if needed
-        pass
-    else:
-        print("Received Headers:")
-        print(f"X-Goog-Channel-ID: {x_goog_channel_id}")
-        print(f"X-Goog-Channel-Token: {x_goog_channel_token}")
-        if x_goog_channel_expiration:
-            print(f"X-Goog-Channel-Expiration: {x_goog_channel_expiration}")
-        print(f"X-Goog-Resource-ID: {x_goog_resource_id}")
-        print(f"X-Goog-Resource-URI: {x_goog_resource_uri}")
-        print(f"X-Goog-Resource-State: {x_goog_resource_state}")
-        print(f"X-Goog-Message-Number: {x_goog_message_number}")
+    # A "sync" message only confirms that a new channel was created.
+    if (
+        x_goog_resource_state != "sync"
+        and x_goog_channel_id
+        and x_goog_resource_id
+        and x_goog_message_number is not None
+    ):
+        background_tasks.add_task(
+            queue_calendar_sync,
+            x_goog_channel_id,
+            x_goog_resource_id,
+            x_goog_message_number,
+        )
 
     return {"message": "Notification received successfully"}
 
 
+@APP.get("/metrics")
+async def get_metrics() -> Response:
+    """Get the metrics of every process in the Prometheus text format.
+
+    The API's own metrics are added to the latest snapshots published
+    by the sync workers and the outbox dispatcher.
+
+    Returns:
+        Response: The metrics page.
+
+    Raises:
+        HTTPException: If metrics are disabled.
+    """
+
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+
+    snapshots: list = []
+    if ASYNC_DB_HANDLER:
+        snapshots = await ASYNC_DB_HANDLER.get_documents(
+            METRICS_COLLECTION,
+            live_snapshots_query(METRICS_STALE_AFTER),
+            {"_id": 0, "families": 1},
+        )
+
+    return Response(
+        content=render_prometheus(
+            merge_families(
+                [REGISTRY.collect()]
+                + [snapshot["families"] for snapshot in snapshots]
+            )
+        ),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@APP.get("/admin/sync_traces")
+async def get_sync_traces(
+    trace_format: str = "json", max_age: float = 3600
+) -> dict:
+    """Get the recent sync cycle traces of every sync worker.
+
+    Args:
+        trace_format (str): "json" for the traces as recorded, or
+        "chrome" for the Chrome trace event format, which can be loaded
+        in chrome://tracing or Perfetto.
+        max_age (float): Leave out workers that have not finished a
+        cycle in this many seconds.
+
+    Returns:
+        dict: The traces of each worker, oldest first.
+
+    Raises:
+        HTTPException: If the database handler is missing or the format
+        is unknown.
+    """
+
+    if not ASYNC_DB_HANDLER:
+        error_msg: str = "Database handler not found"
+        log_error(error_msg)
+        raise HTTPException(status_code=400, detail=error_msg)
+
+    if trace_format not in ("json", "chrome"):
+        raise HTTPException(
+            status_code=400, detail=f"Unknown trace format {trace_format}"
+        )
+
+    processes: list = await ASYNC_DB_HANDLER.get_documents(
+        TRACES_COLLECTION,
+        recent_traces_query(max_age),
+        {"process": 1, "updated_at": 1, "traces": 1},
+    )
+
+    if trace_format == "chrome":
+        return chrome_trace(processes)
+
+    return {
+        "processes": [
+            {
+                "process_id": process["_id"],
+                "process": process.get("process"),
+                "updated_at": process.get("updated_at"),
+                "traces": process.get("traces", []),
+            }
+            for process in processes
+        ]
+    }
+
+
+def queue_calendar_sync(
+    channel_id: str, resource_id: str, message_number: int
+) -> None:
+    """Queues a targeted sync of the calendar a notification is about.
+
+    Notifications for unknown channels, and duplicate or out of order
+    ones, are dropped.
+
+    Args:
+        channel_id (str): The ID of the notification channel.
+        resource_id (str): The ID of the watched resource.
+        message_number (int): The channel's message number.
+    """
+
+    calendar_id: Optional[str] = CHANNEL_INDEX.accept_message(
+        channel_id, resource_id, message_number
+    )
+
+    if calendar_id is None:
+        log_debug(
+            f"Dropped calendar notification {message_number}",
+            item_id=channel_id,
+        )
+        return
+
+    SYNC_REQUEST_QUEUE.request_sync(calendar_id)
+
+
 if __name__ == "__main__":
     # Test the API
     run(
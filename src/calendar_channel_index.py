@@ -0,0 +1,111 @@
+"""Maps calendar push notification channels to the calendars they watch."""
+
+from typing import Optional
+from mongodb_handler import MongoDbHandler
+
+CHANNELS_COLLECTION: str = "calendar_channels"
+
+
+class CalendarChannelIndex:
+    """Index of the push notification channels watching each calendar.
+
+    Each channel document also records the highest message number seen
+    on the channel, so duplicate and out of order deliveries can be
+    dropped across API restarts and processes.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+    """
+
+    def __init__(self, db_handler: MongoDbHandler):
+        self._db_handler: MongoDbHandler = db_handler
+
+    def add_channel(self, channel: dict, calendar_id: str) -> bool:
+        """Add a channel created by a watch request to the index.
+
+        Args:
+            channel (dict): The channel returned by the watch request. Its
+            expiration is stored in milliseconds since the epoch.
+            calendar_id (str): The ID of the calendar being watched.
+
+        Returns:
+            bool: True if the channel was added.
+        """
+
+        return self._db_handler.update_document(
+            CHANNELS_COLLECTION,
+            {"channel_id": channel["id"]},
+            {
+                "resource_id": channel["resourceId"],
+                "calendar_id": calendar_id,
+                "expiration": (
+                    int(channel["expiration"])
+                    if channel.get("expiration")
+                    else None
+                ),
+                "last_message_number": 0,
+            },
+            upsert=True,
+        )
+
+    def get_channels(self, calendar_id: str) -> list[dict]:
+        """Get the channels watching a calendar.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+
+        Returns:
+            list[dict]: The channel documents.
+        """
+
+        return self._db_handler.get_documents(
+            CHANNELS_COLLECTION,
+            {"calendar_id": calendar_id},
+            {"_id": 0, "channel_id": 1, "resource_id": 1, "expiration": 1},
+        )
+
+    def remove_channel(self, channel_id: str) -> bool:
+        """Remove a channel from the index.
+
+        Args:
+            channel_id (str): The ID of the channel.
+
+        Returns:
+            bool: True if the channel was removed.
+        """
+
+        return self._db_handler.delete_document(
+            CHANNELS_COLLECTION, {"channel_id": channel_id}
+        )
+
+    def accept_message(
+        self, channel_id: str, resource_id: str, message_number: int
+    ) -> Optional[str]:
+        """Record a notification and find the calendar it is about.
+
+        The lookup and the message number update are a single atomic
+        operation, so a message is accepted at most once even when
+        deliveries race.
+
+        Args:
+            channel_id (str): The X-Goog-Channel-ID header.
+            resource_id (str): The X-Goog-Resource-ID header.
+            message_number (int): The X-Goog-Message-Number header.
+
+        Returns:
+            Optional[str]: The ID of the calendar, None if the channel is
+            unknown or the message is a duplicate or out of order.
+        """
+
+        channel: Optional[dict] = self._db_handler.claim_document(
+            CHANNELS_COLLECTION,
+            {
+                "channel_id": channel_id,
+                "resource_id": resource_id,
+                "last_message_number": {"$lt": message_number},
+            },
+            {"last_message_number": message_number},
+            upsert=False,
+        )
+
+        return channel["calendar_id"] if channel else None
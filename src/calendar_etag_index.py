@@ -0,0 +1,101 @@
+"""Keeps the current ETag of every event in the synced calendars."""
+
+from datetime import datetime, timedelta
+from typing import Optional
+from google_calendar_handler import GoogleCalendarHandler
+from mongodb_handler import MongoDbHandler
+from sync_state import IN_CALENDAR_QUERY
+
+# Allowance for clock differences when asking for events updated since
+# the last refresh.
+_UPDATED_MIN_SKEW: timedelta = timedelta(minutes=1)
+
+
+class CalendarETagIndex:
+    """In-memory index of the ETags of the tracked events in each calendar.
+
+    The first refresh of a calendar lists every event's ETag; later
+    refreshes only list the events updated since the previous one, so a
+    calendar with no changes costs one small list call. Only the ETags
+    of the events tracked in calendar_events are kept, so the index is
+    no larger than the set of events the sync checks, however many
+    other events the calendar holds.
+
+    Args:
+        calendar_handler (GoogleCalendarHandler): The calendar handler.
+        db_handler (MongoDbHandler): The database handler.
+    """
+
+    def __init__(
+        self,
+        calendar_handler: GoogleCalendarHandler,
+        db_handler: MongoDbHandler,
+    ):
+        self._calendar_handler: GoogleCalendarHandler = calendar_handler
+        self._db_handler: MongoDbHandler = db_handler
+        self._etags: dict[str, dict[str, Optional[str]]] = {}
+        self._refreshed_at: dict[str, datetime] = {}
+        self._fresh: set = set()
+
+    def start_cycle(self) -> None:
+        """Mark every calendar as needing a refresh before its next use."""
+
+        self._fresh = set()
+
+    def get_etags(self, calendar_id: str) -> dict[str, Optional[str]]:
+        """Get the ETags of a calendar's events, refreshed once per cycle.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+
+        Returns:
+            dict[str, Optional[str]]: The ETag of each event, None for
+            cancelled events.
+        """
+
+        if calendar_id not in self._fresh:
+            self._refresh(calendar_id)
+            self._fresh.add(calendar_id)
+
+        return self._etags[calendar_id]
+
+    def _refresh(self, calendar_id: str) -> None:
+        """Merge the ETags of recently updated events into the index.
+
+        ETags of events that are no longer tracked are dropped.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+        """
+
+        refreshed_at: datetime = datetime.utcnow()
+        last_refreshed_at: Optional[datetime] = self._refreshed_at.get(
+            calendar_id
+        )
+
+        changed_etags: dict = self._calendar_handler.list_event_etags(
+            calendar_id,
+            (
+                last_refreshed_at - _UPDATED_MIN_SKEW
+                if last_refreshed_at
+                else None
+            ),
+        )
+
+        tracked_ids: set = set(
+            self._db_handler.get_distinct_values(
+                "calendar_events",
+                "event_id",
+                {**IN_CALENDAR_QUERY, "calendar_id": calendar_id},
+            )
+        )
+
+        self._etags[calendar_id] = {
+            event_id: etag
+            for event_id, etag in {
+                **self._etags.get(calendar_id, {}),
+                **changed_etags,
+            }.items()
+            if event_id in tracked_ids
+        }
+        self._refreshed_at[calendar_id] = refreshed_at
@@ -1,35 +1,203 @@
 """Main file for the calendar sync program."""
 
 from multiprocessing import Process
-from os import environ
+from os import environ, getpid
+from socket import gethostname
+from typing import Optional
 import cal_sync_api
+from calendar_channel_index import CalendarChannelIndex
+from calendar_watcher import CalendarWatcher
+from config import get_config
+from cycle_tracer import CycleTracer, TracePublisher
 from dotenv import load_dotenv
-from factorys import calendar_handler_factory, db_handler_factory
+from factorys import (
+    calendar_handler_factory,
+    calendar_webhook_handler_factory,
+    db_handler_factory,
+    metrics_publisher_factory,
+)
 from google_calendar_handler import GoogleCalendarHandler
+from metrics import register_handler_metrics
+from metrics_publisher import MetricsPublisher
 from mongodb_handler import MongoDbHandler
+from outbox_dispatcher import OutboxDispatcher
+from schema_manager import SchemaManager
+from shard_lease_manager import ShardLeaseManager
 from sync_processor import SyncProcessor
+from sync_request_queue import SyncRequestQueue
+from sync_scheduler import SyncScheduler
 
 load_dotenv("./.env")
 
 
+def run_sync_worker(sync_interval: int) -> None:
+    """Runs a sync worker that syncs the shards it holds leases on.
+
+    The handlers are created inside the worker process, as MongoDB
+    clients and HTTP connections must not be shared across a fork.
+
+    Args:
+        sync_interval (int): The interval in seconds between syncs.
+    """
+
+    calendar_handler: GoogleCalendarHandler = calendar_handler_factory(
+        environ["CALENDAR_TYPE"]
+    )
+    db_handler: MongoDbHandler = db_handler_factory(environ["DB_TYPE"])
+
+    lease_manager: ShardLeaseManager = ShardLeaseManager(
+        db_handler,
+        worker_id=f"{gethostname()}-{getpid()}",
+        shard_count=int(environ.get("SYNC_SHARDS", "16")),
+        lease_seconds=int(environ.get("SYNC_LEASE_SECONDS", "30")),
+    )
+    sync_mode: str = environ.get("SYNC_MODE", "incremental")
+    cycle_budget: Optional[str] = environ.get("SYNC_CYCLE_BUDGET")
+    trace_cycles: int = int(environ.get("SYNC_TRACE_CYCLES", "20"))
+
+    sync_processor: SyncProcessor = SyncProcessor(
+        calendar_handler,
+        db_handler,
+        incremental=sync_mode == "incremental",
+        resync_windows=int(environ.get("SYNC_RESYNC_WINDOWS", "4")),
+        db_batch_size=int(environ.get("SYNC_DB_BATCH_SIZE", "500")),
+        pipeline_depth=int(environ.get("SYNC_PIPELINE_DEPTH", "2")),
+        lease_manager=lease_manager,
+        scheduler=(
+            SyncScheduler(
+                min_interval=float(
+                    environ.get("SYNC_MIN_CHECK_INTERVAL", "60")
+                )
+            )
+            if sync_mode == "scheduled"
+            else None
+        ),
+        cycle_budget=float(cycle_budget) if cycle_budget else None,
+        request_queue=SyncRequestQueue(db_handler),
+        request_poll_interval=float(
+            environ.get("SYNC_REQUEST_POLL_INTERVAL", "1")
+        ),
+        tracer=CycleTracer(
+            max_cycles=trace_cycles,
+            max_spans=int(environ.get("SYNC_TRACE_MAX_SPANS", "1000")),
+            on_cycle_end=TracePublisher(
+                db_handler, "sync_worker", max_cycles=trace_cycles
+            ),
+        ),
+        max_sync_attempts=int(environ.get("SYNC_MAX_ATTEMPTS", "5")),
+    )
+
+    register_handler_metrics(calendar_handler=calendar_handler)
+    metrics_publisher: Optional[MetricsPublisher] = metrics_publisher_factory(
+        db_handler, "sync_worker"
+    )
+
+    lease_manager.start()
+    try:
+        sync_processor.sync(sync_interval)
+    finally:
+        lease_manager.stop()
+        if metrics_publisher:
+            metrics_publisher.stop()
+
+
+def run_outbox_dispatcher() -> None:
+    """Runs a dispatcher that adds the events in the outbox to the calendar.
+
+    The handlers are created inside the dispatcher process, as MongoDB
+    clients and HTTP connections must not be shared across a fork.
+    """
+
+    calendar_handler: GoogleCalendarHandler = calendar_handler_factory(
+        environ["CALENDAR_TYPE"]
+    )
+    db_handler: MongoDbHandler = db_handler_factory(environ["DB_TYPE"])
+
+    outbox_dispatcher: OutboxDispatcher = OutboxDispatcher(
+        db_handler,
+        calendar_handler,
+        get_config(),
+        batch_size=int(environ.get("OUTBOX_BATCH_SIZE", "200")),
+        lease_seconds=float(environ.get("OUTBOX_LEASE_SECONDS", "60")),
+        max_attempts=int(environ.get("OUTBOX_MAX_ATTEMPTS", "5")),
+    )
+
+    register_handler_metrics(calendar_handler=calendar_handler)
+    metrics_publisher: Optional[MetricsPublisher] = metrics_publisher_factory(
+        db_handler, "outbox_dispatcher"
+    )
+
+    try:
+        outbox_dispatcher.run(
+            poll_interval=float(environ.get("OUTBOX_POLL_INTERVAL", "1"))
+        )
+    finally:
+        if metrics_publisher:
+            metrics_publisher.stop()
+
+
+def run_calendar_watcher(webhook_url: str) -> None:
+    """Runs a watcher that keeps a channel open on every synced calendar.
+
+    A single watcher creates the channels, so the API processes never
+    open duplicate channels on the same calendar.
+
+    Args:
+        webhook_url (str): The URL of the API's calendar webhook route.
+    """
+
+    db_handler: MongoDbHandler = db_handler_factory(environ["DB_TYPE"])
+
+    calendar_watcher: CalendarWatcher = CalendarWatcher(
+        db_handler,
+        calendar_webhook_handler_factory(environ["CALENDAR_TYPE"]),
+        CalendarChannelIndex(db_handler),
+        webhook_url,
+        renew_before=float(
+            environ.get("CALENDAR_WATCH_RENEW_BEFORE", "86400")
+        ),
+    )
+    calendar_watcher.run(
+        check_interval=float(environ.get("CALENDAR_WATCH_INTERVAL", "3600"))
+    )
+
+
 class CalendarSync:
     """Main class for the calendar sync program."""
 
     def __init__(self):
-        self._calendar_handler: GoogleCalendarHandler = (
-            calendar_handler_factory(environ["CALENDAR_TYPE"])
+        self._sync_workers: int = int(environ.get("SYNC_WORKERS", "1"))
+        self._outbox_enabled: bool = (
+            environ.get("OUTBOX_ENABLED", "false").lower() == "true"
         )
-
-        self._test_db_handler: MongoDbHandler = db_handler_factory(
-            environ["DB_TYPE"]
-        )
-        self._sync_processor: SyncProcessor = SyncProcessor(
-            self._calendar_handler, self._test_db_handler
+        # Calendars are only watched when the API can be reached at a
+        # public URL to receive the notifications.
+        self._calendar_webhook_url: Optional[str] = environ.get(
+            "CALENDAR_WEBHOOK_URL"
         )
 
+    def prepare_database(self) -> None:
+        """Reconciles the database indexes before any process starts.
+
+        The connection is closed afterwards, as MongoDB clients must not
+        be shared across a fork.
+        """
+
+        db_handler: MongoDbHandler = db_handler_factory(environ["DB_TYPE"])
+        schema_manager: SchemaManager = SchemaManager(db_handler)
+
+        try:
+            schema_manager.reconcile()
+            if environ.get("DB_VERIFY_INDEXES", "false").lower() == "true":
+                schema_manager.verify_query_plans()
+        finally:
+            db_handler.close()
+
     def main(self):
         """Runs all the processes of the program."""
 
+        self.prepare_database()
+
         process_1: Process = Process(
             target=cal_sync_api.run,
             args=("cal_sync_api:APP",),
@@ -40,18 +208,35 @@ class CalendarSync:
             },
         )
 
-        process_2: Process = Process(
-            target=self._sync_processor.sync,
-            args=(int(environ["SYNC_INTERVAL"]),),
-        )
+        sync_processes: list[Process] = [
+            Process(
+                target=run_sync_worker,
+                args=(int(environ["SYNC_INTERVAL"]),),
+            )
+            for _ in range(self._sync_workers)
+        ]
+        if self._outbox_enabled:
+            sync_processes.append(
+                Process(target=run_outbox_dispatcher, name="outbox")
+            )
+        if self._calendar_webhook_url:
+            sync_processes.append(
+                Process(
+                    target=run_calendar_watcher,
+                    args=(self._calendar_webhook_url,),
+                    name="calendar_watcher",
+                )
+            )
 
         # Start processes
         process_1.start()
-        process_2.start()
+        for sync_process in sync_processes:
+            sync_process.start()
 
         # Wait for processes to finish
         process_1.join()
-        process_2.join()
+        for sync_process in sync_processes:
+            sync_process.join()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+"""Keeps a push notification channel open on every synced calendar."""
+
+from threading import Event
+from time import time
+from calendar_channel_index import CalendarChannelIndex
+from calendar_webhook_handler import CalendarWebhookHandler
+from exceptions import CalendarWebhookError
+from logging_funcs import log_error, log_info, log_warning
+from mongodb_handler import MongoDbHandler
+
+
+class CalendarWatcher:
+    """Creates and renews the watch channels of the synced calendars.
+
+    Each channel created is added to the channel index, so the API
+    accepts its notifications. A calendar whose channels all expire
+    within the renewal margin gets a new channel, and its old channels
+    are stopped and removed once the new one is in the index.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        webhook_handler (CalendarWebhookHandler): Creates the channels.
+        channel_index (CalendarChannelIndex): The channel index.
+        webhook_url (str): The URL of the API's calendar webhook route.
+        renew_before (float): How long in seconds before a channel
+        expires to replace it.
+    """
+
+    def __init__(
+        self,
+        db_handler: MongoDbHandler,
+        webhook_handler: CalendarWebhookHandler,
+        channel_index: CalendarChannelIndex,
+        webhook_url: str,
+        renew_before: float = 24 * 60 * 60,
+    ):
+        self._db_handler: MongoDbHandler = db_handler
+        self._webhook_handler: CalendarWebhookHandler = webhook_handler
+        self._channel_index: CalendarChannelIndex = channel_index
+        self._webhook_url: str = webhook_url
+        self._renew_before: float = renew_before
+        self._stop: Event = Event()
+
+    def run(self, check_interval: float = 60 * 60) -> None:
+        """Watch the calendars until stopped.
+
+        Args:
+            check_interval (float): How long to wait in seconds between
+            checks of the channels.
+        """
+
+        while not self._stop.is_set():
+            try:
+                self.watch_calendars()
+            except Exception as error:  # pylint: disable=broad-except
+                log_error(
+                    f"Unable to watch the calendars: {error}", "watch_error"
+                )
+
+            self._stop.wait(check_interval)
+
+    def stop(self) -> None:
+        """Stop the watcher after its current check."""
+
+        self._stop.set()
+
+    def watch_calendars(self) -> int:
+        """Open a channel on each calendar without one that stays open.
+
+        Returns:
+            int: The number of channels created.
+        """
+
+        renew_at: int = int((time() + self._renew_before) * 1000)
+        created: int = 0
+
+        for calendar_id in self._db_handler.get_distinct_values(
+            "calendar_events", "calendar_id"
+        ):
+            channels: list[dict] = self._channel_index.get_channels(
+                calendar_id
+            )
+            if any(
+                channel.get("expiration") is None
+                or channel["expiration"] > renew_at
+                for channel in channels
+            ):
+                continue
+
+            if self.watch_calendar(calendar_id, channels):
+                created += 1
+
+        if created:
+            log_info(f"Opened {created} calendar watch channels")
+        return created
+
+    def watch_calendar(self, calendar_id: str, old_channels: list) -> bool:
+        """Open a channel on a calendar, replacing its old channels.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+            old_channels (list): The calendar's channels being replaced.
+
+        Returns:
+            bool: True if the channel was created and added to the index.
+        """
+
+        try:
+            channel: dict = self._webhook_handler.create_webhook(
+                self._webhook_url, calendar_id
+            )
+        except CalendarWebhookError as error:
+            log_warning(f"Unable to watch calendar {calendar_id}: {error}")
+            return False
+
+        if not self._channel_index.add_channel(channel, calendar_id):
+            log_warning(f"Unable to index the channel of {calendar_id}")
+            return False
+
+        for old_channel in old_channels:
+            try:
+                self._webhook_handler.delete_webhook(
+                    old_channel["channel_id"], old_channel["resource_id"]
+                )
+            except CalendarWebhookError:
+                # Expired channels can no longer be stopped.
+                pass
+            self._channel_index.remove_channel(old_channel["channel_id"])
+
+        return True
@@ -0,0 +1,117 @@
+"""In-memory aggregates of the durations and outcomes of function calls."""
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from threading import Lock
+
+# The upper bounds in seconds of the duration histogram buckets. Calls
+# slower than the last bound are only counted in the total.
+DURATION_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+@dataclass(slots=True)
+class _FunctionStats:
+    """The aggregates of one function's calls."""
+
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    buckets: list[int] = field(
+        default_factory=lambda: [0] * len(DURATION_BUCKETS)
+    )
+
+
+class CallStats:
+    """Aggregates function calls by function name.
+
+    Recording a call only updates a fixed number of counters, so the
+    cost of a call and the memory used do not grow with traffic.
+    """
+
+    def __init__(self):
+        self._functions: dict[str, _FunctionStats] = {}
+        self._lock: Lock = Lock()
+
+    def record(self, function_name: str, seconds: float, failed: bool) -> None:
+        """Record a call.
+
+        Args:
+            function_name (str): The name of the function called.
+            seconds (float): How long the call took.
+            failed (bool): Whether the call raised an exception.
+        """
+
+        bucket: int = bisect_left(DURATION_BUCKETS, seconds)
+
+        with self._lock:
+            stats: _FunctionStats = self._functions.get(function_name)
+            if stats is None:
+                stats = self._functions[function_name] = _FunctionStats()
+
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_seconds += seconds
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+            if bucket < len(DURATION_BUCKETS):
+                stats.buckets[bucket] += 1
+
+    def snapshot(self) -> dict[str, dict]:
+        """Get the aggregates of every function called.
+
+        Returns:
+            dict[str, dict]: The number of calls and errors, the total
+            and slowest durations and the cumulative bucket counts, keyed
+            by function name.
+        """
+
+        with self._lock:
+            functions: list[tuple] = [
+                (
+                    name,
+                    stats.calls,
+                    stats.errors,
+                    stats.total_seconds,
+                    stats.max_seconds,
+                    list(stats.buckets),
+                )
+                for name, stats in self._functions.items()
+            ]
+
+        snapshot: dict[str, dict] = {}
+        for name, calls, errors, total, slowest, buckets in functions:
+            cumulative: int = 0
+            counts: dict[float, int] = {}
+            for bound, count in zip(DURATION_BUCKETS, buckets):
+                cumulative += count
+                counts[bound] = cumulative
+
+            snapshot[name] = {
+                "calls": calls,
+                "errors": errors,
+                "total_seconds": total,
+                "mean_seconds": total / calls,
+                "max_seconds": slowest,
+                "buckets": counts,
+            }
+
+        return snapshot
+
+    def reset(self) -> None:
+        """Remove every aggregate."""
+
+        with self._lock:
+            self._functions.clear()
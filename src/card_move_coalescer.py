@@ -0,0 +1,245 @@
+"""Coalesces bursts of board card moves into single updates per card."""
+
+from asyncio import Queue, wait_for
+from dataclasses import dataclass
+from time import monotonic
+from typing import Optional
+from config import Config
+from data_models import BoardAction
+from exceptions import SyncError
+from fastapi.concurrency import run_in_threadpool
+from google_calendar_handler import GoogleCalendarHandler
+from logging_funcs import log_error, log_info, log_warning
+from mongodb_handler import MongoDbHandler
+from sync_state import mark_dirty
+
+
+@dataclass
+class _PendingMove:
+    """The latest move of a card and when its burst of moves started."""
+
+    board_action: BoardAction
+    first_seen: float
+    last_seen: float
+
+
+class CardMoveCoalescer:
+    """Debounces card moves and applies them in batches.
+
+    A card's moves are held until no new move has arrived for the quiet
+    window, and only its final list is applied. Every card that is ready
+    at the same time is applied together, with one database lookup, one
+    bulk write and one batch of calendar updates.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        calendar_handler (GoogleCalendarHandler): The calendar handler.
+        config (Config): The program configuration.
+        quiet_window (float): Seconds without moves before a card's
+        final move is applied.
+        max_delay (float): The longest a move is held in seconds, for
+        cards that never go quiet.
+    """
+
+    def __init__(
+        self,
+        db_handler: MongoDbHandler,
+        calendar_handler: GoogleCalendarHandler,
+        config: Config,
+        quiet_window: float = 2.0,
+        max_delay: float = 10.0,
+    ):
+        self._db_handler: MongoDbHandler = db_handler
+        self._calendar_handler: GoogleCalendarHandler = calendar_handler
+        self._config: Config = config
+        self._quiet_window: float = quiet_window
+        self._max_delay: float = max_delay
+        self._pending: dict[str, _PendingMove] = {}
+
+    def add(self, board_action: BoardAction, now: float) -> None:
+        """Record a card move, replacing any pending move of the card.
+
+        Args:
+            board_action (BoardAction): The card move.
+            now (float): The current monotonic time.
+        """
+
+        pending: Optional[_PendingMove] = self._pending.get(
+            board_action.card_id
+        )
+        first_seen: float = pending.first_seen if pending else now
+        self._pending[board_action.card_id] = _PendingMove(
+            board_action, first_seen, now
+        )
+
+    def pop_ready(self, now: float) -> list[BoardAction]:
+        """Take the moves of the cards that are ready to be applied.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            list[BoardAction]: The final move of each ready card.
+        """
+
+        ready_ids: list[str] = [
+            card_id
+            for card_id, pending in self._pending.items()
+            if now >= self._due_at(pending)
+        ]
+        return [
+            self._pending.pop(card_id).board_action for card_id in ready_ids
+        ]
+
+    def time_to_next_flush(self, now: float) -> Optional[float]:
+        """Get how long until the next card is ready.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            Optional[float]: The time in seconds, None if no moves are
+            pending.
+        """
+
+        if not self._pending:
+            return None
+
+        return max(
+            0.0,
+            min(self._due_at(pending) for pending in self._pending.values())
+            - now,
+        )
+
+    async def run(self, queue: Queue) -> None:
+        """Take card moves off a queue and apply them until cancelled.
+
+        Flushes run one at a time, so an older update of a card can
+        never overwrite a newer one. The moves of a failed flush are
+        pending again, so they are retried after the quiet window.
+
+        Args:
+            queue (Queue): The queue of card moves.
+        """
+
+        while True:
+            try:
+                board_action: BoardAction = await wait_for(
+                    queue.get(), self.time_to_next_flush(monotonic())
+                )
+                self.add(board_action, monotonic())
+                queue.task_done()
+            except TimeoutError:
+                pass
+
+            ready: list[BoardAction] = self.pop_ready(monotonic())
+            if not ready:
+                continue
+
+            try:
+                await run_in_threadpool(self.flush, ready)
+            except Exception as error:  # pylint: disable=broad-except
+                log_error(
+                    f"Unable to apply {len(ready)} card moves: {error}",
+                    "card_move_error",
+                )
+                for board_action in ready:
+                    self.add(board_action, monotonic())
+
+    def flush(self, board_actions: list[BoardAction]) -> None:
+        """Apply the final moves of a set of cards.
+
+        Args:
+            board_actions (list[BoardAction]): The final move of each
+            card.
+
+        Raises:
+            PyMongoError: If the cards' events could not be read.
+            SyncError: If the new statuses could not be written.
+        """
+
+        statuses: dict[str, str] = {
+            board_action.card_id: self._config.get_list_status(
+                board_action.list_after_name or ""
+            )
+            for board_action in board_actions
+        }
+        # Read with a cursor, which raises on a database error rather
+        # than returning no events, so the moves are not dropped.
+        events: list[dict] = [
+            event
+            for chunk in self._db_handler.iter_documents(
+                "calendar_events",
+                {"card_id": {"$in": list(statuses)}},
+                {
+                    "_id": 0,
+                    "card_id": 1,
+                    "event_id": 1,
+                    "calendar_id": 1,
+                    "current_status": 1,
+                },
+            )
+            for event in chunk
+        ]
+        moved_events: list[dict] = [
+            event
+            for event in events
+            if event["current_status"] != statuses[event["card_id"]]
+        ]
+
+        if not moved_events:
+            return
+
+        if not self._db_handler.bulk_update_documents(
+            "calendar_events",
+            [
+                (
+                    {"card_id": event["card_id"]},
+                    mark_dirty({"current_status": statuses[event["card_id"]]}),
+                )
+                for event in moved_events
+            ],
+        ):
+            raise SyncError(
+                f"Unable to record the moves of {len(moved_events)} events"
+            )
+
+        # Events still in the outbox get their colour when they are added.
+        _, failed_updates = self._calendar_handler.patch_event_colors(
+            [
+                (
+                    event["event_id"],
+                    self._config.get_status_colour_id(
+                        statuses[event["card_id"]]
+                    ),
+                    event["calendar_id"],
+                )
+                for event in moved_events
+                if event["event_id"]
+            ]
+        )
+
+        log_info(
+            f"Applied {len(moved_events)} card moves from "
+            f"{len(board_actions)} cards"
+        )
+        if failed_updates:
+            log_warning(
+                f"Failed to update the colour of {len(failed_updates)} "
+                "calendar events"
+            )
+
+    def _due_at(self, pending: _PendingMove) -> float:
+        """Get when a pending move should be applied.
+
+        Args:
+            pending (_PendingMove): The pending move.
+
+        Returns:
+            float: The monotonic time the move is due.
+        """
+
+        return min(
+            pending.last_seen + self._quiet_window,
+            pending.first_seen + self._max_delay,
+        )
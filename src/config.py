@@ -1,6 +1,6 @@
 """Provides the configuration for the program."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from json import load as json_load
 from os import environ
 from dotenv import load_dotenv
@@ -13,6 +13,7 @@ class Config:
     """Configuration for the program."""
 
     status_colour_ids: dict
+    list_statuses: dict = field(default_factory=dict)
 
     def get_status_colour_id(self, status_name: str) -> int:
         """Get the status colour id for a status.
@@ -33,6 +34,23 @@ class Config:
             )
             return self.status_colour_ids["DEFAULT"]
 
+    def get_list_status(self, list_name: str) -> str:
+        """Get the status a board list represents.
+
+        Lists not named in the config map to their name in upper snake
+        case, e.g. "In Progress" becomes "IN_PROGRESS".
+
+        Args:
+            list_name (str): The name of the list.
+
+        Returns:
+            str: The status name.
+        """
+
+        if list_name in self.list_statuses:
+            return self.list_statuses[list_name]
+        return "_".join(list_name.upper().split())
+
 
 def get_config() -> Config:
     """Gets the configuration for the program.
@@ -0,0 +1,270 @@
+"""Records the phases of recent sync cycles as timed spans."""
+
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from threading import Lock, current_thread
+from time import perf_counter, time
+from typing import Callable, Iterator, Optional
+from metrics_publisher import process_id
+from mongodb_handler import MongoDbHandler
+
+TRACES_COLLECTION: str = "sync_cycle_traces"
+
+
+class CycleTracer:
+    """Keeps the spans of the last few sync cycles in a ring buffer.
+
+    A cycle is traced from start to end, and every span started while
+    it runs is added to it, from whichever thread, so the pipeline's
+    stages are recorded too. Spans started outside a cycle are not
+    recorded.
+
+    Args:
+        max_cycles (int): How many cycle traces to keep.
+        max_spans (int): The most spans to record in one cycle; further
+        spans are only counted.
+        on_cycle_end (Optional[Callable[[dict], None]]): Called with the
+        trace of each cycle when it ends.
+    """
+
+    def __init__(
+        self,
+        max_cycles: int = 20,
+        max_spans: int = 1000,
+        on_cycle_end: Optional[Callable[[dict], None]] = None,
+    ):
+        self._traces: deque[dict] = deque(maxlen=max_cycles)
+        self._max_spans: int = max_spans
+        self._on_cycle_end: Optional[Callable] = on_cycle_end
+        self._current: Optional[dict] = None
+        self._current_started: float = 0.0
+        self._lock: Lock = Lock()
+
+    @contextmanager
+    def cycle(self, name: str) -> Iterator[Optional[dict]]:
+        """Trace a cycle.
+
+        A cycle started while another is being traced is part of the
+        outer one.
+
+        Args:
+            name (str): The kind of cycle, e.g. "sync_cycle".
+
+        Yields:
+            Optional[dict]: The cycle's attributes, None if the cycle is
+            part of an outer one.
+        """
+
+        with self._lock:
+            if self._current is not None:
+                nested: bool = True
+            else:
+                nested = False
+                self._current_started = perf_counter()
+                self._current = {
+                    "name": name,
+                    "started_at": time(),
+                    "duration": None,
+                    "thread": current_thread().name,
+                    "attributes": {},
+                    "spans": [],
+                    "dropped_spans": 0,
+                }
+
+        if nested:
+            yield None
+            return
+
+        try:
+            yield self._current["attributes"]
+        finally:
+            with self._lock:
+                trace: dict = self._current
+                trace["duration"] = perf_counter() - self._current_started
+                self._current = None
+                self._traces.append(trace)
+
+            if self._on_cycle_end:
+                self._on_cycle_end(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[dict]:
+        """Trace a phase of the current cycle.
+
+        Args:
+            name (str): The name of the phase, e.g. "calendar_fetch".
+            **attributes: Attributes of the phase, e.g. a calendar ID.
+
+        Yields:
+            dict: The span's attributes, to add counts and sizes to.
+        """
+
+        started: float = perf_counter()
+        try:
+            yield attributes
+        finally:
+            ended: float = perf_counter()
+
+            with self._lock:
+                trace: Optional[dict] = self._current
+                if trace is not None and started >= self._current_started:
+                    if len(trace["spans"]) < self._max_spans:
+                        trace["spans"].append(
+                            {
+                                "name": name,
+                                "start": started - self._current_started,
+                                "duration": ended - started,
+                                "thread": current_thread().name,
+                                "attributes": attributes,
+                            }
+                        )
+                    else:
+                        trace["dropped_spans"] += 1
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a counter of the current cycle, e.g. of drifted events.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int): The amount to add.
+        """
+
+        with self._lock:
+            if self._current is not None:
+                attributes: dict = self._current["attributes"]
+                attributes[name] = attributes.get(name, 0) + amount
+
+    def traces(self) -> list[dict]:
+        """Get the kept cycle traces.
+
+        Returns:
+            list[dict]: The traces, oldest first.
+        """
+
+        with self._lock:
+            return list(self._traces)
+
+
+class TracePublisher:
+    """Stores a process's cycle traces so the API can serve them.
+
+    Each finished trace is appended to the process's stored traces, and
+    only the most recent ones are kept, so a cycle writes one trace
+    however many are kept.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        process_name (str): The name of the process, e.g. "sync_worker".
+        max_cycles (int): How many traces to keep.
+    """
+
+    def __init__(
+        self,
+        db_handler: MongoDbHandler,
+        process_name: str,
+        max_cycles: int = 20,
+    ):
+        self._db_handler: MongoDbHandler = db_handler
+        self._process_name: str = process_name
+        self._max_cycles: int = max_cycles
+
+    def __call__(self, trace: dict) -> None:
+        """Add a finished trace to the process's stored traces.
+
+        Args:
+            trace (dict): The trace of the cycle.
+        """
+
+        self._db_handler.modify_document(
+            TRACES_COLLECTION,
+            {"_id": process_id()},
+            {
+                "$set": {
+                    "process": self._process_name,
+                    "updated_at": datetime.utcnow(),
+                },
+                "$push": {
+                    "traces": {
+                        "$each": [trace],
+                        "$slice": -self._max_cycles,
+                    }
+                },
+            },
+            projection={"_id": 1},
+        )
+
+
+def recent_traces_query(max_age: float) -> dict:
+    """Build the query for the traces of recently active processes.
+
+    Args:
+        max_age (float): How long ago in seconds the traces must have
+        been stored.
+
+    Returns:
+        dict: The query.
+    """
+
+    return {
+        "updated_at": {"$gte": datetime.utcnow() - timedelta(seconds=max_age)}
+    }
+
+
+def chrome_trace(processes: list[dict]) -> dict:
+    """Convert stored cycle traces to the Chrome trace event format.
+
+    The result can be loaded in chrome://tracing or Perfetto. Each
+    process is shown as a process and each of its threads as a track.
+
+    Args:
+        processes (list[dict]): The stored documents, each with the
+        process name and its traces.
+
+    Returns:
+        dict: The trace events.
+    """
+
+    events: list[dict] = []
+
+    for pid, document in enumerate(processes, start=1):
+        events.append(
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "args": {"name": document.get("process", str(pid))},
+            }
+        )
+        thread_ids: dict[str, int] = {}
+
+        for trace in document.get("traces", []):
+            for span in [
+                {**trace, "start": 0.0},
+                *trace["spans"],
+            ]:
+                if span["thread"] not in thread_ids:
+                    thread_ids[span["thread"]] = len(thread_ids) + 1
+                    events.append(
+                        {
+                            "name": "thread_name",
+                            "ph": "M",
+                            "pid": pid,
+                            "tid": thread_ids[span["thread"]],
+                            "args": {"name": span["thread"]},
+                        }
+                    )
+
+                events.append(
+                    {
+                        "name": span["name"],
+                        "ph": "X",
+                        "pid": pid,
+                        "tid": thread_ids[span["thread"]],
+                        "ts": (trace["started_at"] + span["start"]) * 1e6,
+                        "dur": (span["duration"] or 0.0) * 1e6,
+                        "args": span["attributes"],
+                    }
+                )
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
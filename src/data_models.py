@@ -1,6 +1,7 @@
 """Data models for the program"""
 
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -28,3 +29,21 @@ class Board:
     id: str
     name: str
     closed: bool
+
+
+@dataclass
+class BoardAction:
+    """Data model for the parts of a board webhook action that are used."""
+    action_type: str
+    board_id: Optional[str] = None
+    card_id: Optional[str] = None
+    list_after_id: Optional[str] = None
+    list_after_name: Optional[str] = None
+
+
+@dataclass
+class BoardSnapshot:
+    """Data model for a board with its open lists and cards."""
+    board: Board
+    lists: list[BoardList]
+    cards: list[BoardCard]
@@ -0,0 +1,112 @@
+"""Keeps the last seen ETag and body of calendar events."""
+
+from collections import OrderedDict
+from copy import deepcopy
+from threading import Lock
+from typing import Optional
+
+
+class ETagStore:
+    """A bounded, least recently used store of event bodies by ETag.
+
+    Bodies are stored with the name of the field profile they were
+    requested with, as a partial body can only answer a conditional
+    request for the same fields.
+
+    Args:
+        max_entries (int): The most events to keep; the least recently
+        used are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self._max_entries: int = max_entries
+        self._events: OrderedDict[tuple[str, str], tuple[str, dict]] = (
+            OrderedDict()
+        )
+        self._lock: Lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def get(
+        self, calendar_id: str, event_id: str, profile: str
+    ) -> Optional[dict]:
+        """Get a copy of the last seen body of an event.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+            event_id (str): The ID of the event.
+            profile (str): The field profile the body is needed with.
+
+        Returns:
+            Optional[dict]: The event body, None if it is not stored with
+            the profile.
+        """
+
+        with self._lock:
+            entry: Optional[tuple[str, dict]] = self._events.get(
+                (calendar_id, event_id)
+            )
+            if entry is None or entry[0] != profile:
+                return None
+            self._events.move_to_end((calendar_id, event_id))
+
+        return deepcopy(entry[1])
+
+    def get_etag(
+        self, calendar_id: str, event_id: str, profile: Optional[str] = None
+    ) -> Optional[str]:
+        """Get the last seen ETag of an event.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+            event_id (str): The ID of the event.
+            profile (Optional[str]): Only return the ETag if the body is
+            stored with this field profile. Any profile if None.
+
+        Returns:
+            Optional[str]: The ETag, None if the event is not stored.
+        """
+
+        with self._lock:
+            entry: Optional[tuple[str, dict]] = self._events.get(
+                (calendar_id, event_id)
+            )
+
+        if entry is None or (profile is not None and entry[0] != profile):
+            return None
+        return entry[1].get("etag")
+
+    def put(self, calendar_id: str, event: dict, profile: str) -> None:
+        """Store the body of an event, if it has an ETag.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+            event (dict): The event body as returned by the API.
+            profile (str): The field profile the body was requested
+            with.
+        """
+
+        if not event.get("etag") or not event.get("id"):
+            return
+
+        with self._lock:
+            self._events[(calendar_id, event["id"])] = (
+                profile,
+                deepcopy(event),
+            )
+            self._events.move_to_end((calendar_id, event["id"]))
+
+            while len(self._events) > self._max_entries:
+                self._events.popitem(last=False)
+
+    def discard(self, calendar_id: str, event_id: str) -> None:
+        """Forget an event.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+            event_id (str): The ID of the event.
+        """
+
+        with self._lock:
+            self._events.pop((calendar_id, event_id), None)
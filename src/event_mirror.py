@@ -0,0 +1,90 @@
+"""Keeps a local copy of calendar event bodies for API reads."""
+
+from datetime import datetime
+from typing import Optional
+
+# The field profile the mirrored bodies are requested with.
+MIRROR_PROFILE: str = "mirror"
+
+# The fields of a calendar_events document the API reads an event from.
+MIRROR_PROJECTION: dict = {
+    "_id": 0,
+    "event_id": 1,
+    "calendar_id": 1,
+    "mirror": 1,
+}
+
+# The mirrored fields that the sync's own reads and writes return, so
+# the sync can refresh them whichever mode it runs in.
+SYNC_MIRROR_FIELDS: tuple = (
+    "etag",
+    "status",
+    "colorId",
+    "updated",
+    "start",
+    "end",
+)
+
+
+def mirror_update(query: dict, calendar_event: dict) -> tuple[dict, dict]:
+    """Build the update that stores a calendar event in the mirror.
+
+    The update only applies if the mirrored body is not newer than the
+    new one, so an update that arrives late cannot overwrite a change
+    that was mirrored before it.
+
+    Args:
+        query (dict): The query selecting the calendar_events document.
+        calendar_event (dict): The event body as returned by the API.
+
+    Returns:
+        tuple[dict, dict]: The guarded query and the values to set.
+    """
+
+    guarded_query: dict = dict(query)
+    if calendar_event.get("updated"):
+        guarded_query["mirror.updated"] = {
+            "$not": {"$gt": calendar_event["updated"]}
+        }
+
+    return guarded_query, {
+        "mirror": calendar_event,
+        "mirrored_at": datetime.utcnow(),
+    }
+
+
+def mirror_merge(
+    query: dict, calendar_event: dict
+) -> Optional[tuple[dict, dict]]:
+    """Build the update that refreshes a mirrored body from a partial one.
+
+    The sync requests events with fewer fields than the mirror keeps,
+    so only those fields are set, and only on a document that already
+    mirrors an older version of the event.
+
+    Args:
+        query (dict): The query selecting the calendar_events document.
+        calendar_event (dict): The event body as returned by the API.
+
+    Returns:
+        Optional[tuple[dict, dict]]: The guarded query and the values to
+        set, None if the body has no update time to compare.
+    """
+
+    if not calendar_event.get("updated"):
+        return None
+
+    values: dict = {
+        f"mirror.{field_name}": calendar_event[field_name]
+        for field_name in SYNC_MIRROR_FIELDS
+        if field_name in calendar_event
+    }
+    # The calendar handler fills in a missing colour as "Not specified",
+    # which the API itself never returns.
+    if values.get("mirror.colorId") == "Not specified":
+        del values["mirror.colorId"]
+
+    return {
+        **query,
+        "mirror.updated": {"$lt": calendar_event["updated"]},
+    }, {**values, "mirrored_at": datetime.utcnow()}
@@ -31,3 +31,29 @@ class CalendarWebhookError(Exception):
     def __init__(self, message: str):
         self.message: str = message
         super().__init__(self.message)
+
+
+class SyncTokenExpiredError(Exception):
+    """Raised when a calendar sync token has expired and a full resync
+    is required."""
+
+    def __init__(self, message: str):
+        self.message: str = message
+        super().__init__(self.message)
+
+
+class BoardApiError(Exception):
+    """The base class for Board API errors."""
+
+    def __init__(self, message: str, status_code: int = 0):
+        self.message: str = message
+        self.status_code: int = status_code
+        super().__init__(self.message)
+
+
+class SchemaError(Exception):
+    """Raised when the database's indexes cannot be reconciled."""
+
+    def __init__(self, message: str):
+        self.message: str = message
+        super().__init__(self.message)
@@ -3,13 +3,27 @@
 from ast import literal_eval
 from os import environ
 from typing import Optional
+from async_google_calendar_handler import AsyncGoogleCalendarHandler
+from board_handler import BoardHandler
+from board_versions import BoardVersions
+from cached_board_handler import CachedBoardHandler
 from dotenv import load_dotenv
+from etag_store import ETagStore
 from exceptions import FactoryError
-from google_calendar_handler import GoogleCalendarHandler
+from google_calendar_handler import (
+    CALENDAR_RATE_LIMIT,
+    GoogleCalendarHandler,
+)
 from logging_funcs import debug_log_decorator
+from metrics import METRICS_ENABLED, instrument
+from metrics_publisher import MetricsPublisher
 from mongodb_handler import MongoDbHandler
+from motor_db_handler import MotorDbHandler
+from rate_limiter import RateLimiter
+from trello_api_client import TRELLO_RATE_LIMITS
 from trello_handler import TrelloHandler
 from trello_webhook_handler import TrelloWebhookHandler
+from ttl_cache import TTLCache
 from google_webhook_handler import GoogleWebhookHandler
 
 load_dotenv("./.env")
@@ -28,13 +42,28 @@ def calendar_handler_factory(
         GoogleCalendarHandler: The calendar handler.
     """
     if type_of_handler == "google":
-        return GoogleCalendarHandler(
+        calendar_handler: GoogleCalendarHandler = GoogleCalendarHandler(
             scopes=literal_eval(environ["CALENDAR_SCOPES"]),
             token_file_path=environ["CALENDAR_TOKEN_FILE_PATH"],
             service_account_file_path=environ[
                 "CALENDAR_SERVICE_ACCOUNT_FILE_PATH"
             ],
+            batch_size=int(environ.get("CALENDAR_BATCH_SIZE", "50")),
+            max_batch_workers=int(environ.get("CALENDAR_BATCH_WORKERS", "4")),
+            etag_cache_size=int(
+                environ.get("CALENDAR_ETAG_CACHE_SIZE", "10000")
+            ),
+            http_pool_size=int(environ.get("CALENDAR_HTTP_POOL_SIZE", "8")),
+            rate_limiter=rate_limiter_factory(
+                {
+                    CALENDAR_RATE_LIMIT: (
+                        int(environ.get("CALENDAR_RATE_LIMIT", "600")),
+                        60.0,
+                    )
+                }
+            ),
         )
+        return instrument(calendar_handler, "google_calendar")
     else:
         raise FactoryError("Invalid calendar handler type")
 
@@ -50,34 +79,168 @@ def db_handler_factory(type_of_handler: str) -> Optional[MongoDbHandler]:
         MongoDbHandler: The database handler.
     """
     if type_of_handler == "mongo":
-        return MongoDbHandler(
-            host=environ["DB_HOST"],
-            port=int(environ["DB_PORT"]),
-            db_name=environ["DB_NAME"],
+        return instrument(
+            MongoDbHandler(
+                host=environ["DB_HOST"],
+                port=int(environ["DB_PORT"]),
+                db_name=environ["DB_NAME"],
+            ),
+            "mongodb",
         )
     else:
         raise FactoryError("Invalid database handler type")
 
 
 @debug_log_decorator
-def board_handler_factory(type_of_handler: str) -> Optional[TrelloHandler]:
+def rate_limiter_factory(
+    limits: dict[str, tuple[int, float]],
+) -> Optional[RateLimiter]:
+    """Create a rate limiter shared through the database.
+
+    Args:
+        limits (dict[str, tuple[int, float]]): The number of requests
+        allowed per window in seconds, by rate limit name.
+
+    Returns:
+        Optional[RateLimiter]: The rate limiter, None if rate limiting
+        is disabled.
+    """
+    if environ.get("RATE_LIMIT_ENABLED", "true").lower() != "true":
+        return None
+
+    return RateLimiter(
+        db_handler=db_handler_factory(environ.get("DB_TYPE", "mongo")),
+        limits=limits,
+        headroom=float(environ.get("RATE_LIMIT_HEADROOM", "0.9")),
+    )
+
+
+@debug_log_decorator
+def async_calendar_handler_factory(
+    type_of_handler: str,
+    calendar_handler: Optional[GoogleCalendarHandler] = None,
+) -> Optional[AsyncGoogleCalendarHandler]:
+    """Create an asynchronous calendar handler.
+
+    Args:
+        type_of_handler (str): The type of calendar handler to create.
+        calendar_handler (Optional[GoogleCalendarHandler]): A synchronous
+        handler to share credentials, the rate limiter and ETags with.
+
+    Returns:
+        AsyncGoogleCalendarHandler: The calendar handler.
+    """
+    if type_of_handler == "google":
+        return instrument(
+            AsyncGoogleCalendarHandler(
+                scopes=literal_eval(environ["CALENDAR_SCOPES"]),
+                token_file_path=environ["CALENDAR_TOKEN_FILE_PATH"],
+                service_account_file_path=environ[
+                    "CALENDAR_SERVICE_ACCOUNT_FILE_PATH"
+                ],
+                max_connections=int(
+                    environ.get("CALENDAR_ASYNC_MAX_CONNECTIONS", "100")
+                ),
+                rate_limiter=(
+                    calendar_handler.rate_limiter
+                    if calendar_handler
+                    else rate_limiter_factory(
+                        {
+                            CALENDAR_RATE_LIMIT: (
+                                int(environ.get("CALENDAR_RATE_LIMIT", "600")),
+                                60.0,
+                            )
+                        }
+                    )
+                ),
+                credentials=(
+                    calendar_handler.credentials if calendar_handler else None
+                ),
+                etag_store=(
+                    calendar_handler.etag_store
+                    if calendar_handler
+                    else ETagStore(
+                        int(environ.get("CALENDAR_ETAG_CACHE_SIZE", "10000"))
+                    )
+                ),
+            ),
+            "google_calendar_async",
+        )
+    else:
+        raise FactoryError("Invalid calendar handler type")
+
+
+@debug_log_decorator
+def async_db_handler_factory(
+    type_of_handler: str,
+) -> Optional[MotorDbHandler]:
+    """Create an asynchronous database handler.
+
+    Args:
+        type_of_handler (str): The type of database handler to create.
+
+    Returns:
+        MotorDbHandler: The database handler.
+    """
+    if type_of_handler == "mongo":
+        return instrument(
+            MotorDbHandler(
+                host=environ["DB_HOST"],
+                port=int(environ["DB_PORT"]),
+                db_name=environ["DB_NAME"],
+                max_pool_size=int(
+                    environ.get("DB_ASYNC_MAX_POOL_SIZE", "100")
+                ),
+            ),
+            "mongodb_async",
+        )
+    else:
+        raise FactoryError("Invalid database handler type")
+
+
+@debug_log_decorator
+def board_handler_factory(type_of_handler: str) -> Optional[BoardHandler]:
     """Create a board handler.
 
+    Boards and lists are cached in front of the handler unless
+    BOARD_CACHE_TTL is 0, so only cache misses are timed as board calls.
+    The cache is invalidated through the board versions the API bumps
+    from board webhooks.
+
     Args:
         type_of_handler (str): The type of board handler to create.
 
     Returns:
-        TrelloHandler: The board handler.
+        BoardHandler: The board handler.
     """
     if type_of_handler == "trello":
-        return TrelloHandler(
+        board_handler: BoardHandler = TrelloHandler(
             api_key=environ["BOARD_API_KEY"],
-            api_secret=environ["BOARD_API_SECRET"],
             token=environ["BOARD_TOKEN"],
+            rate_limiter=rate_limiter_factory(TRELLO_RATE_LIMITS),
         )
+        instrument(board_handler, "trello")
     else:
         raise FactoryError("Invalid board handler type")
 
+    cache_ttl: float = float(environ.get("BOARD_CACHE_TTL", "300"))
+    if cache_ttl <= 0:
+        return board_handler
+
+    return CachedBoardHandler(
+        board_handler,
+        TTLCache(
+            max_entries=int(environ.get("BOARD_CACHE_SIZE", "1000")),
+            ttl=cache_ttl,
+        ),
+        BoardVersions(
+            db_handler_factory(environ.get("DB_TYPE", "mongo")),
+            check_interval=float(
+                environ.get("BOARD_CACHE_VERSION_CHECK", "1")
+            ),
+        ),
+    )
+
 
 @debug_log_decorator
 def board_webhook_handler_factory(
@@ -92,9 +255,12 @@ def board_webhook_handler_factory(
         TrelloWebhookHandler: The webhook handler.
     """
     if type_of_handler == "trello":
-        return TrelloWebhookHandler(
-            api_key=environ["BOARD_API_KEY"],
-            token=environ["BOARD_TOKEN"],
+        return instrument(
+            TrelloWebhookHandler(
+                api_key=environ["BOARD_API_KEY"],
+                token=environ["BOARD_TOKEN"],
+            ),
+            "trello_webhook",
         )
     else:
         raise FactoryError("Invalid webhook handler type")
@@ -124,6 +290,32 @@ def calendar_webhook_handler_factory(
         raise FactoryError("Invalid webhook handler type")
 
 
+@debug_log_decorator
+def metrics_publisher_factory(
+    db_handler: MongoDbHandler, process_name: str
+) -> Optional[MetricsPublisher]:
+    """Create and start a publisher of the current process's metrics.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        process_name (str): The name of the process.
+
+    Returns:
+        Optional[MetricsPublisher]: The started publisher, None if
+        metrics are disabled.
+    """
+    if not METRICS_ENABLED:
+        return None
+
+    metrics_publisher: MetricsPublisher = MetricsPublisher(
+        db_handler,
+        process_name,
+        interval=float(environ.get("METRICS_PUBLISH_INTERVAL", "15")),
+    )
+    metrics_publisher.start()
+    return metrics_publisher
+
+
 if __name__ == "__main__":
     # handler = board_handler_factory("trello")
     # print(handler.get_all_lists("61ec0eaf3ad6121bee980f38"))
@@ -1,15 +1,168 @@
 """This module handles requests to the Google Calendar API."""
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from os.path import exists
-from typing import Optional
+from threading import Lock
+from time import perf_counter, sleep
+from typing import Any, Callable, Optional
+from uuid import uuid4
+from batch_sizer import AdaptiveBatchSizer
 from calendar_handler import CalendarHandler
+from etag_store import ETagStore
+from google_http_pool import GoogleHttpPool
+from exceptions import SyncTokenExpiredError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import BatchHttpRequest
+from googleapiclient.http import BatchHttpRequest, set_user_agent
+from httplib2 import Http
+from metrics import BATCH_SIZE
+from rate_limiter import RateLimiter, bucket_key
+
+# Google rejects batches with more than this many sub-requests.
+MAX_BATCH_SIZE: int = 1000
+
+RETRYABLE_STATUSES: frozenset = frozenset({403, 429, 500, 502, 503, 504})
+
+# The fields requested for events, by call site. The sync, and the
+# writes it makes, only need enough to compare colours and track ETags;
+# full bodies are only fetched for API callers. Writes use the sync
+# profile so their responses can answer later conditional sync reads.
+# The mirror profile, a superset of the sync one, is what the local
+# event mirror keeps for API reads.
+EVENT_FIELDS: dict[str, Optional[str]] = {
+    "full": None,
+    "sync": "id,etag,status,colorId,updated,start,end",
+    "mirror": "id,etag,status,htmlLink,summary,description,location,"
+    "colorId,created,updated,start,end",
+}
+
+# Google only compresses responses for user agents that mention gzip.
+USER_AGENT: str = "trello-cal-sync (gzip)"
+
+# The rate limit name used for calendar requests.
+CALENDAR_RATE_LIMIT: str = "google_calendar"
+
+# How many times to retry a rate limited request.
+MAX_RATE_LIMIT_RETRIES: int = 3
+
+# Returned for a read whose If-None-Match ETag is still current.
+NOT_MODIFIED: int = 304
+
+# Returned for a write whose If-Match ETag is no longer current.
+PRECONDITION_FAILED: int = 412
+
+# Returned for an insert whose event ID is already taken.
+CONFLICT: int = 409
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether a failed request is worth retrying.
+
+    Args:
+        error (Exception): The error the request failed with.
+
+    Returns:
+        bool: True for rate limit, server and transport errors.
+    """
+
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUSES
+    return True
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Check whether a request failed because a quota was exceeded.
+
+    Args:
+        error (Exception): The error the request failed with.
+
+    Returns:
+        bool: True for 429 responses and 403 rate limit responses.
+    """
+
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    return error.resp.status == 403 and b"ateLimitExceeded" in (
+        error.content or b""
+    )
+
+
+def has_status(error: Exception, status: int) -> bool:
+    """Check whether a request failed with a given HTTP status.
+
+    Args:
+        error (Exception): The error the request failed with.
+        status (int): The HTTP status.
+
+    Returns:
+        bool: True if the error is an HttpError with the status.
+    """
+
+    return isinstance(error, HttpError) and error.resp.status == status
+
+
+def to_rfc3339(value: datetime) -> str:
+    """Format a datetime as an RFC 3339 timestamp.
+
+    Naive datetimes, as returned by MongoDB, are treated as UTC.
+
+    Args:
+        value (datetime): The datetime to format.
+
+    Returns:
+        str: The formatted timestamp.
+    """
+
+    if value.tzinfo is None:
+        return value.isoformat() + "Z"
+    return value.isoformat()
+
+
+def load_credentials(
+    scopes: list, token_file_path: str, service_account_file_path: str
+) -> Credentials:
+    """Load the stored credentials, refreshing or authorizing if needed.
+
+    Args:
+        scopes (list): The scopes to request access to.
+        token_file_path (str): The path to the file to store the
+        token in.
+        service_account_file_path (str): The path to the service
+        account file.
+
+    Returns:
+        Credentials: The credentials.
+    """
+
+    creds: None | Credentials = None
+
+    if exists(token_file_path):
+        creds = Credentials.from_authorized_user_file(
+            token_file_path,
+            scopes,
+        )
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(
+                service_account_file_path, scopes
+            )
+            creds = flow.run_local_server(port=0)
+
+        # Save the credentials for the next run
+        with open(token_file_path, "w") as token:
+            token.write(creds.to_json())
+
+    return creds
 
 
 class GoogleCalendarHandler(CalendarHandler):
@@ -21,6 +174,15 @@ class GoogleCalendarHandler(CalendarHandler):
         token in.
         service_account_file_path (str): The path to the service
         account file.
+        batch_size (int): The initial number of requests per batch.
+        max_batch_workers (int): The number of batches to run
+        concurrently.
+        etag_cache_size (int): The number of event bodies to keep for
+        conditional requests.
+        http_pool_size (int): The most HTTP transports to open; requests
+        wait for a free one beyond that.
+        rate_limiter (Optional[RateLimiter]): The rate limiter shared
+        with the other processes using the same credentials.
     """
 
     def __init__(
@@ -28,29 +190,212 @@ class GoogleCalendarHandler(CalendarHandler):
         scopes: list,
         token_file_path: str,
         service_account_file_path: str,
+        batch_size: int = 50,
+        max_batch_workers: int = 4,
+        etag_cache_size: int = 10000,
+        http_pool_size: int = 8,
+        rate_limiter: Optional[RateLimiter] = None,
     ):
-        creds: None | Credentials = None
+        self._creds: Credentials = load_credentials(
+            scopes, token_file_path, service_account_file_path
+        )
+        # The service only builds requests; they are executed on a
+        # transport checked out from the pool.
+        self._service = build(
+            "calendar",
+            "v3",
+            http=self._build_http(),
+            cache_discovery=False,
+        )
+        self._http_pool: GoogleHttpPool = GoogleHttpPool(
+            self._build_http, http_pool_size
+        )
+
+        self._batch_sizer: AdaptiveBatchSizer = AdaptiveBatchSizer(
+            initial_size=batch_size, max_size=MAX_BATCH_SIZE
+        )
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_batch_workers,
+            thread_name_prefix="calendar-batch",
+        )
+        self._failed_requests: dict = {}
+        self._failed_requests_lock: Lock = Lock()
+        self._etag_store: ETagStore = ETagStore(etag_cache_size)
+        self._payload_bytes: dict[str, int] = {}
+        self._payload_counts: dict[str, int] = {}
+        self._payload_lock: Lock = Lock()
+        self._rate_limiter: Optional[RateLimiter] = rate_limiter
+        self._quota_key: str = bucket_key(
+            self._creds.client_id or token_file_path
+        )
+
+    @property
+    def credentials(self) -> Credentials:
+        """The credentials the handler's requests are authorized with."""
+
+        return self._creds
+
+    @property
+    def etag_store(self) -> ETagStore:
+        """The store of the last seen ETags and bodies of events."""
+
+        return self._etag_store
+
+    @property
+    def rate_limiter(self) -> Optional[RateLimiter]:
+        """The rate limiter shared with other processes, if any."""
+
+        return self._rate_limiter
+
+    def _build_http(self) -> AuthorizedHttp:
+        """Build an authorized, gzip-enabled HTTP transport.
+
+        Returns:
+            AuthorizedHttp: The transport.
+        """
+
+        return set_user_agent(
+            AuthorizedHttp(self._creds, http=Http()), USER_AGENT
+        )
+
+    def _execute(self, request, cost: int = 1) -> Any:
+        """Execute a request on a transport checked out from the pool.
+
+        The request first waits for the shared rate limit. If it is
+        rejected by a quota it is retried after backing off.
+
+        Args:
+            request (HttpRequest | BatchHttpRequest): The request.
+            cost (int): The number of API calls the request makes, e.g.
+            the size of a batch.
+
+        Returns:
+            Any: The response.
+        """
+
+        attempt: int = 0
 
-        if exists(token_file_path):
-            creds = Credentials.from_authorized_user_file(
-                token_file_path,
-                scopes,
+        while True:
+            if self._rate_limiter:
+                self._rate_limiter.acquire(
+                    CALENDAR_RATE_LIMIT, self._quota_key, cost
+                )
+
+            try:
+                with self._http_pool.checkout() as http:
+                    return request.execute(http=http)
+
+            except HttpError as e:
+                if not is_rate_limited(e) or attempt >= MAX_RATE_LIMIT_RETRIES:
+                    raise
+                self._back_off(e, attempt)
+                attempt += 1
+
+    def _back_off(self, error: Optional[HttpError], attempt: int) -> None:
+        """Back off after hitting a quota.
+
+        With a rate limiter the shared bucket is blocked, so every
+        process sharing the quota backs off together.
+
+        Args:
+            error (Optional[HttpError]): The rate limit error.
+            attempt (int): The number of the failed attempt, from 0.
+        """
+
+        try:
+            delay: float = float(error.resp["retry-after"])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            delay = float(min(2**attempt, 30))
+
+        if self._rate_limiter:
+            self._rate_limiter.block(
+                CALENDAR_RATE_LIMIT, self._quota_key, delay
             )
+        else:
+            sleep(delay)
 
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    service_account_file_path, scopes
+    def http_pool_stats(self) -> dict:
+        """Get the size and usage counters of the HTTP transport pool.
+
+        Returns:
+            dict: The pool statistics.
+        """
+
+        return self._http_pool.stats()
+
+    def _measured(self, request, profile: str):
+        """Count the size of a request's response body against a profile.
+
+        Args:
+            request (HttpRequest): The request.
+            profile (str): The field profile of the request.
+
+        Returns:
+            HttpRequest: The request.
+        """
+
+        postproc: Callable = request.postproc
+
+        def measure(resp, content):
+            with self._payload_lock:
+                self._payload_bytes[profile] = self._payload_bytes.get(
+                    profile, 0
+                ) + len(content or b"")
+                self._payload_counts[profile] = (
+                    self._payload_counts.get(profile, 0) + 1
                 )
-                creds = flow.run_local_server(port=0)
+            return postproc(resp, content)
+
+        request.postproc = measure
+        return request
+
+    def payload_stats(self) -> dict:
+        """Get the response bytes received so far, by field profile.
+
+        Returns:
+            dict: The number of responses and their total decoded size
+            for each profile.
+        """
+
+        with self._payload_lock:
+            return {
+                profile: {
+                    "responses": self._payload_counts[profile],
+                    "bytes": self._payload_bytes[profile],
+                }
+                for profile in self._payload_bytes
+            }
+
+    def _conditional(
+        self,
+        request,
+        header: str,
+        calendar_id: str,
+        event_id: str,
+        profile: Optional[str] = None,
+    ):
+        """Make a request conditional on the stored ETag of an event.
+
+        Args:
+            request (HttpRequest): The request.
+            header (str): If-None-Match for reads, If-Match for writes.
+            calendar_id (str): The ID of the calendar.
+            event_id (str): The ID of the event.
+            profile (Optional[str]): Only use an ETag stored with this
+            field profile, so a 304 can be answered with a matching body.
+
+        Returns:
+            HttpRequest: The request.
+        """
+
+        etag: Optional[str] = self._etag_store.get_etag(
+            calendar_id, event_id, profile
+        )
 
-            # Save the credentials for the next run
-            with open(token_file_path, "w") as token:
-                token.write(creds.to_json())
+        if etag:
+            request.headers[header] = etag
 
-        self._service = build("calendar", "v3", credentials=creds)
+        return request
 
     def add_event(
         self,
@@ -81,7 +426,130 @@ class GoogleCalendarHandler(CalendarHandler):
             str: The ID of the event that was added.
         """
 
-        event_to_add: dict = {
+        added_event = self._execute(
+            self._measured(
+                self._service.events().insert(
+                    calendarId=calendar_id,
+                    body=self._event_body(
+                        title,
+                        description,
+                        start_datetime,
+                        end_datetime,
+                        color_id,
+                        location,
+                    ),
+                    fields=EVENT_FIELDS["sync"],
+                ),
+                "sync",
+            )
+        )
+        self._etag_store.put(calendar_id, added_event, "sync")
+        event_id: str = added_event.get("id")
+        return event_id
+
+    def add_events(
+        self, events: list[dict]
+    ) -> list[tuple[Optional[str], Optional[Exception]]]:
+        """Add many events to their calendars with batched insert requests.
+
+        Each event is given its ID up front, a random one unless the
+        caller chose it, so a retried insert that the calendar had
+        already applied fails with a conflict on that ID instead of
+        creating a duplicate, and counts as added.
+
+        Args:
+            events (list[dict]): The arguments of add_event for each
+            event, optionally with the event_id to give it.
+
+        Returns:
+            list[tuple[Optional[str], Optional[Exception]]]: The ID of
+            each added event, or the error it failed with, in the order
+            of the events.
+        """
+
+        event_ids: list[str] = [
+            event.get("event_id") or uuid4().hex for event in events
+        ]
+        requests: dict = dict(zip(event_ids, zip(event_ids, events)))
+
+        added_events, failed = self._run_batches(
+            requests,
+            lambda service, request: self._insert_request(
+                service, request[0], request[1]
+            ),
+        )
+
+        results: list[tuple[Optional[str], Optional[Exception]]] = []
+        for event_id, event in zip(event_ids, events):
+            if event_id in added_events:
+                self._etag_store.put(
+                    event.get("calendar_id", "primary"),
+                    added_events[event_id],
+                    "sync",
+                )
+                results.append((event_id, None))
+            elif has_status(failed[event_id], CONFLICT):
+                results.append((event_id, None))
+            else:
+                results.append((None, failed[event_id]))
+
+        return results
+
+    def _insert_request(self, service, event_id: str, event: dict):
+        """Build the insert request of an event with a chosen ID.
+
+        Args:
+            service (Resource): The calendar service.
+            event_id (str): The ID to give the event.
+            event (dict): The arguments of add_event for the event.
+
+        Returns:
+            HttpRequest: The measured insert request.
+        """
+
+        return self._measured(
+            service.events().insert(
+                calendarId=event.get("calendar_id", "primary"),
+                body={
+                    "id": event_id,
+                    **self._event_body(
+                        event["title"],
+                        event["description"],
+                        event["start_datetime"],
+                        event["end_datetime"],
+                        event.get("color_id", 7),
+                        event.get("location"),
+                    ),
+                },
+                fields=EVENT_FIELDS["sync"],
+            ),
+            "sync",
+        )
+
+    @staticmethod
+    def _event_body(
+        title: str,
+        description: str,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        color_id: int,
+        location: Optional[str],
+    ) -> dict:
+        """Build the body of a new event.
+
+        Args:
+            title (str): The title of the event.
+            description (str): The description of the event.
+            start_datetime (datetime): The start time of the event.
+            end_datetime (datetime): The end time of the event.
+            color_id (int): The color id of the event.
+            location (Optional[str]): The location of the event.
+
+        Returns:
+            dict: The event body.
+        """
+
+        return {
             "summary": title,
             "location": location,
             "description": description,
@@ -96,17 +564,6 @@ class GoogleCalendarHandler(CalendarHandler):
             },
         }
 
-        added_event = (
-            self._service.events()
-            .insert(
-                calendarId=calendar_id,
-                body=event_to_add,
-            )
-            .execute()
-        )
-        event_id: str = added_event.get("id")
-        return event_id
-
     def get_event_by_id(
         self,
         event_id: str,
@@ -114,6 +571,9 @@ class GoogleCalendarHandler(CalendarHandler):
     ) -> dict:
         """Get an event by its ID.
 
+        The request carries the stored ETag of the event, if any, so an
+        unchanged event costs a bodiless 304 response.
+
         Args:
             event_id (str): The ID of the event to retrieve.
             calendar_id (str): The ID of the calendar to retrieve the
@@ -126,17 +586,34 @@ class GoogleCalendarHandler(CalendarHandler):
         """
 
         try:
-            event: dict = (
-                self._service.events()
-                .get(calendarId=calendar_id, eventId=event_id)
-                .execute()
+            event: dict = self._execute(
+                self._conditional(
+                    self._measured(
+                        self._service.events().get(
+                            calendarId=calendar_id, eventId=event_id
+                        ),
+                        "full",
+                    ),
+                    "If-None-Match",
+                    calendar_id,
+                    event_id,
+                    "full",
+                )
             )
-            return event
 
         except HttpError as e:
+            cached_event: Optional[dict] = self._etag_store.get(
+                calendar_id, event_id, "full"
+            )
+            if has_status(e, NOT_MODIFIED) and cached_event is not None:
+                return cached_event
+
             print(f"An error occurred: {e}")
             return {}
 
+        self._etag_store.put(calendar_id, event, "full")
+        return event
+
     def delete_event_by_id(
         self,
         event_id: str,
@@ -154,9 +631,12 @@ class GoogleCalendarHandler(CalendarHandler):
         """
 
         try:
-            self._service.events().delete(
-                calendarId=calendar_id, eventId=event_id
-            ).execute()
+            self._execute(
+                self._service.events().delete(
+                    calendarId=calendar_id, eventId=event_id
+                )
+            )
+            self._etag_store.discard(calendar_id, event_id)
             return {"status": "Event deleted successfully"}
 
         except HttpError as e:
@@ -171,29 +651,86 @@ class GoogleCalendarHandler(CalendarHandler):
     ) -> dict:
         """Update the color of an event.
 
+        Only the color is sent, as a patch, so no read of the event is
+        needed first. If the event's ETag is known the patch is
+        conditional on it, so it fails instead of overwriting a
+        concurrent edit.
+
         Args:
             event_id (str): The ID of the event to update.
             color_id (str): The ID of the color to use.
         """
         try:
-            event: dict = (
-                self._service.events()
-                .get(calendarId=calendar_id, eventId=event_id)
-                .execute()
-            )
-            event["colorId"] = color_id
-            updated_event: dict = (
-                self._service.events()
-                .update(calendarId=calendar_id, eventId=event_id, body=event)
-                .execute()
+            updated_event: dict = self._execute(
+                self._conditional(
+                    self._measured(
+                        self._service.events().patch(
+                            calendarId=calendar_id,
+                            eventId=event_id,
+                            body={"colorId": str(color_id)},
+                            fields=EVENT_FIELDS["sync"],
+                        ),
+                        "sync",
+                    ),
+                    "If-Match",
+                    calendar_id,
+                    event_id,
+                )
             )
 
-            return updated_event
-
         except HttpError as e:
+            if has_status(e, PRECONDITION_FAILED):
+                self._etag_store.discard(calendar_id, event_id)
+
             print(f"An error occurred: {e}")
             return {}
 
+        self._etag_store.put(calendar_id, updated_event, "sync")
+        return updated_event
+
+    def patch_event_colors(self, updates: list) -> tuple[dict, dict]:
+        """Update the colors of many events with batched patch requests.
+
+        Patches of events with a known ETag are conditional on it and
+        fail with a 412 if the event has been edited since.
+
+        Args:
+            updates (list[tuple[str, str, str]]): The event ID, color ID
+            and calendar ID of each event to update.
+
+        Returns:
+            tuple[dict, dict]: The updated events and the errors of the
+            failed updates, both keyed by event ID.
+        """
+
+        requests: dict = {update[0]: update for update in updates}
+
+        updated_events, failed = self._run_batches(
+            requests,
+            lambda service, update: self._conditional(
+                self._measured(
+                    service.events().patch(
+                        calendarId=update[2],
+                        eventId=update[0],
+                        body={"colorId": str(update[1])},
+                        fields=EVENT_FIELDS["sync"],
+                    ),
+                    "sync",
+                ),
+                "If-Match",
+                update[2],
+                update[0],
+            ),
+        )
+
+        for event_id, updated_event in updated_events.items():
+            self._etag_store.put(requests[event_id][2], updated_event, "sync")
+        for event_id, error in failed.items():
+            if has_status(error, PRECONDITION_FAILED):
+                self._etag_store.discard(requests[event_id][2], event_id)
+
+        return updated_events, failed
+
     def get_todays_events(self, calendar_id: str = "primary") -> list:
         """Get today's events from the calendar.
 
@@ -209,16 +746,14 @@ class GoogleCalendarHandler(CalendarHandler):
             datetime.utcnow() + timedelta(days=1)
         ).isoformat() + "Z"
 
-        events_result: dict = (
-            self._service.events()
-            .list(
+        events_result: dict = self._execute(
+            self._service.events().list(
                 calendarId=calendar_id,
                 timeMin=now,
                 timeMax=tomorrow,
                 singleEvents=True,
                 orderBy="startTime",
             )
-            .execute()
         )
         return events_result.get("items", [])
 
@@ -227,33 +762,458 @@ class GoogleCalendarHandler(CalendarHandler):
     ) -> dict:
         """Get events by their IDs.
 
+        The IDs are split into batches sized by the adaptive batch sizer
+        and the batches are dispatched concurrently. Sub-requests that
+        fail with a retryable error are retried once; those that still
+        fail can be collected with pop_failed_requests. Events whose ETag
+        is stored are requested with If-None-Match, and a 304 response is
+        answered from the store.
+
         Args:
             event_ids (list[str]): The IDs of the events to retrieve.
             calendar_id (str): The ID of the calendar to retrieve the
+            events from.
 
         Returns:
             dict: A dictionary of events, with the event IDs as keys.
         """
 
+        calendar_events, failed = self._run_batches(
+            {event_id: event_id for event_id in event_ids},
+            lambda service, event_id: self._conditional(
+                self._measured(
+                    service.events().get(
+                        calendarId=calendar_id,
+                        eventId=event_id,
+                        fields=EVENT_FIELDS["sync"],
+                    ),
+                    "sync",
+                ),
+                "If-None-Match",
+                calendar_id,
+                event_id,
+                "sync",
+            ),
+        )
+
+        for calendar_event in calendar_events.values():
+            self._etag_store.put(calendar_id, calendar_event, "sync")
+
+        evicted_ids: list = []
+        for event_id in [
+            event_id
+            for event_id, error in failed.items()
+            if has_status(error, NOT_MODIFIED)
+        ]:
+            cached_event: Optional[dict] = self._etag_store.get(
+                calendar_id, event_id, "sync"
+            )
+            if cached_event is None:
+                evicted_ids.append(event_id)
+                continue
+            calendar_events[event_id] = cached_event
+            del failed[event_id]
+
+        # Events evicted from the store since their request was built
+        # are fetched again without a condition.
+        if evicted_ids:
+            refetched_events, refetch_failed = self._run_batches(
+                {event_id: event_id for event_id in evicted_ids},
+                lambda service, event_id: self._measured(
+                    service.events().get(
+                        calendarId=calendar_id,
+                        eventId=event_id,
+                        fields=EVENT_FIELDS["sync"],
+                    ),
+                    "sync",
+                ),
+            )
+            for event_id in evicted_ids:
+                del failed[event_id]
+            for calendar_event in refetched_events.values():
+                self._etag_store.put(calendar_id, calendar_event, "sync")
+            calendar_events.update(refetched_events)
+            failed.update(refetch_failed)
+
+        for event in calendar_events.values():
+            event["colorId"] = event.get("colorId", "Not specified")
+
+        if failed:
+            with self._failed_requests_lock:
+                self._failed_requests.update(failed)
+
+        return calendar_events
+
+    def pop_failed_requests(self) -> dict:
+        """Get and clear the sub-requests that failed after retrying.
+
+        Returns:
+            dict: The errors of the failed requests, with the event IDs
+            as keys.
+        """
+
+        with self._failed_requests_lock:
+            failed_requests: dict = self._failed_requests
+            self._failed_requests = {}
+
+        return failed_requests
+
+    def _run_batches(
+        self, requests: dict, make_request: Callable
+    ) -> tuple[dict, dict]:
+        """Run requests in concurrent batches, retrying failures once.
+
+        Only failures with a retryable error are retried.
+
+        Args:
+            requests (dict): The arguments of each request, keyed by a
+            unique request ID.
+            make_request (Callable): Builds a request from a service and
+            the arguments of the request.
+
+        Returns:
+            tuple[dict, dict]: The responses and the errors of the failed
+            requests, both keyed by request ID.
+        """
+
+        responses, failed = self._dispatch_batches(requests, make_request)
+
+        retry_requests: dict = {
+            request_id: requests[request_id]
+            for request_id, error in failed.items()
+            if is_retryable(error)
+        }
+        if retry_requests:
+            rate_limit_errors: list = [
+                error for error in failed.values() if is_rate_limited(error)
+            ]
+            if rate_limit_errors:
+                self._back_off(rate_limit_errors[0], 0)
+
+            retried_responses, retry_failed = self._dispatch_batches(
+                retry_requests, make_request
+            )
+            responses.update(retried_responses)
+            for request_id in retry_requests:
+                del failed[request_id]
+            failed.update(retry_failed)
+
+        return responses, failed
+
+    def _dispatch_batches(
+        self, requests: dict, make_request: Callable
+    ) -> tuple[dict, dict]:
+        """Split requests into batches and run the batches concurrently.
+
+        Args:
+            requests (dict): The arguments of each request, keyed by a
+            unique request ID.
+            make_request (Callable): Builds a request from a service and
+            the arguments of the request.
+
+        Returns:
+            tuple[dict, dict]: The responses and the errors of the failed
+            requests, both keyed by request ID.
+        """
+
+        items: list = list(requests.items())
+        chunks: list[list] = []
+        index: int = 0
+        while index < len(items):
+            batch_size: int = self._batch_sizer.size
+            chunks.append(items[index : index + batch_size])
+            index += batch_size
+
+        responses: dict = {}
+        failed: dict = {}
+        for chunk_responses, chunk_failed in self._executor.map(
+            lambda chunk: self._execute_batch(chunk, make_request), chunks
+        ):
+            responses.update(chunk_responses)
+            failed.update(chunk_failed)
+
+        return responses, failed
+
+    def _execute_batch(
+        self, items: list, make_request: Callable
+    ) -> tuple[dict, dict]:
+        """Run a chunk of requests as a single batch request.
+
+        Args:
+            items (list[tuple[str, Any]]): The request IDs and the
+            arguments of each request.
+            make_request (Callable): Builds a request from a service and
+            the arguments of the request.
+
+        Returns:
+            tuple[dict, dict]: The responses and the errors of the failed
+            requests, both keyed by request ID.
+        """
+
+        responses: dict = {}
+        failed: dict = {}
+
         def callback(request_id, response, exception):
             if exception is not None:
-                print(f"An error occurred: {exception}")
+                failed[request_id] = exception
 
             else:
-                event_color_id = response.get("colorId", "Not specified")
-                response["colorId"] = event_color_id
-                calendar_events[request_id] = response
+                responses[request_id] = response
 
-        calendar_events: dict = {}
         batch: BatchHttpRequest = self._service.new_batch_http_request(
             callback=callback
         )
-        for event_id in event_ids:
+        for request_id, arguments in items:
             batch.add(
-                self._service.events().get(
-                    calendarId=calendar_id, eventId=event_id
-                ),
-                request_id=event_id,
+                make_request(self._service, arguments), request_id=request_id
             )
-        batch.execute()
-        return calendar_events
+
+        BATCH_SIZE.observe(len(items), operation="calendar_batch")
+        started: float = perf_counter()
+        try:
+            self._execute(batch, len(items))
+        except HttpError as e:
+            for request_id, _ in items:
+                if request_id not in responses:
+                    failed[request_id] = e
+
+        self._batch_sizer.record(
+            perf_counter() - started,
+            len(items),
+            sum(1 for error in failed.values() if is_retryable(error)),
+        )
+        return responses, failed
+
+    def list_changed_events(
+        self,
+        sync_token: str,
+        calendar_id: str = "primary",
+        profile: str = "sync",
+    ) -> tuple[list, str]:
+        """List the events that have changed since a sync token was issued.
+
+        Args:
+            sync_token (str): The sync token from the previous list.
+            calendar_id (str): The ID of the calendar to list events from.
+            profile (str): The field profile to request the events with.
+
+        Returns:
+            tuple[list, str]: The changed events, including cancelled
+            ones, and the next sync token.
+
+        Raises:
+            SyncTokenExpiredError: If the sync token is no longer valid.
+        """
+
+        changed_events: list = []
+        page_token: Optional[str] = None
+
+        while True:
+            try:
+                events_result: dict = self._execute(
+                    self._measured(
+                        self._service.events().list(
+                            calendarId=calendar_id,
+                            syncToken=sync_token,
+                            pageToken=page_token,
+                            showDeleted=True,
+                            maxResults=2500,
+                            fields="nextPageToken,nextSyncToken,"
+                            f"items({EVENT_FIELDS[profile]})",
+                        ),
+                        profile,
+                    )
+                )
+            except HttpError as e:
+                if e.resp.status == 410:
+                    raise SyncTokenExpiredError(
+                        f"Sync token expired for calendar {calendar_id}"
+                    ) from e
+                raise
+
+            for event in events_result.get("items", []):
+                if event.get("status") == "cancelled":
+                    self._etag_store.discard(calendar_id, event["id"])
+                else:
+                    self._etag_store.put(calendar_id, event, profile)
+                changed_events.append(event)
+            page_token = events_result.get("nextPageToken")
+
+            if not page_token:
+                return changed_events, events_result["nextSyncToken"]
+
+    def list_event_etags(
+        self,
+        calendar_id: str = "primary",
+        updated_min: Optional[datetime] = None,
+    ) -> dict:
+        """List the ETags of the events in a calendar.
+
+        Only the IDs, ETags and statuses are requested, so no event
+        bodies are transferred.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+            updated_min (Optional[datetime]): Only list events updated
+            since this time.
+
+        Returns:
+            dict: The ETag of each event, None for cancelled events,
+            keyed by event ID.
+        """
+
+        etags: dict = {}
+        page_token: Optional[str] = None
+
+        while True:
+            events_result: dict = self._execute(
+                self._measured(
+                    self._service.events().list(
+                        calendarId=calendar_id,
+                        updatedMin=(
+                            to_rfc3339(updated_min) if updated_min else None
+                        ),
+                        pageToken=page_token,
+                        showDeleted=True,
+                        maxResults=2500,
+                        fields="nextPageToken,items(id,etag,status)",
+                    ),
+                    "etags",
+                )
+            )
+
+            for item in events_result.get("items", []):
+                etags[item["id"]] = (
+                    None if item.get("status") == "cancelled" else item["etag"]
+                )
+
+            page_token = events_result.get("nextPageToken")
+
+            if not page_token:
+                return etags
+
+    def get_sync_token(self, calendar_id: str = "primary") -> str:
+        """Get a sync token representing the current state of a calendar.
+
+        Only the paging and sync tokens are requested, so no event bodies
+        are transferred.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+
+        Returns:
+            str: The sync token.
+        """
+
+        page_token: Optional[str] = None
+
+        while True:
+            events_result: dict = self._execute(
+                self._service.events().list(
+                    calendarId=calendar_id,
+                    pageToken=page_token,
+                    showDeleted=True,
+                    maxResults=2500,
+                    fields="nextPageToken,nextSyncToken",
+                )
+            )
+            page_token = events_result.get("nextPageToken")
+
+            if not page_token:
+                return events_result["nextSyncToken"]
+
+    def list_events_in_window(
+        self,
+        time_min: datetime,
+        time_max: datetime,
+        calendar_id: str = "primary",
+        profile: str = "sync",
+    ) -> list:
+        """List all events that overlap a time window.
+
+        Safe to run from a worker thread, as each request runs on its
+        own pooled transport.
+
+        Args:
+            time_min (datetime): The start of the window.
+            time_max (datetime): The end of the window.
+            calendar_id (str): The ID of the calendar to list events from.
+            profile (str): The field profile to request the events with.
+
+        Returns:
+            list: The events in the window.
+        """
+
+        events: list = []
+        page_token: Optional[str] = None
+
+        while True:
+            events_result: dict = self._execute(
+                self._measured(
+                    self._service.events().list(
+                        calendarId=calendar_id,
+                        timeMin=to_rfc3339(time_min),
+                        timeMax=to_rfc3339(time_max),
+                        pageToken=page_token,
+                        maxResults=2500,
+                        fields=f"nextPageToken,items({EVENT_FIELDS[profile]})",
+                    ),
+                    profile,
+                )
+            )
+            events.extend(events_result.get("items", []))
+            page_token = events_result.get("nextPageToken")
+
+            if not page_token:
+                return events
+
+    def full_resync(
+        self,
+        time_min: datetime,
+        time_max: datetime,
+        calendar_id: str = "primary",
+        window_count: int = 4,
+        profile: str = "sync",
+    ) -> tuple[list, str]:
+        """Fetch every event in a time range and a fresh sync token.
+
+        The sync token is taken before the events are listed, so any
+        change made while the windows are being fetched is reported
+        again by the next incremental list rather than being lost. The
+        range is split into windows that are fetched in parallel.
+
+        Args:
+            time_min (datetime): The start of the range (UTC).
+            time_max (datetime): The end of the range (UTC).
+            calendar_id (str): The ID of the calendar.
+            window_count (int): The number of parallel windows.
+            profile (str): The field profile to request the events with.
+
+        Returns:
+            tuple[list, str]: The events in the range and the new sync
+            token.
+        """
+
+        sync_token: str = self.get_sync_token(calendar_id)
+
+        window_size: timedelta = (time_max - time_min) / window_count
+        windows: list[tuple[datetime, datetime]] = [
+            (
+                time_min + window_size * index,
+                time_min + window_size * (index + 1),
+            )
+            for index in range(window_count)
+        ]
+
+        events: dict = {}
+        for window_events in self._executor.map(
+            lambda window: self.list_events_in_window(
+                window[0], window[1], calendar_id, profile
+            ),
+            windows,
+        ):
+            # Events spanning a window boundary are returned twice.
+            for event in window_events:
+                events[event["id"]] = event
+
+        return list(events.values()), sync_token
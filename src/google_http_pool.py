@@ -0,0 +1,96 @@
+"""Pools authorized Google API HTTP transports between threads."""
+
+from contextlib import contextmanager
+from threading import Condition
+from typing import Any, Callable, Iterator
+
+
+class GoogleHttpPool:
+    """A bounded pool of authorized HTTP transports.
+
+    httplib2 transports are not thread-safe, so a transport is only ever
+    used by the thread that has checked it out. Transports are handed
+    out most recently returned first, so callers reuse the warmest
+    keep-alive connections and idle ones are left to time out.
+
+    Args:
+        build_http (Callable[[], Any]): Builds a new authorized
+        transport.
+        max_size (int): The most transports to build; callers wait when
+        all of them are checked out.
+    """
+
+    def __init__(self, build_http: Callable[[], Any], max_size: int = 8):
+        self._build_http: Callable[[], Any] = build_http
+        self._max_size: int = max_size
+        self._idle: list = []
+        self._size: int = 0
+        self._condition: Condition = Condition()
+        self._checkouts: int = 0
+        self._waits: int = 0
+
+    @contextmanager
+    def checkout(self) -> Iterator[Any]:
+        """Check out a transport for the duration of a with block.
+
+        Returns:
+            Iterator[Any]: The transport.
+        """
+
+        http: Any = self._acquire()
+        try:
+            yield http
+        finally:
+            with self._condition:
+                self._idle.append(http)
+                self._condition.notify()
+
+    def stats(self) -> dict:
+        """Get the pool's size and usage counters.
+
+        Returns:
+            dict: The number of transports built, in use and idle, the
+            maximum size, the total checkouts and how many had to wait.
+        """
+
+        with self._condition:
+            return {
+                "size": self._size,
+                "in_use": self._size - len(self._idle),
+                "idle": len(self._idle),
+                "max_size": self._max_size,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+            }
+
+    def _acquire(self) -> Any:
+        """Take an idle transport, build a new one or wait for one.
+
+        Returns:
+            Any: The transport.
+        """
+
+        with self._condition:
+            self._checkouts += 1
+
+            if not self._idle and self._size >= self._max_size:
+                self._waits += 1
+                # A failed build frees its slot, so a waiter woken by it
+                # builds a transport itself.
+                while not self._idle and self._size >= self._max_size:
+                    self._condition.wait()
+
+            if self._idle:
+                return self._idle.pop()
+
+            self._size += 1
+
+        # Building a transport can be slow, so it is done outside the
+        # lock.
+        try:
+            return self._build_http()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
@@ -1,7 +1,5 @@
 """Module to handle Google Calendar webhooks."""
 
-from json import JSONDecodeError
-from json import loads as json_loads
 from os.path import exists
 from uuid import uuid4
 from calendar_webhook_handler import CalendarWebhookHandler
@@ -71,7 +69,7 @@ class GoogleWebhookHandler(CalendarWebhookHandler):
         }
 
         try:
-            response: str = (
+            response: dict = (
                 self._service.events()
                 .watch(
                     calendarId=calendar_id,
@@ -81,9 +79,9 @@ class GoogleWebhookHandler(CalendarWebhookHandler):
             )
             print("Webhook added successfully!")
 
-            return json_loads(response)
+            return response
 
-        except (HttpError, JSONDecodeError) as error:
+        except HttpError as error:
             print(f"Failed to add webhook: {error}")
             raise CalendarWebhookError(
                 f"Failed to add webhook: {error}"
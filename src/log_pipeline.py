@@ -0,0 +1,410 @@
+"""Moves log formatting and writing off the threads that log."""
+
+from datetime import datetime
+from fcntl import LOCK_EX, LOCK_UN, flock
+from gzip import open as gzip_open
+from logging import WARNING, Formatter, Handler, LogRecord, makeLogRecord
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
+from multiprocessing.util import Finalize, register_after_fork
+from os import fstat, register_at_fork, remove, rename, stat
+from os.path import exists
+from queue import Empty, Full, Queue
+from shutil import copyfileobj
+from threading import Lock, Thread
+from time import time
+from typing import Optional
+from uuid import uuid4
+from orjson import OPT_NON_STR_KEYS, dumps
+
+# The attributes every log record has, so the rest are the extra fields
+# passed by the caller.
+_RECORD_ATTRIBUTES: frozenset[str] = frozenset(makeLogRecord({}).__dict__) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+DROP_NEWEST: str = "newest"
+DROP_OLDEST: str = "oldest"
+
+
+class OrjsonFormatter(Formatter):
+    """Formats log records as single line JSON objects with orjson.
+
+    The extra fields passed by the caller are added to the object, and
+    values orjson cannot encode are written as strings.
+    """
+
+    def format(self, record: LogRecord) -> str:
+        """Format a log record.
+
+        Args:
+            record (LogRecord): The log record.
+
+        Returns:
+            str: The JSON object.
+        """
+
+        json_record: dict = {
+            "time_stamp": datetime.fromtimestamp(record.created).isoformat(),
+            "log_level": record.levelname,
+        }
+        json_record.update(
+            (name, value)
+            for name, value in record.__dict__.items()
+            if name not in _RECORD_ATTRIBUTES
+        )
+        json_record["message"] = record.getMessage()
+
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            json_record["exc_info"] = record.exc_text
+
+        return dumps(
+            json_record, default=str, option=OPT_NON_STR_KEYS
+        ).decode()
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Puts log records on a bounded queue without ever blocking.
+
+    When the queue is full a record is dropped: the new one, or the
+    oldest queued one if the policy is to drop the oldest. Errors always
+    displace the oldest record. The number of dropped records is
+    reported in a warning once the queue has room again.
+
+    Args:
+        queue (Queue): The queue the listener reads from.
+        drop_policy (str): Which record to drop when the queue is full,
+        "newest" or "oldest".
+    """
+
+    def __init__(self, queue: Queue, drop_policy: str = DROP_NEWEST):
+        super().__init__(queue)
+        self._drop_policy: str = drop_policy
+        self._dropped: int = 0
+        self._dropped_lock: Lock = Lock()
+        self._exception_formatter: Formatter = Formatter()
+
+    @property
+    def dropped(self) -> int:
+        """The number of records dropped and not yet reported."""
+
+        return self._dropped
+
+    def reset_after_fork(self) -> None:
+        """Reset the drop counter, whose lock a fork may have copied held."""
+
+        self._dropped = 0
+        self._dropped_lock = Lock()
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        """Make a record safe to format on another thread.
+
+        Only the message arguments and the traceback are resolved here;
+        the JSON formatting happens on the listener's thread.
+
+        Args:
+            record (LogRecord): The log record.
+
+        Returns:
+            LogRecord: The record.
+        """
+
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+
+        return record
+
+    def enqueue(self, record: LogRecord) -> None:
+        """Queue a record, dropping one if the queue is full.
+
+        Args:
+            record (LogRecord): The prepared log record.
+        """
+
+        if not self._put(record, record.levelno > WARNING):
+            return
+
+        # The drops are only reported once the queue has room, so the
+        # report never displaces another record.
+        if not self._dropped or self.queue.full():
+            return
+
+        with self._dropped_lock:
+            dropped: int = self._dropped
+            self._dropped = 0
+
+        try:
+            self.queue.put_nowait(
+                makeLogRecord(
+                    {
+                        "name": record.name,
+                        "levelno": WARNING,
+                        "levelname": "WARNING",
+                        "msg": f"Dropped {dropped} log records, the log "
+                        "queue was full",
+                        "item_id": None,
+                    }
+                )
+            )
+        except Full:
+            self._count_dropped(dropped)
+
+    def _put(self, record: LogRecord, displace: bool) -> bool:
+        """Put a record on the queue, applying the drop policy if full.
+
+        Args:
+            record (LogRecord): The log record.
+            displace (bool): Drop the oldest record to make room whatever
+            the policy.
+
+        Returns:
+            bool: True if the record was queued.
+        """
+
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except Full:
+            pass
+
+        if self._drop_policy == DROP_OLDEST or displace:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                pass
+
+            try:
+                self.queue.put_nowait(record)
+                self._count_dropped(1)
+                return True
+            except Full:
+                pass
+
+        self._count_dropped(1)
+        return False
+
+    def _count_dropped(self, count: int) -> None:
+        """Add to the number of dropped records.
+
+        Args:
+            count (int): The number of records dropped.
+        """
+
+        with self._dropped_lock:
+            self._dropped += count
+
+
+class LogPipeline:
+    """Writes log records to their handlers on a background thread.
+
+    Loggers get the queue handler, which only puts records on a bounded
+    queue; a listener thread formats them and passes them to the real
+    handlers. After a fork the child gets a new queue and listener, as
+    threads do not survive a fork.
+
+    Args:
+        handlers (list[Handler]): The handlers that write the records.
+        max_size (int): The most records to queue before dropping.
+        drop_policy (str): Which record to drop when the queue is full,
+        "newest" or "oldest".
+    """
+
+    def __init__(
+        self,
+        handlers: list[Handler],
+        max_size: int = 10000,
+        drop_policy: str = DROP_NEWEST,
+    ):
+        self._handlers: list[Handler] = handlers
+        self._max_size: int = max_size
+        self.queue_handler: BoundedQueueHandler = BoundedQueueHandler(
+            Queue(max_size), drop_policy
+        )
+        self._listener: Optional[QueueListener] = None
+        register_at_fork(after_in_child=self._after_fork)
+        # multiprocessing children leave with os._exit, which skips atexit.
+        register_after_fork(self, LogPipeline._stop_at_process_exit)
+
+    def start(self) -> None:
+        """Start the listener thread."""
+
+        self._listener = QueueListener(
+            self.queue_handler.queue,
+            *self._handlers,
+            respect_handler_level=True,
+        )
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Write the queued records and stop the listener thread."""
+
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def _after_fork(self) -> None:
+        """Replace the parent's queue and listener in a forked child."""
+
+        if self._listener is None:
+            return
+
+        self.queue_handler.reset_after_fork()
+        self.queue_handler.queue = Queue(self._max_size)
+        self.start()
+
+    def _stop_at_process_exit(self) -> None:
+        """Write the queued records when a multiprocessing child exits."""
+
+        Finalize(self, self.stop, exitpriority=0)
+
+
+class GzipRotator:
+    """Compresses rotated log files on a background thread.
+
+    Used as a rotating handler's rotator and namer, so rotation only
+    renames the file and the listener thread never waits for gzip.
+    """
+
+    def __init__(self):
+        self._threads: list[Thread] = []
+
+    @staticmethod
+    def namer(name: str) -> str:
+        """Name a rotated log file.
+
+        Args:
+            name (str): The default name.
+
+        Returns:
+            str: The name with a .gz suffix.
+        """
+
+        return f"{name}.gz"
+
+    def __call__(self, source: str, dest: str) -> None:
+        """Rotate a log file and queue its compression.
+
+        Args:
+            source (str): The path of the current log file.
+            dest (str): The path of the compressed rotated file.
+        """
+
+        if not exists(source):
+            return
+
+        # A unique name, so the next rollover cannot reuse the name before
+        # this file has been compressed and removed.
+        uncompressed: str = f"{dest.removesuffix('.gz')}.{uuid4().hex}"
+        rename(source, uncompressed)
+        thread: Thread = Thread(
+            target=self._compress,
+            args=(uncompressed, dest),
+            name="log-compress",
+            # Not a daemon like the listener, so exiting waits for it.
+            daemon=False,
+        )
+        thread.start()
+        self._threads = [
+            running for running in self._threads if running.is_alive()
+        ]
+        self._threads.append(thread)
+
+    def wait(self) -> None:
+        """Wait for the queued compressions to finish."""
+
+        for thread in list(self._threads):
+            thread.join()
+
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        """Compress a file and remove the original.
+
+        Args:
+            source (str): The path of the file.
+            dest (str): The path of the compressed file.
+        """
+
+        with open(source, "rb") as source_file, gzip_open(
+            dest, "wb"
+        ) as dest_file:
+            copyfileobj(source_file, dest_file)
+        remove(source)
+
+
+class _SharedRotationMixin:
+    """Lets several processes rotate the same log file safely.
+
+    Rollovers are serialised with a lock file, and a process only
+    rotates the file if no other process has rotated it already. Before
+    each record a process checks whether the file has been rotated under
+    it and reopens it if so.
+    """
+
+    def emit(self, record: LogRecord) -> None:
+        """Write a record, reopening the file if it has been rotated.
+
+        Args:
+            record (LogRecord): The log record.
+        """
+
+        if self.stream is not None and self._rotated_elsewhere():
+            self.stream.close()
+            self.stream = self._open()
+
+        super().emit(record)
+
+    def doRollover(self) -> None:  # pylint: disable=invalid-name
+        """Rotate the file, unless another process already has."""
+
+        with open(f"{self.baseFilename}.lock", "a") as lock_file:
+            flock(lock_file, LOCK_EX)
+            try:
+                if self.stream is not None and self._rotated_elsewhere():
+                    self.stream.close()
+                    self.stream = self._open()
+                    if hasattr(self, "rolloverAt"):
+                        self.rolloverAt = self.computeRollover(int(time()))
+                    return
+
+                super().doRollover()
+            finally:
+                flock(lock_file, LOCK_UN)
+
+    def _rotated_elsewhere(self) -> bool:
+        """Check whether the open file is still the one at the log path.
+
+        Returns:
+            bool: True if the file has been renamed or removed.
+        """
+
+        try:
+            return (
+                stat(self.baseFilename).st_ino
+                != fstat(self.stream.fileno()).st_ino
+            )
+        except FileNotFoundError:
+            return True
+
+
+class SharedRotatingFileHandler(_SharedRotationMixin, RotatingFileHandler):
+    """Rotates a log file shared by several processes by size."""
+
+
+class SharedTimedRotatingFileHandler(
+    _SharedRotationMixin, TimedRotatingFileHandler
+):
+    """Rotates a log file shared by several processes by time."""
@@ -1,53 +1,36 @@
 """Functions to log messages."""
 
-from datetime import datetime
+from atexit import register
 from functools import wraps
-from logging import (
-    DEBUG,
-    INFO,
-    FileHandler,
-    Logger,
-    LogRecord,
-    StreamHandler,
-    getLogger,
-)
+from inspect import iscoroutinefunction
+from logging import DEBUG, INFO, Logger, StreamHandler, getLogger
+from logging.handlers import BaseRotatingHandler
 from os import environ, makedirs
 from os.path import dirname
+from random import random
+from time import perf_counter
 from typing import Any, Callable, Optional
 from dotenv import load_dotenv
-from json_log_formatter import JSONFormatter
+from call_stats import CallStats
+from log_pipeline import (
+    GzipRotator,
+    LogPipeline,
+    OrjsonFormatter,
+    SharedRotatingFileHandler,
+    SharedTimedRotatingFileHandler,
+)
 
 load_dotenv("./.env")
 
 
-class CustomisedJSONFormatter(JSONFormatter):
-    """Customised JSON formatter."""
-
-    def json_record(
-        self, message: str, extra: dict, record: LogRecord
-    ) -> dict:
-        """Create a JSON log record.
-
-        Args:
-            message (str): Log message
-            extra (dict): Extra information
-            record (logging.LogRecord): Log record
-
-        Returns:
-            dict: JSON log record
-        """
-
-        return {
-            "time_stamp": datetime.now().isoformat(),
-            "log_level": record.levelname,
-            **extra,
-            "message": message,
-        }
-
-
 def get_logger(log_level: str, log_file_path: str) -> Logger:
     """Get a logger.
 
+    The logger only queues its records; they are formatted and written
+    to the log file and console by a background listener thread. The
+    log file is rotated by size, or by time if LOG_ROTATE_WHEN is set,
+    and rotated files are compressed in the background.
+
     Args:
         log_level (str): Log level
         log_file_path (str): Log file path
@@ -59,25 +42,53 @@ def get_logger(log_level: str, log_file_path: str) -> Logger:
     # Create the log file directory if it doesn't exist.
     makedirs(dirname(log_file_path), exist_ok=True)
 
-    formatter: CustomisedJSONFormatter = CustomisedJSONFormatter()
+    formatter: OrjsonFormatter = OrjsonFormatter()
+    rotator: GzipRotator = GzipRotator()
+    backup_count: int = int(environ.get("LOG_BACKUP_COUNT", "7"))
+    rotate_when: str = environ.get("LOG_ROTATE_WHEN", "")
 
     # File handler for writing logs to file.
-    json_handler: FileHandler = FileHandler(filename=log_file_path)
+    json_handler: BaseRotatingHandler
+    if rotate_when:
+        json_handler = SharedTimedRotatingFileHandler(
+            filename=log_file_path,
+            when=rotate_when,
+            backupCount=backup_count,
+        )
+    else:
+        json_handler = SharedRotatingFileHandler(
+            filename=log_file_path,
+            maxBytes=int(environ.get("LOG_MAX_BYTES", "10485760")),
+            backupCount=backup_count,
+        )
+    json_handler.rotator = rotator
+    json_handler.namer = rotator.namer
     json_handler.setFormatter(formatter)
 
     # Stream handler for writing logs to console.
     console_handler: StreamHandler = StreamHandler()
     console_handler.setFormatter(formatter)
 
+    pipeline: LogPipeline = LogPipeline(
+        [json_handler, console_handler],
+        max_size=int(environ.get("LOG_QUEUE_SIZE", "10000")),
+        drop_policy=environ.get("LOG_QUEUE_DROP_POLICY", "newest"),
+    )
+
     logger: Logger = getLogger(__name__)
-    logger.addHandler(json_handler)
-    logger.addHandler(console_handler)
+    logger.addHandler(pipeline.queue_handler)
 
     if log_level == "DEBUG":
         logger.setLevel(DEBUG)
     else:
         logger.setLevel(INFO)
 
+    # Write the queued records and compress any file they rotated before
+    # the process exits.
+    pipeline.start()
+    register(rotator.wait)
+    register(pipeline.stop)
+
     return logger
 
 
@@ -87,8 +98,30 @@ LOGGER: Logger = get_logger(
 )
 
 
+TRACE_ENABLED: bool = (
+    environ.get("LOG_TRACE_ENABLED", "true").lower() == "true"
+)
+TRACE_SAMPLE_RATE: float = float(environ.get("LOG_TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_SECONDS: float = (
+    float(environ.get("LOG_TRACE_SLOW_MS", "1000")) / 1000
+)
+
+# The durations and outcomes of the calls traced by log_decorator.
+CALL_STATS: CallStats = CallStats()
+
+
 def log_decorator(func: Callable[..., Any]) -> Callable[..., Any]:
-    """Decorator to log the start and end of a function execution.
+    """Decorator to trace the duration and outcome of a function call.
+
+    Every call is recorded in CALL_STATS. A call is only logged if it is
+    slower than LOG_TRACE_SLOW_MS, as a warning, or if it is picked at
+    the LOG_TRACE_SAMPLE_RATE. With LOG_TRACE_ENABLED=false the function
+    is returned undecorated.
+
+    Coroutine functions are wrapped in a coroutine function, so the call
+    is timed until the coroutine completes. An item_id keyword argument
+    is logged with the call and passed on to the function, so the
+    function is called the same way whether tracing is enabled or not.
 
     Args:
         func (Callable[..., Any]): Function to be wrapped.
@@ -97,28 +130,80 @@ def log_decorator(func: Callable[..., Any]) -> Callable[..., Any]:
         Callable[..., Any]: Wrapper function.
     """
 
+    if not TRACE_ENABLED:
+        return func
+
+    if iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+
+            item_id: Any = kwargs.get("item_id")
+            started: float = perf_counter()
+            failed: bool = True
+            try:
+                result: Any = await func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _trace_call(
+                    func.__name__, item_id, perf_counter() - started, failed
+                )
+
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
 
-        item_id: Any = kwargs.pop("item_id", None)
-        LOGGER.info(
-            "execution_started",
+        item_id: Any = kwargs.get("item_id")
+        started: float = perf_counter()
+        failed: bool = True
+        try:
+            result: Any = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _trace_call(
+                func.__name__, item_id, perf_counter() - started, failed
+            )
+
+    return wrapper
+
+
+def _trace_call(
+    function_name: str, item_id: Any, seconds: float, failed: bool
+) -> None:
+    """Record a traced call, and log it if it is slow or sampled.
+
+    Args:
+        function_name (str): The name of the function called.
+        item_id (Any): The ID of the item the call was for.
+        seconds (float): How long the call took.
+        failed (bool): Whether the call raised an exception.
+    """
+
+    CALL_STATS.record(function_name, seconds, failed)
+
+    if seconds >= TRACE_SLOW_SECONDS:
+        LOGGER.warning(
+            "execution_slow",
             extra={
                 "item_id": item_id,
-                "function_name": func.__name__,
+                "function_name": function_name,
+                "duration_ms": round(seconds * 1000, 3),
+                "outcome": "error" if failed else "ok",
             },
         )
-        result: Any = func(*args, **kwargs)
+    elif random() < TRACE_SAMPLE_RATE:
         LOGGER.info(
             "execution_ended",
             extra={
                 "item_id": item_id,
-                "function_name": func.__name__,
+                "function_name": function_name,
+                "duration_ms": round(seconds * 1000, 3),
+                "outcome": "error" if failed else "ok",
             },
         )
-        return result
-
-    return wrapper
 
 
 def debug_log_decorator(func: Callable[..., Any]) -> Callable[..., Any]:
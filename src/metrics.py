@@ -0,0 +1,823 @@
+"""Counters, gauges and histograms exposed in the Prometheus text format."""
+
+from bisect import bisect_left
+from functools import wraps
+from inspect import isfunction, isgeneratorfunction, iscoroutinefunction
+from os import environ, register_at_fork
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, Iterable, Optional
+from call_stats import DURATION_BUCKETS
+from dotenv import load_dotenv
+from logging_funcs import CALL_STATS
+from pymongo.monitoring import (
+    CommandFailedEvent,
+    CommandListener,
+    CommandStartedEvent,
+    CommandSucceededEvent,
+)
+
+load_dotenv("./.env")
+
+METRICS_ENABLED: bool = (
+    environ.get("METRICS_ENABLED", "true").lower() == "true"
+)
+
+# The upper bounds of the batch size histogram buckets.
+SIZE_BUCKETS: tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+COUNTER: str = "counter"
+GAUGE: str = "gauge"
+HISTOGRAM: str = "histogram"
+
+
+class Metric:
+    """A metric with a value for each combination of its label values.
+
+    Args:
+        name (str): The metric name.
+        documentation (str): The help text of the metric.
+        label_names (tuple[str, ...]): The names of the metric's labels.
+        kind (str): The metric type, "counter", "gauge" or "histogram".
+        buckets (tuple[float, ...]): The upper bounds of a histogram's
+        buckets.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        kind: str = COUNTER,
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ):
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: tuple[str, ...] = label_names
+        self.kind: str = kind
+        self.buckets: tuple[float, ...] = buckets
+        self._values: dict[tuple, Any] = {}
+        self._lock: Lock = Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add to the value of a counter or gauge.
+
+        Args:
+            amount (float): The amount to add.
+            **labels (str): The label values.
+        """
+
+        key: tuple = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """Subtract from the value of a gauge.
+
+        Args:
+            amount (float): The amount to subtract.
+            **labels (str): The label values.
+        """
+
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the value of a gauge.
+
+        Args:
+            value (float): The value.
+            **labels (str): The label values.
+        """
+
+        key: tuple = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record a value in a histogram.
+
+        Args:
+            value (float): The value, e.g. a duration in seconds.
+            **labels (str): The label values.
+        """
+
+        key: tuple = self._key(labels)
+        bucket: int = bisect_left(self.buckets, value)
+
+        with self._lock:
+            histogram: Optional[list] = self._values.get(key)
+            if histogram is None:
+                # The bucket counts, then the sum and the count.
+                histogram = self._values[key] = [0] * len(self.buckets) + [
+                    0.0,
+                    0,
+                ]
+            if bucket < len(self.buckets):
+                histogram[bucket] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def family(self) -> dict:
+        """Get the metric's current values.
+
+        Returns:
+            dict: The metric family, as returned by MetricsRegistry.collect.
+        """
+
+        with self._lock:
+            values: list = [
+                (key, list(value) if self.kind == HISTOGRAM else value)
+                for key, value in self._values.items()
+            ]
+
+        return metric_family(
+            self.name,
+            self.kind,
+            self.documentation,
+            self.label_names,
+            [_sample(key, value, self.kind) for key, value in values],
+            self.buckets if self.kind == HISTOGRAM else None,
+        )
+
+    def reset(self) -> None:
+        """Remove every value."""
+
+        self._lock = Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        """Get the values of the metric's labels in order.
+
+        Args:
+            labels (dict): The label values by label name.
+
+        Returns:
+            tuple: The label values.
+        """
+
+        return tuple(str(labels[name]) for name in self.label_names)
+
+
+class MetricsRegistry:
+    """Holds the metrics of a process.
+
+    Besides its own metrics, the registry calls collectors when it is
+    collected, so counters other objects already keep, e.g. a cache's
+    hit count, are exported without being counted twice.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], list[dict]]] = []
+        self._lock: Lock = Lock()
+
+    def counter(
+        self, name: str, documentation: str, label_names: tuple = ()
+    ) -> Metric:
+        """Get or create a counter.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            label_names (tuple): The names of the metric's labels.
+
+        Returns:
+            Metric: The counter.
+        """
+
+        return self._metric(Metric(name, documentation, label_names, COUNTER))
+
+    def gauge(
+        self, name: str, documentation: str, label_names: tuple = ()
+    ) -> Metric:
+        """Get or create a gauge.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            label_names (tuple): The names of the metric's labels.
+
+        Returns:
+            Metric: The gauge.
+        """
+
+        return self._metric(Metric(name, documentation, label_names, GAUGE))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ) -> Metric:
+        """Get or create a histogram.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            label_names (tuple): The names of the metric's labels.
+            buckets (tuple[float, ...]): The upper bounds of the buckets.
+
+        Returns:
+            Metric: The histogram.
+        """
+
+        return self._metric(
+            Metric(name, documentation, label_names, HISTOGRAM, buckets)
+        )
+
+    def register_collector(self, collector: Callable[[], list[dict]]) -> None:
+        """Add a function that returns metric families when collected.
+
+        Args:
+            collector (Callable[[], list[dict]]): Returns metric families
+            built with metric_family.
+        """
+
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self) -> list[dict]:
+        """Get the current values of every metric.
+
+        Returns:
+            list[dict]: The metric families.
+        """
+
+        with self._lock:
+            metrics: list[Metric] = list(self._metrics.values())
+            collectors: list[Callable] = list(self._collectors)
+
+        families: list[dict] = [metric.family() for metric in metrics]
+        for collector in collectors:
+            families.extend(collector())
+
+        return families
+
+    def reset(self) -> None:
+        """Remove every metric value.
+
+        Called in forked children, which must not report the parent's
+        values as their own.
+        """
+
+        self._lock = Lock()
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def _metric(self, metric: Metric) -> Metric:
+        """Register a metric, or get the one registered under its name.
+
+        Args:
+            metric (Metric): The new metric.
+
+        Returns:
+            Metric: The registered metric.
+        """
+
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+
+def metric_family(
+    name: str,
+    kind: str,
+    documentation: str,
+    label_names: tuple[str, ...],
+    samples: list[dict],
+    buckets: Optional[tuple[float, ...]] = None,
+) -> dict:
+    """Build a metric family, the form metrics are collected and stored in.
+
+    Args:
+        name (str): The metric name.
+        kind (str): The metric type.
+        documentation (str): The help text of the metric.
+        label_names (tuple[str, ...]): The names of the metric's labels.
+        samples (list[dict]): The label values and value of each sample.
+        A histogram sample has its bucket counts, sum and count instead.
+        buckets (Optional[tuple[float, ...]]): A histogram's buckets.
+
+    Returns:
+        dict: The metric family.
+    """
+
+    family: dict = {
+        "name": name,
+        "kind": kind,
+        "documentation": documentation,
+        "label_names": list(label_names),
+        "samples": samples,
+    }
+    if buckets is not None:
+        family["buckets"] = list(buckets)
+
+    return family
+
+
+def _sample(labels: tuple, value: Any, kind: str) -> dict:
+    """Build a sample of a metric family.
+
+    Args:
+        labels (tuple): The label values.
+        value (Any): The value, or a histogram's counts, sum and count.
+        kind (str): The metric type.
+
+    Returns:
+        dict: The sample.
+    """
+
+    if kind == HISTOGRAM:
+        return {
+            "labels": list(labels),
+            "counts": value[:-2],
+            "sum": value[-2],
+            "count": value[-1],
+        }
+
+    return {"labels": list(labels), "value": value}
+
+
+def merge_families(family_lists: Iterable[list[dict]]) -> list[dict]:
+    """Add up the metric families of several processes.
+
+    Samples with the same name and label values are summed, so counters
+    and histograms give totals across processes, as do gauges such as
+    the number of requests in flight.
+
+    Args:
+        family_lists (Iterable[list[dict]]): The metric families of each
+        process.
+
+    Returns:
+        list[dict]: The combined metric families.
+    """
+
+    merged: dict[str, dict] = {}
+
+    for families in family_lists:
+        for family in families:
+            target: Optional[dict] = merged.get(family["name"])
+            if target is None:
+                merged[family["name"]] = target = {
+                    **family,
+                    "samples": {},
+                }
+            elif target.get("buckets") != family.get("buckets"):
+                continue
+
+            for sample in family["samples"]:
+                key: tuple = tuple(sample["labels"])
+                existing: Optional[dict] = target["samples"].get(key)
+                if existing is None:
+                    target["samples"][key] = {
+                        **sample,
+                        "counts": list(sample.get("counts", [])),
+                    }
+                elif family["kind"] == HISTOGRAM:
+                    existing["counts"] = [
+                        total + count
+                        for total, count in zip(
+                            existing["counts"], sample["counts"]
+                        )
+                    ]
+                    existing["sum"] += sample["sum"]
+                    existing["count"] += sample["count"]
+                else:
+                    existing["value"] += sample["value"]
+
+    return [
+        {**family, "samples": list(family["samples"].values())}
+        for family in merged.values()
+    ]
+
+
+def render_prometheus(families: list[dict]) -> str:
+    """Render metric families in the Prometheus text exposition format.
+
+    Args:
+        families (list[dict]): The metric families.
+
+    Returns:
+        str: The metrics page.
+    """
+
+    lines: list[str] = []
+
+    for family in families:
+        name: str = family["name"]
+        label_names: list[str] = family["label_names"]
+        lines.append(f"# HELP {name} {_escape(family['documentation'])}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+
+        for sample in family["samples"]:
+            labels: list[tuple[str, str]] = list(
+                zip(label_names, sample["labels"])
+            )
+
+            if family["kind"] != HISTOGRAM:
+                lines.append(
+                    f"{name}{_labels(labels)} {_number(sample['value'])}"
+                )
+                continue
+
+            cumulative: int = 0
+            for bound, count in zip(family["buckets"], sample["counts"]):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket"
+                    f"{_labels(labels + [('le', _number(bound))])} "
+                    f"{cumulative}"
+                )
+            lines.append(
+                f"{name}_bucket{_labels(labels + [('le', '+Inf')])} "
+                f"{sample['count']}"
+            )
+            lines.append(
+                f"{name}_sum{_labels(labels)} {_number(sample['sum'])}"
+            )
+            lines.append(f"{name}_count{_labels(labels)} {sample['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _labels(labels: list[tuple[str, str]]) -> str:
+    """Format the labels of a sample.
+
+    Args:
+        labels (list[tuple[str, str]]): The label names and values.
+
+    Returns:
+        str: The labels in braces, or nothing if there are none.
+    """
+
+    if not labels:
+        return ""
+
+    return (
+        "{"
+        + ",".join(
+            f'{name}="{_escape(value, quotes=True)}"' for name, value in labels
+        )
+        + "}"
+    )
+
+
+def _escape(text: str, quotes: bool = False) -> str:
+    """Escape backslashes and line breaks in help text and label values.
+
+    Args:
+        text (str): The text.
+        quotes (bool): Also escape double quotes, as in label values.
+
+    Returns:
+        str: The escaped text.
+    """
+
+    escaped: str = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    if quotes:
+        escaped = escaped.replace('"', '\\"')
+
+    return escaped
+
+
+def _number(value: float) -> str:
+    """Format a sample value.
+
+    Args:
+        value (float): The value.
+
+    Returns:
+        str: The value, without a fraction if it is whole.
+    """
+
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+# The metrics of this process.
+REGISTRY: MetricsRegistry = MetricsRegistry()
+register_at_fork(after_in_child=REGISTRY.reset)
+
+UPSTREAM_CALL_SECONDS: Metric = REGISTRY.histogram(
+    "upstream_call_duration_seconds",
+    "Duration of calls to calendar, board and database handler methods.",
+    ("component", "method"),
+)
+UPSTREAM_CALL_ERRORS: Metric = REGISTRY.counter(
+    "upstream_call_errors_total",
+    "Calls to handler methods that raised an exception.",
+    ("component", "method"),
+)
+UPSTREAM_CALLS_IN_FLIGHT: Metric = REGISTRY.gauge(
+    "upstream_calls_in_flight",
+    "Calls to handler methods currently running.",
+    ("component", "method"),
+)
+MONGODB_COMMAND_SECONDS: Metric = REGISTRY.histogram(
+    "mongodb_command_duration_seconds",
+    "Duration of successful MongoDB commands.",
+    ("command",),
+)
+MONGODB_COMMAND_FAILURES: Metric = REGISTRY.counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that failed.",
+    ("command",),
+)
+BATCH_SIZE: Metric = REGISTRY.histogram(
+    "batch_size",
+    "Number of items in each batched calendar request or bulk write.",
+    ("operation",),
+    SIZE_BUCKETS,
+)
+SYNC_CYCLE_SECONDS: Metric = REGISTRY.histogram(
+    "sync_cycle_duration_seconds",
+    "Duration of sync cycles.",
+    buckets=(1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+SYNC_DRIFTED_EVENTS: Metric = REGISTRY.counter(
+    "sync_drifted_events_total",
+    "Events found out of sync with the board and synced up.",
+)
+SYNC_CYCLE_DRIFTED_EVENTS: Metric = REGISTRY.histogram(
+    "sync_cycle_drifted_events",
+    "Number of events found out of sync in each sync cycle.",
+    buckets=(0, *SIZE_BUCKETS),
+)
+
+
+def instrument(handler: Any, component: str) -> Any:
+    """Time every public method call of a handler.
+
+    The handler's public methods are replaced on the instance with
+    wrappers that record their duration, errors and calls in flight.
+    Generator methods are left alone, as their time is spent in the
+    caller's loop. With METRICS_ENABLED=false the handler is unchanged.
+
+    Args:
+        handler (Any): The handler.
+        component (str): The component label, e.g. "google_calendar".
+
+    Returns:
+        Any: The handler.
+    """
+
+    if not METRICS_ENABLED or handler is None:
+        return handler
+
+    for name in dir(type(handler)):
+        method: Any = getattr(type(handler), name)
+        if (
+            name.startswith("_")
+            or not isfunction(method)
+            or isgeneratorfunction(method)
+        ):
+            continue
+
+        setattr(
+            handler,
+            name,
+            _timed(
+                getattr(handler, name),
+                {"component": component, "method": name},
+            ),
+        )
+
+    return handler
+
+
+def _timed(method: Callable, labels: dict[str, str]) -> Callable:
+    """Wrap a bound method to record its duration, errors and calls.
+
+    Args:
+        method (Callable): The bound method.
+        labels (dict[str, str]): The component and method labels.
+
+    Returns:
+        Callable: The wrapper.
+    """
+
+    if iscoroutinefunction(method):
+
+        @wraps(method)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+
+            UPSTREAM_CALLS_IN_FLIGHT.inc(**labels)
+            started: float = perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                UPSTREAM_CALL_ERRORS.inc(**labels)
+                raise
+            finally:
+                UPSTREAM_CALL_SECONDS.observe(
+                    perf_counter() - started, **labels
+                )
+                UPSTREAM_CALLS_IN_FLIGHT.dec(**labels)
+
+        return async_wrapper
+
+    @wraps(method)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+
+        UPSTREAM_CALLS_IN_FLIGHT.inc(**labels)
+        started: float = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            UPSTREAM_CALL_ERRORS.inc(**labels)
+            raise
+        finally:
+            UPSTREAM_CALL_SECONDS.observe(perf_counter() - started, **labels)
+            UPSTREAM_CALLS_IN_FLIGHT.dec(**labels)
+
+    return wrapper
+
+
+class MongoCommandMetrics(CommandListener):
+    """Records the duration and failures of MongoDB commands.
+
+    The database handlers catch their errors, so failures are counted
+    from the driver's command events instead.
+    """
+
+    def started(self, event: CommandStartedEvent) -> None:
+        """Ignore a command starting."""
+
+    def succeeded(self, event: CommandSucceededEvent) -> None:
+        """Record the duration of a successful command.
+
+        Args:
+            event (CommandSucceededEvent): The command event.
+        """
+
+        MONGODB_COMMAND_SECONDS.observe(
+            event.duration_micros / 1_000_000, command=event.command_name
+        )
+
+    def failed(self, event: CommandFailedEvent) -> None:
+        """Count a failed command.
+
+        Args:
+            event (CommandFailedEvent): The command event.
+        """
+
+        MONGODB_COMMAND_FAILURES.inc(command=event.command_name)
+
+
+def mongo_event_listeners() -> list[CommandListener]:
+    """Get the command listeners to create MongoDB clients with.
+
+    Returns:
+        list[CommandListener]: The listeners, none if metrics are off.
+    """
+
+    return [MongoCommandMetrics()] if METRICS_ENABLED else []
+
+
+def stats_families(
+    prefix: str,
+    stats: dict,
+    counters: frozenset[str] = frozenset(),
+    documentation: str = "",
+) -> list[dict]:
+    """Export the numbers in a stats dictionary as metric families.
+
+    Args:
+        prefix (str): The prefix of the metric names.
+        stats (dict): The stats, e.g. from a cache's stats method.
+        counters (frozenset[str]): The stats that only go up, exported as
+        counters; the rest are exported as gauges.
+        documentation (str): The help text of the metrics.
+
+    Returns:
+        list[dict]: The metric families.
+    """
+
+    return [
+        metric_family(
+            (
+                f"{prefix}_{name}_total"
+                if name in counters
+                else f"{prefix}_{name}"
+            ),
+            COUNTER if name in counters else GAUGE,
+            documentation,
+            (),
+            [{"labels": [], "value": value}],
+        )
+        for name, value in stats.items()
+        if isinstance(value, (int, float))
+    ]
+
+
+def register_handler_metrics(
+    calendar_handler: Any = None, board_handler: Any = None
+) -> None:
+    """Export the counters the handlers of this process already keep.
+
+    Args:
+        calendar_handler (Any): The calendar handler, for its HTTP pool
+        and response payload counters.
+        board_handler (Any): The board handler, for its cache counters if
+        it has a cache.
+    """
+
+    if not METRICS_ENABLED:
+        return
+
+    if calendar_handler is not None:
+        REGISTRY.register_collector(
+            lambda: stats_families(
+                "calendar_http_pool",
+                calendar_handler.http_pool_stats(),
+                frozenset({"checkouts", "waits"}),
+                "Calendar HTTP transport pool statistics.",
+            )
+            + _payload_families(calendar_handler.payload_stats())
+        )
+
+    if hasattr(board_handler, "cache_stats"):
+        REGISTRY.register_collector(
+            lambda: stats_families(
+                "board_cache",
+                board_handler.cache_stats(),
+                frozenset({"hits", "misses", "evictions"}),
+                "Board and list cache statistics.",
+            )
+        )
+
+
+def _payload_families(payload_stats: dict) -> list[dict]:
+    """Export the calendar response payload counters.
+
+    Args:
+        payload_stats (dict): The responses and bytes by field profile.
+
+    Returns:
+        list[dict]: The metric families.
+    """
+
+    return [
+        metric_family(
+            f"calendar_response_{name}_total",
+            COUNTER,
+            f"Calendar API {name} received, by field profile.",
+            ("profile",),
+            [
+                {"labels": [profile], "value": stats[name]}
+                for profile, stats in payload_stats.items()
+            ],
+        )
+        for name in ("responses", "bytes")
+    ]
+
+
+def _call_stats_families() -> list[dict]:
+    """Export the aggregates of the calls traced by log_decorator.
+
+    Returns:
+        list[dict]: The metric families.
+    """
+
+    snapshot: dict[str, dict] = CALL_STATS.snapshot()
+    samples: list[dict] = []
+    for function_name, stats in snapshot.items():
+        cumulative: list[int] = list(stats["buckets"].values())
+        samples.append(
+            {
+                "labels": [function_name],
+                "counts": [
+                    count - previous
+                    for count, previous in zip(cumulative, [0] + cumulative)
+                ],
+                "sum": stats["total_seconds"],
+                "count": stats["calls"],
+            }
+        )
+
+    return [
+        metric_family(
+            "function_call_duration_seconds",
+            HISTOGRAM,
+            "Duration of calls to functions traced by log_decorator.",
+            ("function",),
+            samples,
+            DURATION_BUCKETS,
+        ),
+        metric_family(
+            "function_call_errors_total",
+            COUNTER,
+            "Calls to traced functions that raised an exception.",
+            ("function",),
+            [
+                {"labels": [function_name], "value": stats["errors"]}
+                for function_name, stats in snapshot.items()
+            ],
+        ),
+    ]
+
+
+REGISTRY.register_collector(_call_stats_families)
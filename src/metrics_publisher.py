@@ -0,0 +1,111 @@
+"""Shares each process's metrics through the database for /metrics."""
+
+from datetime import datetime, timedelta
+from os import getpid
+from socket import gethostname
+from threading import Event, Thread
+from typing import Optional
+from logging_funcs import log_warning
+from metrics import REGISTRY, MetricsRegistry
+from mongodb_handler import MongoDbHandler
+
+METRICS_COLLECTION: str = "metrics_snapshots"
+
+
+def process_id() -> str:
+    """Get the ID the current process publishes its metrics under.
+
+    Returns:
+        str: The host name and process ID.
+    """
+
+    return f"{gethostname()}-{getpid()}"
+
+
+def live_snapshots_query(stale_after: float) -> dict:
+    """Build the query for the other processes' recent metrics snapshots.
+
+    Args:
+        stale_after (float): How old in seconds a snapshot can be before
+        its process is taken to have stopped.
+
+    Returns:
+        dict: The query.
+    """
+
+    return {
+        "_id": {"$ne": process_id()},
+        "updated_at": {
+            "$gte": datetime.utcnow() - timedelta(seconds=stale_after)
+        },
+    }
+
+
+class MetricsPublisher:
+    """Writes a process's metrics to the database at regular intervals.
+
+    The sync workers and the outbox dispatcher have no HTTP server, so
+    the API adds their latest snapshots to its own metrics when it is
+    scraped.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        process_name (str): The name of the process, e.g. "sync_worker".
+        interval (float): How often to publish, in seconds.
+        registry (MetricsRegistry): The registry to publish.
+    """
+
+    def __init__(
+        self,
+        db_handler: MongoDbHandler,
+        process_name: str,
+        interval: float = 15.0,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self._db_handler: MongoDbHandler = db_handler
+        self._process_name: str = process_name
+        self._interval: float = interval
+        self._registry: MetricsRegistry = registry
+        self._stop: Event = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        """Start the publishing thread."""
+
+        self._thread = Thread(
+            target=self._publish_loop, name="metrics-publisher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the publishing thread and remove the process's snapshot."""
+
+        self._stop.set()
+        self._db_handler.delete_document(
+            METRICS_COLLECTION, {"_id": process_id()}
+        )
+
+    def publish(self) -> bool:
+        """Write the current metrics of the process.
+
+        Returns:
+            bool: True if the snapshot was written.
+        """
+
+        return self._db_handler.update_document(
+            METRICS_COLLECTION,
+            {"_id": process_id()},
+            {
+                "process": self._process_name,
+                "updated_at": datetime.utcnow(),
+                "families": self._registry.collect(),
+            },
+            upsert=True,
+        )
+
+    def _publish_loop(self) -> None:
+        """Publish until stopped."""
+
+        while not self._stop.wait(self._interval):
+            if not self.publish():
+                log_warning("Unable to publish metrics snapshot")
@@ -1,11 +1,12 @@
 """Handles all MongoDB operations."""
 
-from typing import Any
-from pymongo import MongoClient
+from typing import Any, Iterator, Optional
+from pymongo import MongoClient, ReturnDocument, UpdateOne
 from pymongo.collection import Collection
 from pymongo.database import Database
-from pymongo.results import DeleteResult, UpdateResult
-from pymongo.errors import PyMongoError
+from pymongo.results import BulkWriteResult, DeleteResult, UpdateResult
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from metrics import BATCH_SIZE, mongo_event_listeners
 
 
 class MongoDbHandler:
@@ -21,7 +22,9 @@ class MongoDbHandler:
             db_name (str): The name of the database to connect to.
         """
 
-        self.client: MongoClient = MongoClient(host, port)
+        self.client: MongoClient = MongoClient(
+            host, port, event_listeners=mongo_event_listeners()
+        )
         self.db: Database = self.client[db_name]
 
     def add_collection(self, collection_name: str) -> bool:
@@ -65,7 +68,11 @@ class MongoDbHandler:
             return False
 
     def update_document(
-        self, collection_name: str, query: dict, new_values: dict
+        self,
+        collection_name: str,
+        query: dict,
+        new_values: dict,
+        upsert: bool = False,
     ) -> bool:
         """
         Update a document in a collection.
@@ -74,6 +81,7 @@ class MongoDbHandler:
             collection_name (str): The name of the collection.
             query (dict): The query to select the document.
             new_values (dict): The new values to update.
+            upsert (bool): Insert the document if none matches the query.
 
         Returns:
             bool: True if successful, False otherwise.
@@ -82,14 +90,159 @@ class MongoDbHandler:
         try:
             collection: Collection = self.db[collection_name]
             result: UpdateResult = collection.update_one(
-                query, {"$set": new_values}
+                query, {"$set": new_values}, upsert=upsert
             )
-            return result.modified_count > 0
+            return result.modified_count > 0 or result.upserted_id is not None
 
         except PyMongoError as e:
             print(f"An error occurred: {e}")
             return False
 
+    def update_documents(
+        self, collection_name: str, query: dict, new_values: dict
+    ) -> int:
+        """
+        Update every document matching a query in a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the documents.
+            new_values (dict): The new values to set.
+
+        Returns:
+            int: The number of modified documents.
+        """
+
+        try:
+            collection: Collection = self.db[collection_name]
+            result: UpdateResult = collection.update_many(
+                query, {"$set": new_values}
+            )
+            return result.modified_count
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return 0
+
+    def bulk_update_documents(
+        self, collection_name: str, updates: list[tuple[dict, dict]]
+    ) -> int:
+        """
+        Update many documents in a collection with one bulk write.
+
+        The updates are unordered, so one failing update does not stop
+        the rest.
+
+        Args:
+            collection_name (str): The name of the collection.
+            updates (list[tuple[dict, dict]]): The query selecting each
+            document and the new values to set on it.
+
+        Returns:
+            int: The number of modified documents.
+        """
+
+        if not updates:
+            return 0
+
+        BATCH_SIZE.observe(len(updates), operation="db_bulk_update")
+
+        try:
+            collection: Collection = self.db[collection_name]
+            result: BulkWriteResult = collection.bulk_write(
+                [
+                    UpdateOne(query, {"$set": new_values})
+                    for query, new_values in updates
+                ],
+                ordered=False,
+            )
+            return result.modified_count
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return 0
+
+    def claim_document(
+        self,
+        collection_name: str,
+        query: dict,
+        new_values: dict,
+        upsert: bool = True,
+    ) -> Optional[dict]:
+        """
+        Atomically update the document matching a query, by default
+        inserting it if it does not exist.
+
+        If a document with the same _id exists but does not match the
+        query, the claim fails instead of overwriting it.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the document.
+            new_values (dict): The new values to set.
+            upsert (bool): Insert the document if none matches the query.
+
+        Returns:
+            Optional[dict]: The updated document, None if the claim
+            failed or an error occurred.
+        """
+
+        try:
+            collection: Collection = self.db[collection_name]
+            return collection.find_one_and_update(
+                query,
+                {"$set": new_values},
+                upsert=upsert,
+                return_document=ReturnDocument.AFTER,
+            )
+
+        except DuplicateKeyError:
+            return None
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return None
+
+    def modify_document(
+        self,
+        collection_name: str,
+        query: dict,
+        update: dict | list,
+        upsert: bool = True,
+        projection: Optional[dict] = None,
+    ) -> Optional[dict]:
+        """
+        Atomically apply an update document or pipeline to the document
+        matching a query, by default inserting it if it does not exist.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the document.
+            update (dict | list): The update operators, or an
+            aggregation pipeline computing the new document.
+            upsert (bool): Insert the document if none matches the query.
+            projection (Optional[dict]): The fields of the updated
+            document to return.
+
+        Returns:
+            Optional[dict]: The updated document, None if no document
+            matched or an error occurred.
+        """
+
+        try:
+            collection: Collection = self.db[collection_name]
+            return collection.find_one_and_update(
+                query,
+                update,
+                projection,
+                upsert=upsert,
+                return_document=ReturnDocument.AFTER,
+            )
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return None
+
     def delete_document(self, collection_name: str, query: dict) -> bool:
         """
         Delete a document from a collection.
@@ -111,26 +264,150 @@ class MongoDbHandler:
             print(f"An error occurred: {e}")
             return False
 
-    def create_index(self, collection_name: str, field_name: str) -> bool:
+    def create_index(
+        self,
+        collection_name: str,
+        keys: str | list[tuple[str, int]],
+        name: Optional[str] = None,
+        unique: bool = False,
+        partial_filter: Optional[dict] = None,
+    ) -> bool:
         """
-        Create an index on a field in a collection.
+        Create an index on one or more fields in a collection.
 
         Args:
             collection_name (str): The name of the collection.
-            field_name (str): The name of the field to index.
+            keys (str | list[tuple[str, int]]): The name of the field to
+            index, or the fields and directions of a compound index.
+            name (Optional[str]): The name of the index, generated from
+            the keys if None.
+            unique (bool): Reject documents with duplicate keys.
+            partial_filter (Optional[dict]): Only index the documents
+            matching this filter.
 
         Returns:
             bool: True if successful, False otherwise.
         """
 
+        options: dict = {"unique": unique}
+        if name:
+            options["name"] = name
+        if partial_filter:
+            options["partialFilterExpression"] = partial_filter
+
         try:
             collection: Collection = self.db[collection_name]
-            collection.create_index(field_name)
+            collection.create_index(keys, **options)
             return True
         except PyMongoError as e:
             print(f"An error occurred: {e}")
             return False
 
+    def get_indexes(self, collection_name: str) -> dict:
+        """
+        Get the indexes of a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+
+        Returns:
+            dict: The keys and options of each index, keyed by index
+            name, empty if an error occurs.
+        """
+
+        try:
+            collection: Collection = self.db[collection_name]
+            return collection.index_information()
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return {}
+
+    def drop_index(self, collection_name: str, index_name: str) -> bool:
+        """
+        Drop an index from a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            index_name (str): The name of the index.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+
+        try:
+            collection: Collection = self.db[collection_name]
+            collection.drop_index(index_name)
+            return True
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return False
+
+    def explain_query(
+        self,
+        collection_name: str,
+        query: dict,
+        projection: Optional[dict] = None,
+    ) -> dict:
+        """
+        Get the query plan the server chooses for a query.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to explain.
+            projection (Optional[dict]): The fields the query returns.
+
+        Returns:
+            dict: The explain output, empty if an error occurs.
+        """
+
+        try:
+            collection: Collection = self.db[collection_name]
+            return collection.find(query, projection).explain()
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return {}
+
+    def delete_documents(self, collection_name: str, query: dict) -> int:
+        """
+        Delete all documents matching a query from a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the documents.
+
+        Returns:
+            int: The number of deleted documents.
+        """
+
+        try:
+            collection: Collection = self.db[collection_name]
+            result: DeleteResult = collection.delete_many(query)
+            return result.deleted_count
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return 0
+
+    def count_documents(self, collection_name: str, query: dict) -> int:
+        """
+        Count the documents matching a query in a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the documents.
+
+        Returns:
+            int: The number of matching documents, 0 if an error occurs.
+        """
+
+        try:
+            collection: Collection = self.db[collection_name]
+            return collection.count_documents(query)
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return 0
+
     def get_document(self, collection_name: str, query: dict) -> Any:
         """
         Get a document from a collection.
@@ -169,3 +446,114 @@ class MongoDbHandler:
         except PyMongoError as e:
             print(f"An error occurred: {e}")
             return []
+
+    def get_documents(
+        self,
+        collection_name: str,
+        query: dict,
+        projection: Optional[dict] = None,
+    ) -> list:
+        """
+        Get all documents matching a query from a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the documents.
+            projection (Optional[dict]): The fields to return.
+
+        Returns:
+            list: The matching documents, empty list if none match or an
+            error occurs.
+        """
+        try:
+            collection: Collection = self.db[collection_name]
+            return list(collection.find(query, projection))
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return []
+
+    def iter_documents(
+        self,
+        collection_name: str,
+        query: dict,
+        projection: Optional[dict] = None,
+        batch_size: int = 500,
+    ) -> Iterator[list]:
+        """
+        Stream the documents matching a query in chunks.
+
+        Only one chunk is held in memory at a time, and the cursor
+        fetches documents from the server in batches of the same size.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the documents.
+            projection (Optional[dict]): The fields to return.
+            batch_size (int): The number of documents per chunk.
+
+        Yields:
+            list: The next chunk of documents.
+        """
+        collection: Collection = self.db[collection_name]
+        chunk: list = []
+
+        for document in collection.find(
+            query, projection, batch_size=batch_size
+        ):
+            chunk.append(document)
+
+            if len(chunk) >= batch_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    def aggregate_documents(
+        self, collection_name: str, pipeline: list[dict]
+    ) -> list:
+        """
+        Run an aggregation pipeline on a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            pipeline (list[dict]): The stages of the pipeline.
+
+        Returns:
+            list: The resulting documents, empty list if an error occurs.
+        """
+        try:
+            collection: Collection = self.db[collection_name]
+            return list(collection.aggregate(pipeline))
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return []
+
+    def get_distinct_values(
+        self,
+        collection_name: str,
+        field_name: str,
+        query: Optional[dict] = None,
+    ) -> list:
+        """
+        Get the distinct values of a field in a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            field_name (str): The name of the field.
+            query (Optional[dict]): The query to select the documents.
+
+        Returns:
+            list: The distinct values, empty list if an error occurs.
+        """
+        try:
+            collection: Collection = self.db[collection_name]
+            return collection.distinct(field_name, query)
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return []
+
+    def close(self) -> None:
+        """Close the client's connections."""
+
+        self.client.close()
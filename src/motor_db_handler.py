@@ -0,0 +1,244 @@
+"""Handles MongoDB operations asynchronously with motor."""
+
+from typing import Any, Optional
+from async_db_handler import AsyncDbHandler
+from metrics import mongo_event_listeners
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorDatabase,
+)
+from pymongo.errors import BulkWriteError, PyMongoError
+from pymongo.results import DeleteResult, UpdateResult
+
+
+class MotorDbHandler(AsyncDbHandler):
+    """Handles MongoDB operations without blocking the event loop."""
+
+    def __init__(
+        self, host: str, port: int, db_name: str, max_pool_size: int = 100
+    ):
+        """
+        Initialize MotorDbHandler with host, port and database name.
+
+        Args:
+            host (str): The host of the MongoDB server.
+            port (int): The port of the MongoDB server.
+            db_name (str): The name of the database to connect to.
+            max_pool_size (int): The most connections to keep open.
+        """
+
+        self.client: AsyncIOMotorClient = AsyncIOMotorClient(
+            host,
+            port,
+            maxPoolSize=max_pool_size,
+            event_listeners=mongo_event_listeners(),
+        )
+        self.db: AsyncIOMotorDatabase = self.client[db_name]
+
+    async def add_collection(self, collection_name: str) -> bool:
+        """
+        Add a new collection to the database.
+
+        Args:
+            collection_name (str): The name of the new collection.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+
+        try:
+            await self.db.create_collection(collection_name)
+            return True
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return False
+
+    async def add_document(self, collection_name: str, document: dict) -> bool:
+        """
+        Add a new document to a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            document (dict): The document to add.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+
+        try:
+            collection: AsyncIOMotorCollection = self.db[collection_name]
+            await collection.insert_one(document)
+            return True
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return False
+
+    async def add_documents(
+        self, collection_name: str, documents: list[dict]
+    ) -> set[int]:
+        """
+        Add many documents to a collection with one unordered insert.
+
+        A document that fails, e.g. on a duplicate key, does not stop
+        the rest from being added.
+
+        Args:
+            collection_name (str): The name of the collection.
+            documents (list[dict]): The documents to add.
+
+        Returns:
+            set[int]: The positions of the documents that could not be
+            added.
+        """
+
+        if not documents:
+            return set()
+
+        try:
+            collection: AsyncIOMotorCollection = self.db[collection_name]
+            await collection.insert_many(documents, ordered=False)
+            return set()
+
+        except BulkWriteError as e:
+            print(f"An error occurred: {e}")
+            return {error["index"] for error in e.details["writeErrors"]}
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return set(range(len(documents)))
+
+    async def get_document(
+        self,
+        collection_name: str,
+        query: dict,
+        projection: Optional[dict] = None,
+    ) -> Any:
+        """
+        Get a document from a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the document.
+            projection (Optional[dict]): The fields to return, all
+            fields if None.
+
+        Returns:
+            dict: The document if found, None otherwise.
+        """
+
+        try:
+            collection: AsyncIOMotorCollection = self.db[collection_name]
+            return await collection.find_one(query, projection)
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return {}
+
+    async def get_documents(
+        self,
+        collection_name: str,
+        query: dict,
+        projection: Optional[dict] = None,
+    ) -> list:
+        """
+        Get all documents matching a query from a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the documents.
+            projection (Optional[dict]): The fields to return.
+
+        Returns:
+            list: The matching documents, empty list if none match or an
+            error occurs.
+        """
+
+        try:
+            collection: AsyncIOMotorCollection = self.db[collection_name]
+            return await collection.find(query, projection).to_list(None)
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return []
+
+    async def update_document(
+        self,
+        collection_name: str,
+        query: dict,
+        new_values: dict,
+        upsert: bool = False,
+    ) -> bool:
+        """
+        Update a document in a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the document.
+            new_values (dict): The new values to update.
+            upsert (bool): Insert the document if none matches the query.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+
+        try:
+            collection: AsyncIOMotorCollection = self.db[collection_name]
+            result: UpdateResult = await collection.update_one(
+                query, {"$set": new_values}, upsert=upsert
+            )
+            return result.modified_count > 0 or result.upserted_id is not None
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return False
+
+    async def delete_document(self, collection_name: str, query: dict) -> bool:
+        """
+        Delete a document from a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            query (dict): The query to select the document.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+
+        try:
+            collection: AsyncIOMotorCollection = self.db[collection_name]
+            result: DeleteResult = await collection.delete_one(query)
+            return result.deleted_count > 0
+
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return False
+
+    async def create_index(
+        self, collection_name: str, field_name: str
+    ) -> bool:
+        """
+        Create an index on a field in a collection.
+
+        Args:
+            collection_name (str): The name of the collection.
+            field_name (str): The name of the field to index.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+
+        try:
+            collection: AsyncIOMotorCollection = self.db[collection_name]
+            await collection.create_index(field_name)
+            return True
+        except PyMongoError as e:
+            print(f"An error occurred: {e}")
+            return False
+
+    def close(self) -> None:
+        """Close the client's connections."""
+
+        self.client.close()
@@ -0,0 +1,255 @@
+"""Adds the events waiting in the outbox to the calendar in batches."""
+
+from datetime import datetime, timedelta
+from threading import Event
+from typing import Optional
+from uuid import uuid4
+from config import Config
+from google_calendar_handler import GoogleCalendarHandler, is_retryable
+from logging_funcs import log_error, log_info, log_warning
+from mongodb_handler import MongoDbHandler
+
+OUTBOX_PENDING: str = "pending"
+OUTBOX_FAILED: str = "failed"
+
+# Selects the documents waiting to be added to the calendar.
+PENDING_QUERY: dict = {"outbox.status": OUTBOX_PENDING}
+
+
+def new_outbox_entry() -> dict:
+    """Build the outbox fields of an event waiting to be added.
+
+    The event's calendar ID is chosen here, so however many times the
+    insert is retried, by however many dispatchers, the calendar ends up
+    with one event.
+
+    Returns:
+        dict: The values to store on the calendar_events document.
+    """
+
+    return {
+        "event_id": None,
+        "outbox": {
+            "status": OUTBOX_PENDING,
+            "event_id": uuid4().hex,
+            "attempts": 0,
+            "available_at": datetime.utcnow(),
+            "claimed_by": None,
+            "error": None,
+        },
+    }
+
+
+class OutboxDispatcher:
+    """Drains the outbox of events waiting to be added to the calendar.
+
+    The API writes new events to the calendar_events collection with an
+    outbox entry and no event ID. The dispatcher claims a batch of them,
+    inserts them into the calendar with batched requests and records
+    their event IDs. A claim expires after the lease time, so the events
+    of a dispatcher that dies are picked up by another one.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        calendar_handler (GoogleCalendarHandler): The calendar handler.
+        config (Config): The program configuration.
+        batch_size (int): The most events to claim at once.
+        lease_seconds (float): How long a claim lasts.
+        max_attempts (int): How many times to try an event before
+        marking it as failed.
+    """
+
+    def __init__(
+        self,
+        db_handler: MongoDbHandler,
+        calendar_handler: GoogleCalendarHandler,
+        config: Config,
+        batch_size: int = 200,
+        lease_seconds: float = 60,
+        max_attempts: int = 5,
+    ):
+        self._db_handler: MongoDbHandler = db_handler
+        self._calendar_handler: GoogleCalendarHandler = calendar_handler
+        self._config: Config = config
+        self._batch_size: int = batch_size
+        self._lease: timedelta = timedelta(seconds=lease_seconds)
+        self._max_attempts: int = max_attempts
+        self._stop: Event = Event()
+
+    def run(self, poll_interval: float = 1.0) -> None:
+        """Dispatch events until stopped.
+
+        Full batches are followed straight away by the next one; the
+        outbox is only polled again after it has been drained.
+
+        Args:
+            poll_interval (float): How long to wait in seconds when the
+            outbox is empty.
+        """
+
+        while not self._stop.is_set():
+            try:
+                dispatched: int = self.dispatch()
+            except Exception as error:  # pylint: disable=broad-except
+                log_error(
+                    f"Unable to dispatch the outbox: {error}", "outbox_error"
+                )
+                dispatched = 0
+
+            if dispatched < self._batch_size:
+                self._stop.wait(poll_interval)
+
+    def stop(self) -> None:
+        """Stop the dispatcher after its current batch."""
+
+        self._stop.set()
+
+    def dispatch(self) -> int:
+        """Claim a batch of pending events and add them to the calendar.
+
+        Returns:
+            int: The number of events claimed.
+        """
+
+        events: list[dict] = self.claim_batch()
+        if not events:
+            return 0
+
+        results: list = self._calendar_handler.add_events(
+            [
+                {
+                    "event_id": event["outbox"]["event_id"],
+                    "title": event["title"],
+                    "description": event["description"],
+                    "start_datetime": event["start_datetime"],
+                    "end_datetime": event["end_datetime"],
+                    "color_id": self._config.get_status_colour_id(
+                        event["current_status"]
+                    ),
+                    "calendar_id": event.get("calendar_id", "primary"),
+                    "location": event.get("location"),
+                }
+                for event in events
+            ]
+        )
+
+        added: int = 0
+        for event, (event_id, error) in zip(events, results):
+            if event_id:
+                added += self._record_added(event, event_id)
+            else:
+                self._record_failure(event, error)
+
+        log_info(f"Added {added} of {len(events)} outbox events to calendar")
+        return len(events)
+
+    def claim_batch(self) -> list[dict]:
+        """Claim the pending events that are ready to be dispatched.
+
+        Returns:
+            list[dict]: The claimed events.
+        """
+
+        now: datetime = datetime.utcnow()
+        claim_id: str = uuid4().hex
+        candidate_ids: list = [
+            event["_id"]
+            for event in next(
+                self._db_handler.iter_documents(
+                    "calendar_events",
+                    {**PENDING_QUERY, "outbox.available_at": {"$lte": now}},
+                    {"_id": 1},
+                    batch_size=self._batch_size,
+                ),
+                [],
+            )
+        ]
+        if not candidate_ids:
+            return []
+
+        self._db_handler.update_documents(
+            "calendar_events",
+            {
+                "_id": {"$in": candidate_ids},
+                **PENDING_QUERY,
+                "outbox.available_at": {"$lte": now},
+            },
+            {
+                "outbox.claimed_by": claim_id,
+                "outbox.available_at": now + self._lease,
+            },
+        )
+        return self._db_handler.get_documents(
+            "calendar_events",
+            {"_id": {"$in": candidate_ids}, "outbox.claimed_by": claim_id},
+        )
+
+    def _record_added(self, event: dict, event_id: str) -> bool:
+        """Record the event ID of an event added to the calendar.
+
+        If the document was deleted while the event was being added, the
+        calendar event is deleted again.
+
+        Args:
+            event (dict): The claimed calendar_events document.
+            event_id (str): The ID of the calendar event.
+
+        Returns:
+            bool: True if the event ID was recorded by this dispatcher.
+        """
+
+        if self._db_handler.update_document(
+            "calendar_events",
+            {"_id": event["_id"], **PENDING_QUERY},
+            {"event_id": event_id, "outbox": None},
+        ):
+            return True
+
+        # Another dispatcher may have recorded it after this claim expired.
+        if (
+            self._db_handler.get_document(
+                "calendar_events", {"_id": event["_id"]}
+            )
+            is not None
+        ):
+            return False
+
+        log_warning(
+            "Outbox event was removed while being added, deleting it",
+            item_id=event.get("card_id"),
+        )
+        self._calendar_handler.delete_event_by_id(
+            event_id, event.get("calendar_id", "primary")
+        )
+        return False
+
+    def _record_failure(self, event: dict, error: Optional[Exception]) -> None:
+        """Schedule a retry of an event, or mark it as failed.
+
+        Args:
+            event (dict): The claimed calendar_events document.
+            error (Optional[Exception]): The error the insert failed with.
+        """
+
+        attempts: int = event["outbox"]["attempts"] + 1
+        retry: bool = is_retryable(error) and attempts < self._max_attempts
+
+        self._db_handler.update_document(
+            "calendar_events",
+            {"_id": event["_id"], **PENDING_QUERY},
+            {
+                "outbox.status": OUTBOX_PENDING if retry else OUTBOX_FAILED,
+                "outbox.attempts": attempts,
+                "outbox.available_at": datetime.utcnow()
+                + timedelta(seconds=min(2**attempts, 300)),
+                "outbox.claimed_by": None,
+                "outbox.error": str(error),
+            },
+        )
+
+        if not retry:
+            log_error(
+                f"Unable to add outbox event to calendar: {error}",
+                "calendar_error",
+                item_id=event.get("card_id"),
+            )
@@ -0,0 +1,204 @@
+"""Token bucket rate limits shared between processes through MongoDB."""
+
+from asyncio import sleep as async_sleep, to_thread
+from datetime import datetime, timedelta
+from hashlib import sha256
+from time import sleep
+from typing import Optional
+from mongodb_handler import MongoDbHandler
+
+BUCKETS_COLLECTION: str = "rate_limit_buckets"
+
+# The longest single sleep while waiting for a bucket, so waiters notice
+# a Retry-After block being lifted or extended.
+_MAX_SLEEP: float = 1.0
+
+
+def bucket_key(secret: str) -> str:
+    """Derive a bucket key from a credential without storing it.
+
+    Args:
+        secret (str): The credential, e.g. an API token.
+
+    Returns:
+        str: A short hash of the credential.
+    """
+
+    return sha256(secret.encode("utf-8")).hexdigest()[:16]
+
+
+class RateLimiter:
+    """Rate limits requests with token buckets kept in MongoDB.
+
+    Each limit is a number of requests per time window. A bucket is kept
+    for every limit and key, e.g. per API token, in the
+    rate_limit_buckets collection, and is refilled and drawn from in one
+    atomic pipeline update, so every process sharing the database shares
+    the same budget. Buckets can also be blocked until a time given by a
+    Retry-After header.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        limits (dict[str, tuple[int, float]]): The number of requests
+        allowed per window in seconds, by limit name.
+        headroom (float): The fraction of each limit to use, to stay
+        just under it.
+    """
+
+    def __init__(
+        self,
+        db_handler: MongoDbHandler,
+        limits: dict[str, tuple[int, float]],
+        headroom: float = 0.9,
+    ):
+        self._db_handler: MongoDbHandler = db_handler
+        self._buckets: dict[str, tuple[float, float]] = {
+            name: (
+                max(1.0, requests * headroom),
+                max(1.0, requests * headroom) / window,
+            )
+            for name, (requests, window) in limits.items()
+        }
+
+    def acquire(self, name: str, key: str, tokens: int = 1) -> None:
+        """Wait until a bucket has enough tokens, then take them.
+
+        Requests for more tokens than a bucket holds take a full bucket.
+
+        Args:
+            name (str): The name of the limit.
+            key (str): The key of the bucket, e.g. a hashed token.
+            tokens (int): The number of requests to account for.
+        """
+
+        if name not in self._buckets:
+            return
+
+        while (wait := self.try_acquire(name, key, tokens)) > 0:
+            sleep(min(wait, _MAX_SLEEP))
+
+    async def acquire_async(
+        self, name: str, key: str, tokens: int = 1
+    ) -> None:
+        """Wait without blocking the event loop until tokens are taken.
+
+        Args:
+            name (str): The name of the limit.
+            key (str): The key of the bucket, e.g. a hashed token.
+            tokens (int): The number of requests to account for.
+        """
+
+        if name not in self._buckets:
+            return
+
+        while (
+            wait := await to_thread(self.try_acquire, name, key, tokens)
+        ) > 0:
+            await async_sleep(min(wait, _MAX_SLEEP))
+
+    def try_acquire(self, name: str, key: str, tokens: int = 1) -> float:
+        """Take tokens from a bucket if it has enough.
+
+        A blocked bucket does not refill until its block is lifted, so
+        the requests held back by the block do not all go out at once.
+
+        Args:
+            name (str): The name of the limit.
+            key (str): The key of the bucket.
+            tokens (int): The number of requests to account for.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise how many seconds
+            to wait before trying again.
+        """
+
+        capacity, refill_rate = self._buckets[name]
+        tokens = min(tokens, capacity)
+        now: datetime = datetime.utcnow()
+
+        # $max skips a missing blocked_until.
+        refill_from: dict = {
+            "$max": [{"$ifNull": ["$updated_at", now]}, "$blocked_until"]
+        }
+        elapsed: dict = {
+            "$max": [
+                0,
+                {"$divide": [{"$subtract": [now, refill_from]}, 1000]},
+            ]
+        }
+        refilled: dict = {
+            "$min": [
+                capacity,
+                {
+                    "$add": [
+                        {"$ifNull": ["$tokens", capacity]},
+                        {"$multiply": [elapsed, refill_rate]},
+                    ]
+                },
+            ]
+        }
+        unblocked: dict = {"$lte": [{"$ifNull": ["$blocked_until", now]}, now]}
+
+        bucket: Optional[dict] = self._db_handler.modify_document(
+            BUCKETS_COLLECTION,
+            {"_id": f"{name}:{key}"},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {
+                    "$set": {
+                        "granted": {
+                            "$and": [{"$gte": ["$tokens", tokens]}, unblocked]
+                        }
+                    }
+                },
+                {
+                    "$set": {
+                        "tokens": {
+                            "$cond": [
+                                "$granted",
+                                {"$subtract": ["$tokens", tokens]},
+                                "$tokens",
+                            ]
+                        }
+                    }
+                },
+            ],
+        )
+
+        # Fail open rather than stopping all traffic if the database is
+        # unavailable.
+        if bucket is None or bucket["granted"]:
+            return 0.0
+
+        wait: float = (tokens - bucket["tokens"]) / refill_rate
+        blocked_until: Optional[datetime] = bucket.get("blocked_until")
+        if blocked_until is not None and blocked_until > now:
+            wait = max(wait, (blocked_until - now).total_seconds())
+
+        return max(wait, 0.001)
+
+    def block(self, name: str, key: str, seconds: float) -> None:
+        """Stop a bucket handing out tokens for a while.
+
+        Used when the API reports that a limit has been hit, so every
+        process backs off for the time given by its Retry-After header.
+
+        Args:
+            name (str): The name of the limit.
+            key (str): The key of the bucket.
+            seconds (float): How long to block the bucket for.
+        """
+
+        if name not in self._buckets:
+            return
+
+        now: datetime = datetime.utcnow()
+
+        self._db_handler.modify_document(
+            BUCKETS_COLLECTION,
+            {"_id": f"{name}:{key}"},
+            {
+                "$max": {"blocked_until": now + timedelta(seconds=seconds)},
+                "$set": {"tokens": 0, "updated_at": now},
+            },
+        )
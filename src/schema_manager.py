@@ -0,0 +1,369 @@
+"""Declares the indexes the service's queries need and keeps them in place."""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+from exceptions import SchemaError
+from logging_funcs import log_error, log_info, log_warning
+from mongodb_handler import MongoDbHandler
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """An index that should exist on a collection."""
+
+    collection: str
+    name: str
+    keys: tuple[tuple[str, int], ...]
+    unique: bool = False
+    partial_filter: Optional[dict] = None
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    """A frequent query that must be served by an index."""
+
+    name: str
+    collection: str
+    query: dict
+    projection: Optional[dict] = None
+
+
+INDEXES: tuple[IndexSpec, ...] = (
+    # get_event, delete_event and the card move coalescer.
+    IndexSpec(
+        "calendar_events", "card_id_unique", (("card_id", 1),), unique=True
+    ),
+    # The sync and the event mirror. Events that are not in the calendar
+    # yet have no event ID, so only string IDs are indexed.
+    IndexSpec(
+        "calendar_events",
+        "event_id_unique",
+        (("event_id", 1),),
+        unique=True,
+        partial_filter={"event_id": {"$type": "string"}},
+    ),
+    # Calendar syncs and full resyncs, which read a calendar's events by
+    # time range.
+    IndexSpec(
+        "calendar_events",
+        "calendar_id_start_datetime",
+        (("calendar_id", 1), ("start_datetime", 1)),
+    ),
+    # Queries for the events of a board in a given status.
+    IndexSpec(
+        "calendar_events",
+        "board_id_current_status",
+        (("board_id", 1), ("current_status", 1)),
+    ),
+    # The outbox dispatcher's search for events ready to be added.
+    IndexSpec(
+        "calendar_events",
+        "outbox_pending_available_at",
+        (("outbox.available_at", 1),),
+        partial_filter={"outbox.status": "pending"},
+    ),
+    IndexSpec(
+        "sync_tokens", "calendar_id_unique", (("calendar_id", 1),), unique=True
+    ),
+    IndexSpec(
+        "calendar_channels",
+        "channel_id_unique",
+        (("channel_id", 1),),
+        unique=True,
+    ),
+)
+
+HOT_QUERIES: tuple[HotQuery, ...] = (
+    HotQuery("event by card", "calendar_events", {"card_id": ""}),
+    HotQuery("events by cards", "calendar_events", {"card_id": {"$in": [""]}}),
+    HotQuery("event by ID", "calendar_events", {"event_id": ""}),
+    HotQuery("events by IDs", "calendar_events", {"event_id": {"$in": [""]}}),
+    HotQuery(
+        "dirty events in calendar",
+        "calendar_events",
+        {"calendar_id": "", "dirty": True},
+    ),
+    HotQuery(
+        "events in calendar window",
+        "calendar_events",
+        {"calendar_id": "", "start_datetime": {"$gte": datetime.min}},
+    ),
+    HotQuery(
+        "events by board status",
+        "calendar_events",
+        {"board_id": "", "current_status": ""},
+        {"_id": 0, "board_id": 1, "current_status": 1},
+    ),
+    HotQuery(
+        "outbox events ready",
+        "calendar_events",
+        {"outbox.status": "pending", "outbox.available_at": {"$lte": ""}},
+    ),
+    HotQuery("sync token", "sync_tokens", {"calendar_id": ""}),
+    HotQuery("channel", "calendar_channels", {"channel_id": ""}),
+)
+
+
+class SchemaManager:
+    """Reconciles the database's indexes with the declared ones.
+
+    Reconciling is idempotent: matching indexes are left alone, missing
+    ones are created and ones whose keys or options have changed are
+    rebuilt. Indexes that are not declared are never dropped unless they
+    clash with a declared one. An index is only dropped once the data
+    is known to fit its replacement, and is restored if the replacement
+    still cannot be built.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        indexes (tuple[IndexSpec, ...]): The indexes that should exist.
+    """
+
+    def __init__(
+        self,
+        db_handler: MongoDbHandler,
+        indexes: tuple[IndexSpec, ...] = INDEXES,
+    ):
+        self._db_handler: MongoDbHandler = db_handler
+        self._indexes: tuple[IndexSpec, ...] = indexes
+
+    def reconcile(self) -> dict[str, list[str]]:
+        """Create or rebuild every declared index that is not in place.
+
+        Returns:
+            dict[str, list[str]]: The names of the indexes that were
+            created, already in place, or could not be created.
+
+        Raises:
+            SchemaError: If a unique index could not be created, as the
+            service relies on them to reject duplicate events.
+        """
+
+        result: dict[str, list[str]] = {
+            "created": [],
+            "unchanged": [],
+            "failed": [],
+        }
+        existing_by_collection: dict[str, dict] = {}
+
+        for spec in self._indexes:
+            if spec.collection not in existing_by_collection:
+                existing_by_collection[spec.collection] = (
+                    self._db_handler.get_indexes(spec.collection)
+                )
+            existing: dict = existing_by_collection[spec.collection]
+            qualified_name: str = f"{spec.collection}.{spec.name}"
+
+            if spec.name in existing and _matches(existing[spec.name], spec):
+                result["unchanged"].append(qualified_name)
+                continue
+
+            # MongoDB does not allow two indexes with the same name or
+            # keys, so clashing indexes must go before the new one is
+            # built.
+            clashing: dict[str, dict] = {
+                name: index
+                for name, index in existing.items()
+                if name == spec.name
+                or (name != "_id_" and _key(index) == list(spec.keys))
+            }
+
+            if clashing and spec.unique and self.has_duplicates(spec):
+                log_error(
+                    f"Keeping the existing indexes of {qualified_name}, "
+                    "as the collection has duplicate keys",
+                    "database_error",
+                )
+                result["failed"].append(qualified_name)
+                continue
+
+            for name in clashing:
+                log_warning(
+                    f"Dropping index {spec.collection}.{name} to "
+                    f"rebuild it as {spec.name}"
+                )
+                self._db_handler.drop_index(spec.collection, name)
+
+            if self._db_handler.create_index(
+                spec.collection,
+                list(spec.keys),
+                name=spec.name,
+                unique=spec.unique,
+                partial_filter=spec.partial_filter,
+            ):
+                result["created"].append(qualified_name)
+                continue
+
+            log_error(
+                f"Unable to create index {qualified_name}", "database_error"
+            )
+            result["failed"].append(qualified_name)
+            for name, index in clashing.items():
+                self._restore_index(spec.collection, name, index)
+
+        log_info(
+            f"Indexes reconciled: {len(result['created'])} created, "
+            f"{len(result['unchanged'])} unchanged, "
+            f"{len(result['failed'])} failed"
+        )
+
+        unique_failures: list[str] = [
+            f"{spec.collection}.{spec.name}"
+            for spec in self._indexes
+            if spec.unique
+            and f"{spec.collection}.{spec.name}" in result["failed"]
+        ]
+        if unique_failures:
+            raise SchemaError(
+                f"Unable to create unique indexes: {', '.join(unique_failures)}"
+            )
+
+        return result
+
+    def has_duplicates(self, spec: IndexSpec) -> bool:
+        """Check whether documents share the keys of a unique index.
+
+        Args:
+            spec (IndexSpec): The declared unique index.
+
+        Returns:
+            bool: True if two documents the index covers have the same
+            keys.
+        """
+
+        return bool(
+            self._db_handler.aggregate_documents(
+                spec.collection,
+                [
+                    {"$match": spec.partial_filter or {}},
+                    {
+                        "$group": {
+                            # Positional names, as field paths can
+                            # contain dots.
+                            "_id": {
+                                f"key_{position}": f"${field}"
+                                for position, (field, _) in enumerate(
+                                    spec.keys
+                                )
+                            },
+                            "count": {"$sum": 1},
+                        }
+                    },
+                    {"$match": {"count": {"$gt": 1}}},
+                    {"$limit": 1},
+                ],
+            )
+        )
+
+    def _restore_index(self, collection: str, name: str, index: dict) -> None:
+        """Recreate a dropped index from its index information.
+
+        Args:
+            collection (str): The name of the collection.
+            name (str): The name of the index.
+            index (dict): The index information from before it was
+            dropped.
+        """
+
+        if self._db_handler.create_index(
+            collection,
+            _key(index),
+            name=name,
+            unique=bool(index.get("unique", False)),
+            partial_filter=index.get("partialFilterExpression"),
+        ):
+            log_warning(f"Restored index {collection}.{name}")
+        else:
+            log_error(
+                f"Unable to restore index {collection}.{name}",
+                "database_error",
+            )
+
+    def verify_query_plans(
+        self, queries: tuple[HotQuery, ...] = HOT_QUERIES
+    ) -> dict[str, bool]:
+        """Check with explain that the hot queries are served by indexes.
+
+        Args:
+            queries (tuple[HotQuery, ...]): The queries to check.
+
+        Returns:
+            dict[str, bool]: Whether each query avoids a collection
+            scan, keyed by query name.
+        """
+
+        results: dict[str, bool] = {}
+
+        for hot_query in queries:
+            explain: dict = self._db_handler.explain_query(
+                hot_query.collection, hot_query.query, hot_query.projection
+            )
+            stages: set[str] = _plan_stages(
+                explain.get("queryPlanner", {}).get("winningPlan", {})
+            )
+            results[hot_query.name] = bool(stages) and "COLLSCAN" not in stages
+
+            if not results[hot_query.name]:
+                log_warning(
+                    f"Query '{hot_query.name}' is not served by an index: "
+                    f"{sorted(stages)}"
+                )
+
+        return results
+
+
+def _key(index: dict) -> list[tuple[str, int]]:
+    """Get the key pattern of an index from its index information.
+
+    Args:
+        index (dict): The index information.
+
+    Returns:
+        list[tuple[str, int]]: The fields and directions of the index.
+    """
+
+    return [(field, int(direction)) for field, direction in index["key"]]
+
+
+def _matches(index: dict, spec: IndexSpec) -> bool:
+    """Check whether an existing index has the declared keys and options.
+
+    Args:
+        index (dict): The index information.
+        spec (IndexSpec): The declared index.
+
+    Returns:
+        bool: True if the index does not need rebuilding.
+    """
+
+    return (
+        _key(index) == list(spec.keys)
+        and bool(index.get("unique", False)) == spec.unique
+        and index.get("partialFilterExpression") == spec.partial_filter
+    )
+
+
+def _plan_stages(plan: Any) -> set[str]:
+    """Collect the stage names of a query plan.
+
+    Args:
+        plan (Any): The plan, or any part of it.
+
+    Returns:
+        set[str]: The names of every stage in the plan.
+    """
+
+    stages: set[str] = set()
+
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= _plan_stages(value)
+
+    elif isinstance(plan, list):
+        for value in plan:
+            stages |= _plan_stages(value)
+
+    return stages
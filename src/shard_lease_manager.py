@@ -0,0 +1,205 @@
+"""Splits the sync work into shards owned by workers through leases."""
+
+from datetime import datetime, timedelta
+from math import ceil
+from threading import Event, Lock, Thread
+from typing import Optional
+from zlib import crc32
+from logging_funcs import log_info, log_warning
+from mongodb_handler import MongoDbHandler
+
+LEASES_COLLECTION: str = "sync_leases"
+WORKERS_COLLECTION: str = "sync_workers"
+
+
+def shard_for_key(key: str, shard_count: int) -> int:
+    """Get the shard a key belongs to.
+
+    Uses a stable hash so every worker, in every process, agrees on the
+    shard of a key.
+
+    Args:
+        key (str): The key, e.g. a calendar ID.
+        shard_count (int): The total number of shards.
+
+    Returns:
+        int: The shard number.
+    """
+
+    return crc32(key.encode("utf-8")) % shard_count
+
+
+class ShardLeaseManager:
+    """Claims, renews and releases leases on sync shards.
+
+    Each shard has a lease document in the sync_leases collection naming
+    its owner and when the lease expires. Workers also register
+    themselves in the sync_workers collection, so each worker can work
+    out its fair share of the shards. Leases are renewed by a heartbeat
+    thread; if a worker dies its leases expire and the remaining workers
+    take its shards over.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+        worker_id (str): The unique ID of this worker.
+        shard_count (int): The total number of shards.
+        lease_seconds (int): How long a lease lasts without renewal.
+    """
+
+    def __init__(
+        self,
+        db_handler: MongoDbHandler,
+        worker_id: str,
+        shard_count: int = 16,
+        lease_seconds: int = 30,
+    ):
+        self._db_handler: MongoDbHandler = db_handler
+        self._worker_id: str = worker_id
+        self._shard_count: int = shard_count
+        self._lease_duration: timedelta = timedelta(seconds=lease_seconds)
+        self._owned_shards: dict[int, datetime] = {}
+        self._lock: Lock = Lock()
+        self._stop: Event = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        """Claim an initial set of shards and start the heartbeat thread."""
+
+        self.heartbeat()
+        self._thread = Thread(
+            target=self._heartbeat_loop, name="shard-heartbeat", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the heartbeat thread and release all held leases."""
+
+        self._stop.set()
+        self._db_handler.delete_documents(
+            LEASES_COLLECTION, {"owner": self._worker_id}
+        )
+        self._db_handler.delete_document(
+            WORKERS_COLLECTION, {"worker_id": self._worker_id}
+        )
+        with self._lock:
+            self._owned_shards = {}
+
+    def owns(self, key: str) -> bool:
+        """Check whether this worker currently holds the lease for a key.
+
+        Args:
+            key (str): The key, e.g. a calendar ID.
+
+        Returns:
+            bool: True if the key's shard is leased to this worker and
+            the lease has not expired.
+        """
+
+        shard: int = shard_for_key(key, self._shard_count)
+
+        with self._lock:
+            expires_at: Optional[datetime] = self._owned_shards.get(shard)
+
+        return expires_at is not None and expires_at > datetime.utcnow()
+
+    def heartbeat(self) -> set[int]:
+        """Renew held leases and rebalance shards between live workers.
+
+        Returns:
+            set[int]: The shards this worker holds after the heartbeat.
+        """
+
+        now: datetime = datetime.utcnow()
+        expires_at: datetime = now + self._lease_duration
+
+        self._db_handler.update_document(
+            WORKERS_COLLECTION,
+            {"worker_id": self._worker_id},
+            {"expires_at": expires_at},
+            upsert=True,
+        )
+        live_workers: int = max(
+            1,
+            self._db_handler.count_documents(
+                WORKERS_COLLECTION, {"expires_at": {"$gt": now}}
+            ),
+        )
+        fair_share: int = ceil(self._shard_count / live_workers)
+
+        leases: dict = {
+            lease["_id"]: lease
+            for lease in self._db_handler.get_documents(LEASES_COLLECTION, {})
+        }
+        held: list[int] = sorted(
+            shard
+            for shard, lease in leases.items()
+            if lease["owner"] == self._worker_id
+        )
+
+        # Give up shards above the fair share so new workers can take
+        # them.
+        for shard in held[fair_share:]:
+            self._db_handler.delete_document(
+                LEASES_COLLECTION, {"_id": shard, "owner": self._worker_id}
+            )
+        held = held[:fair_share]
+
+        free: list[int] = [
+            shard
+            for shard in range(self._shard_count)
+            if shard not in leases or leases[shard]["expires_at"] <= now
+        ]
+
+        owned_shards: dict[int, datetime] = {}
+        for shard in held + free:
+            if len(owned_shards) >= fair_share:
+                break
+            if self._claim(shard, now, expires_at):
+                owned_shards[shard] = expires_at
+
+        gained: set[int] = set(owned_shards) - set(self._owned_shards)
+        if gained:
+            log_info(
+                f"Worker {self._worker_id} claimed shards {sorted(gained)}"
+            )
+
+        with self._lock:
+            self._owned_shards = owned_shards
+
+        return set(owned_shards)
+
+    def _claim(self, shard: int, now: datetime, expires_at: datetime) -> bool:
+        """Claim or renew the lease on a shard.
+
+        Args:
+            shard (int): The shard number.
+            now (datetime): The current time.
+            expires_at (datetime): When the new lease expires.
+
+        Returns:
+            bool: True if this worker holds the lease.
+        """
+
+        lease: Optional[dict] = self._db_handler.claim_document(
+            LEASES_COLLECTION,
+            {
+                "_id": shard,
+                "$or": [
+                    {"owner": self._worker_id},
+                    {"expires_at": {"$lte": now}},
+                ],
+            },
+            {"owner": self._worker_id, "expires_at": expires_at},
+        )
+        return lease is not None
+
+    def _heartbeat_loop(self) -> None:
+        """Send heartbeats until stopped, three per lease period."""
+
+        interval: float = self._lease_duration.total_seconds() / 3
+
+        while not self._stop.wait(interval):
+            try:
+                self.heartbeat()
+            except Exception as error:  # pylint: disable=broad-except
+                log_warning(f"Shard heartbeat failed: {error}")
@@ -0,0 +1,147 @@
+"""Runs the stages of a sync cycle concurrently over bounded queues."""
+
+from dataclasses import dataclass
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+from typing import Any, Callable, Iterable, Iterator
+
+# How often, in seconds, blocked stages check whether the pipeline has
+# been stopped.
+_POLL_INTERVAL: float = 0.1
+
+_END_OF_STREAM: object = object()
+
+
+@dataclass
+class _StageFailure:
+    """Carries an exception raised in a stage down to the consumer."""
+
+    error: Exception
+
+
+def _put(queue: Queue, item: Any, stop: Event) -> bool:
+    """Put an item on a queue, giving up if the pipeline is stopped.
+
+    Args:
+        queue (Queue): The queue to put the item on.
+        item (Any): The item.
+        stop (Event): Set when the pipeline is stopped.
+
+    Returns:
+        bool: True if the item was queued.
+    """
+
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def _get(queue: Queue, stop: Event) -> Any:
+    """Get an item from a queue, giving up if the pipeline is stopped.
+
+    Args:
+        queue (Queue): The queue to get the item from.
+        stop (Event): Set when the pipeline is stopped.
+
+    Returns:
+        Any: The item, or the end of stream marker if stopped.
+    """
+
+    while not stop.is_set():
+        try:
+            return queue.get(timeout=_POLL_INTERVAL)
+        except Empty:
+            continue
+    return _END_OF_STREAM
+
+
+def _feed(source: Iterable, output: Queue, stop: Event) -> None:
+    """Feed the items of a source into the first queue of the pipeline."""
+
+    try:
+        for item in source:
+            if not _put(output, item, stop):
+                return
+        _put(output, _END_OF_STREAM, stop)
+
+    except Exception as error:  # pylint: disable=broad-except
+        _put(output, _StageFailure(error), stop)
+
+
+def _transform(
+    stage: Callable[[Any], Any], inputs: Queue, output: Queue, stop: Event
+) -> None:
+    """Apply a stage to each item of one queue and pass it to the next."""
+
+    while True:
+        item: Any = _get(inputs, stop)
+
+        if item is _END_OF_STREAM or isinstance(item, _StageFailure):
+            _put(output, item, stop)
+            return
+
+        try:
+            result: Any = stage(item)
+        except Exception as error:  # pylint: disable=broad-except
+            _put(output, _StageFailure(error), stop)
+            return
+
+        if not _put(output, result, stop):
+            return
+
+
+def run_pipeline(
+    source: Iterable, stages: list[Callable[[Any], Any]], depth: int = 2
+) -> Iterator:
+    """Run a source and a chain of stages, each in its own thread.
+
+    Every stage works on the next item while the stages after it work on
+    earlier ones. The queues between stages hold at most depth items, so
+    memory stays bounded however large the source is. An exception in
+    any stage is raised from the returned iterator.
+
+    Args:
+        source (Iterable): The items to feed into the first stage.
+        stages (list[Callable[[Any], Any]]): The stages, in order.
+        depth (int): The number of items each queue can hold.
+
+    Returns:
+        Iterator: The output of the last stage, in source order.
+    """
+
+    stop: Event = Event()
+    queues: list[Queue] = [
+        Queue(maxsize=depth) for _ in range(len(stages) + 1)
+    ]
+    threads: list[Thread] = [
+        Thread(target=_feed, args=(source, queues[0], stop), daemon=True)
+    ]
+    for index, stage in enumerate(stages):
+        threads.append(
+            Thread(
+                target=_transform,
+                args=(stage, queues[index], queues[index + 1], stop),
+                daemon=True,
+            )
+        )
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item: Any = queues[-1].get()
+
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, _StageFailure):
+                raise item.error
+
+            yield item
+
+    finally:
+        stop.set()
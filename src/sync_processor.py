@@ -1,11 +1,52 @@
 """Syncs the board and calendar."""
 
-from time import sleep
+from collections import defaultdict
+from datetime import datetime, timedelta
+from time import monotonic, sleep, time
+from typing import Iterator, Optional
+from calendar_etag_index import CalendarETagIndex
 from config import Config, get_config
-from exceptions import SyncError
+from cycle_tracer import CycleTracer
+from event_mirror import MIRROR_PROFILE, mirror_merge, mirror_update
+from exceptions import SyncError, SyncTokenExpiredError
 from factorys import calendar_handler_factory, db_handler_factory
-from google_calendar_handler import GoogleCalendarHandler
+from google_calendar_handler import GoogleCalendarHandler, is_retryable
+from googleapiclient.errors import HttpError
+from logging_funcs import log_warning
+from metrics import (
+    SYNC_CYCLE_DRIFTED_EVENTS,
+    SYNC_CYCLE_SECONDS,
+    SYNC_DRIFTED_EVENTS,
+)
 from mongodb_handler import MongoDbHandler
+from shard_lease_manager import ShardLeaseManager
+from sync_pipeline import run_pipeline
+from sync_request_queue import SyncRequestQueue
+from sync_scheduler import SyncScheduler
+from sync_state import (
+    IN_CALENDAR_QUERY,
+    SYNC_STATE_PROJECTION,
+    SYNCED_FIELDS,
+    is_clean,
+    mark_dirty,
+    mark_synced,
+)
+
+# The fields of a calendar_events document that a sync cycle reads.
+SYNC_PROJECTION: dict = {
+    "_id": 0,
+    "event_id": 1,
+    "calendar_id": 1,
+    "current_status": 1,
+    **SYNC_STATE_PROJECTION,
+}
+
+# The fields the scheduler also needs to work out when events are due.
+SCHEDULE_PROJECTION: dict = {
+    **SYNC_PROJECTION,
+    "start_datetime": 1,
+    "end_datetime": 1,
+}
 
 
 class SyncProcessor:
@@ -15,61 +56,729 @@ class SyncProcessor:
         self,
         calendar_handler: GoogleCalendarHandler,
         db_handler: MongoDbHandler,
+        incremental: bool = True,
+        resync_windows: int = 4,
+        db_batch_size: int = 500,
+        pipeline_depth: int = 2,
+        lease_manager: Optional[ShardLeaseManager] = None,
+        scheduler: Optional[SyncScheduler] = None,
+        cycle_budget: Optional[float] = None,
+        request_queue: Optional[SyncRequestQueue] = None,
+        request_poll_interval: float = 1.0,
+        tracer: Optional[CycleTracer] = None,
+        max_sync_attempts: int = 5,
     ):
         self._calendar_handler: GoogleCalendarHandler = calendar_handler
         self._db_handler: MongoDbHandler = db_handler
         self._config: Config = get_config()
+        self._incremental: bool = incremental
+        self._resync_windows: int = resync_windows
+        self._db_batch_size: int = db_batch_size
+        self._pipeline_depth: int = pipeline_depth
+        self._lease_manager: Optional[ShardLeaseManager] = lease_manager
+        self._scheduler: Optional[SyncScheduler] = scheduler
+        self._cycle_budget: Optional[float] = cycle_budget
+        self._request_queue: Optional[SyncRequestQueue] = request_queue
+        self._request_poll_interval: float = request_poll_interval
+        self._etag_index: CalendarETagIndex = CalendarETagIndex(
+            calendar_handler, db_handler
+        )
+        self._cycle_drifted: int = 0
+        self._tracer: CycleTracer = tracer or CycleTracer()
+        self._max_sync_attempts: int = max_sync_attempts
 
     def sync(self, sync_interval: int = 60) -> None:
         """Syncs the board and calendar at regular intervals.
 
+        A cycle that runs longer than the interval is followed straight
+        away by the next one instead of the two overlapping.
+
         Args:
             sync_interval (int): The interval in seconds between syncs.
         """
 
         while True:
-            self.sync_events()
-            sleep(sync_interval)
+            started: float = monotonic()
 
-    def sync_events(
-        self,
-    ):
-        """Syncs the calendar with the board events"""
+            try:
+                self.sync_events(
+                    deadline=started + (self._cycle_budget or sync_interval)
+                )
+            except SyncError as error:
+                log_warning(error.message)
 
-        events: dict = self._db_handler.get_all_documents("calendar_events")
+            elapsed: float = monotonic() - started
+            SYNC_CYCLE_SECONDS.observe(elapsed)
+            SYNC_CYCLE_DRIFTED_EVENTS.observe(self._cycle_drifted)
 
-        if not events:
-            raise SyncError("No events found")
+            if elapsed < sync_interval:
+                self.wait_for_sync_requests(sync_interval - elapsed)
+            else:
+                log_warning(
+                    f"Sync cycle took {elapsed:.1f}s, longer than the "
+                    f"{sync_interval}s sync interval"
+                )
+
+    def sync_events(self, deadline: Optional[float] = None) -> None:
+        """Syncs the calendar with the board events
+
+        Incremental syncs only read the changed events of each calendar.
+        Otherwise every event is checked, or, with a scheduler, only the
+        events that are due. The scheduler is opt-in and is not used by
+        incremental syncs.
+
+        Args:
+            deadline (Optional[float]): The monotonic time by which the
+            cycle should stop starting new work.
+        """
+
+        self._cycle_drifted = 0
+
+        with self._tracer.cycle("sync_cycle"):
+            if self._incremental:
+                self.sync_events_incremental(deadline)
+                return
+
+            self._etag_index.start_cycle()
+            if self._scheduler is not None:
+                self.sync_due_events(deadline)
+            else:
+                self.sync_all_events()
+
+    def wait_for_sync_requests(self, timeout: float) -> None:
+        """Waits for the next cycle, syncing requested calendars meanwhile.
+
+        Calendars with a pending targeted sync request, e.g. from a
+        calendar push notification, are synced as soon as the request is
+        seen instead of waiting for the next cycle.
+
+        Args:
+            timeout (float): How long to wait in seconds.
+        """
+
+        if not self._request_queue:
+            sleep(timeout)
+            return
+
+        wait_until: float = monotonic() + timeout
+
+        while (remaining := wait_until - monotonic()) > 0:
+            try:
+                self.sync_requested_calendars()
+            except SyncError as error:
+                log_warning(error.message)
+
+            sleep(min(self._request_poll_interval, max(0.0, remaining)))
 
-        calendar_events: dict = self.get_calendar_events(events)
+    def sync_requested_calendars(self) -> None:
+        """Syncs the owned calendars that have a pending sync request."""
 
-        if not calendar_events:
+        calendar_ids: list = self.get_owned_calendar_ids()
+        if not calendar_ids:
+            return
+
+        requested_ids: list = self._request_queue.claim_requests(calendar_ids)
+        if not requested_ids:
+            return
+
+        with self._tracer.cycle("requested_sync"):
+            for calendar_id in requested_ids:
+                self.sync_calendar(calendar_id)
+
+    def sync_all_events(self) -> None:
+        """Checks every board event against the calendar.
+
+        Only the events with local changes since their last sync, or
+        whose calendar event's ETag has changed, are fetched and compared.
+        """
+
+        query: Optional[dict] = self.get_owned_events_query()
+        if query is None:
+            return
+
+        if not self._db_handler.count_documents("calendar_events", query):
             raise SyncError("No events found")
 
-        events_to_sync: list = self.compare_events(calendar_events, events)
+        for events, calendar_events in run_pipeline(
+            self.traced_batches(
+                self._db_handler.iter_documents(
+                    "calendar_events",
+                    query,
+                    SYNC_PROJECTION,
+                    batch_size=self._db_batch_size,
+                )
+            ),
+            [self.drop_clean_events, self.fetch_calendar_events],
+            depth=self._pipeline_depth,
+        ):
+            self.check_events(calendar_events, events)
 
-        if events_to_sync:
-            self.sync_up_events(events_to_sync)
+    def sync_due_events(self, deadline: Optional[float] = None) -> None:
+        """Checks the events the scheduler says are due.
+
+        Events are checked most overdue first, in chunks, until none are
+        due or the cycle's time budget runs out. Anything left over is
+        still due at the start of the next cycle.
+
+        Args:
+            deadline (Optional[float]): The monotonic time by which the
+            cycle should stop starting new chunks.
+        """
+
+        query: Optional[dict] = self.get_owned_events_query()
+        if query is None:
+            return
+
+        # The events are fed to the scheduler as they are read, so only
+        # one batch is held on top of the scheduler's own entries.
+        self._scheduler.refresh(
+            (
+                event
+                for events in self.traced_batches(
+                    self._db_handler.iter_documents(
+                        "calendar_events",
+                        query,
+                        SCHEDULE_PROJECTION,
+                        batch_size=self._db_batch_size,
+                    )
+                )
+                for event in events
+            ),
+            time(),
+        )
+
+        while deadline is None or monotonic() < deadline:
+            due_events: list[dict] = self._scheduler.pop_due(
+                time(), self._db_batch_size
+            )
+            if not due_events:
+                return
+
+            unclean_events: list[dict] = self.drop_clean_events(due_events)
+            events, calendar_events = self.fetch_calendar_events(
+                unclean_events
+            )
+            events_to_sync: list = self.check_events(calendar_events, events)
+
+            # Events that failed to fetch keep their provisional due time,
+            # so they are retried soon.
+            failed_ids: set = {
+                event["event_id"] for event in unclean_events
+            } - {event["event_id"] for event in events}
+            drifted_ids: set = {event["event_id"] for event in events_to_sync}
+            checked_at: float = time()
+            for event in due_events:
+                if event["event_id"] in failed_ids:
+                    continue
+                self._scheduler.reschedule(
+                    event["event_id"],
+                    event["event_id"] in drifted_ids,
+                    checked_at,
+                )
+
+        log_warning("Sync cycle time budget used up, due events deferred")
+
+    def traced_batches(
+        self, batches: Iterator[list[dict]]
+    ) -> Iterator[list[dict]]:
+        """Yields batches of board events, tracing each database read.
+
+        Args:
+            batches (Iterator[list[dict]]): The batches read lazily from
+            the database.
+
+        Yields:
+            list[dict]: The batches.
+        """
+
+        while True:
+            with self._tracer.span("db_fetch") as span:
+                events: Optional[list[dict]] = next(batches, None)
+                span["events"] = len(events or [])
+
+            if events is None:
+                return
+            yield events
+
+    def get_owned_events_query(self) -> Optional[dict]:
+        """Gets the query selecting the board events this processor owns.
+
+        Events still waiting in the outbox are not in the calendar yet,
+        so they are left out.
+
+        Returns:
+            Optional[dict]: The query, None if no calendars are owned.
+        """
+
+        if not self._lease_manager:
+            return dict(IN_CALENDAR_QUERY)
+
+        owned_calendar_ids: list = self.get_owned_calendar_ids()
+
+        if not owned_calendar_ids:
+            return None
+
+        return {
+            **IN_CALENDAR_QUERY,
+            "calendar_id": {"$in": owned_calendar_ids},
+        }
+
+    def drop_clean_events(self, events: list[dict]) -> list[dict]:
+        """Drops the board events that are known to be in sync.
+
+        An event is clean when it has no local change since its last
+        sync and its calendar event's ETag is the one recorded then. If
+        a calendar's ETags cannot be listed, all its events are kept.
+
+        Args:
+            events (list[dict]): The board events.
+
+        Returns:
+            list[dict]: The board events that need checking.
+        """
+
+        with self._tracer.span("etag_check", events=len(events)) as span:
+            unclean_events: list[dict] = self._drop_clean_events(events)
+            span["unclean"] = len(unclean_events)
+
+        return unclean_events
+
+    def _drop_clean_events(self, events: list[dict]) -> list[dict]:
+        """Drops the board events whose calendar ETags are unchanged.
+
+        Args:
+            events (list[dict]): The board events.
+
+        Returns:
+            list[dict]: The board events that need checking.
+        """
+
+        remote_etags: dict[str, dict] = {}
+        unclean_events: list[dict] = []
+
+        for event in events:
+            calendar_id: str = event.get("calendar_id", "primary")
+
+            if calendar_id not in remote_etags:
+                try:
+                    remote_etags[calendar_id] = self._etag_index.get_etags(
+                        calendar_id
+                    )
+                except HttpError as error:
+                    log_warning(
+                        f"Unable to list the ETags of calendar {calendar_id}: "
+                        f"{error}"
+                    )
+                    remote_etags[calendar_id] = {}
+
+            if not is_clean(
+                event, remote_etags[calendar_id].get(event["event_id"])
+            ):
+                unclean_events.append(event)
+
+        return unclean_events
+
+    def fetch_calendar_events(
+        self, events: list[dict]
+    ) -> tuple[list[dict], dict]:
+        """Fetches the calendar events for a chunk of board events.
+
+        Events that could not be fetched are dropped from the chunk, so
+        they are retried next cycle rather than being treated as missing
+        from the calendar.
+
+        Args:
+            events (list[dict]): The board events.
+
+        Returns:
+            tuple[list[dict], dict]: The board events that were fetched
+            and the calendar events.
+        """
+
+        with self._tracer.span("calendar_fetch", events=len(events)) as span:
+            response_bytes: int = self.response_bytes()
+            calendar_events: dict = self.get_calendar_events(events)
+            failed_requests: dict = (
+                self._calendar_handler.pop_failed_requests()
+            )
+            span.update(
+                fetched=len(calendar_events),
+                failed=len(failed_requests),
+                response_bytes=self.response_bytes() - response_bytes,
+            )
+
+        if failed_requests:
+            log_warning(
+                f"Failed to fetch {len(failed_requests)} calendar events"
+            )
+            events = [
+                event
+                for event in events
+                if event["event_id"] not in failed_requests
+                or not is_retryable(failed_requests[event["event_id"]])
+            ]
+
+        return events, calendar_events
+
+    def response_bytes(self) -> int:
+        """Gets the size of the calendar responses received so far.
+
+        The difference across a phase is the size of its responses, plus
+        those of any phase running at the same time in the pipeline.
+
+        Returns:
+            int: The total decoded size of the responses in bytes.
+        """
+
+        return sum(
+            stats["bytes"]
+            for stats in self._calendar_handler.payload_stats().values()
+        )
+
+    def sync_events_incremental(
+        self, deadline: Optional[float] = None
+    ) -> None:
+        """Syncs only the calendar events that changed since the last sync.
+
+        The sync token for each calendar is stored in the sync_tokens
+        collection, so a cycle with no changes costs one list call per
+        calendar. Calendars are synced least recently synced first, so
+        those skipped when the time budget runs out go first next cycle.
+
+        Args:
+            deadline (Optional[float]): The monotonic time by which the
+            cycle should stop starting new calendars.
+        """
+
+        with self._tracer.span("db_fetch") as span:
+            calendar_ids: list = self.get_owned_calendar_ids()
+            last_synced: dict = {
+                token["calendar_id"]: token["updated_at"]
+                for token in self._db_handler.get_documents(
+                    "sync_tokens",
+                    {"calendar_id": {"$in": calendar_ids}},
+                    {"_id": 0, "calendar_id": 1, "updated_at": 1},
+                )
+            }
+            span["calendars"] = len(calendar_ids)
+        calendar_ids.sort(
+            key=lambda calendar_id: last_synced.get(calendar_id, datetime.min)
+        )
+
+        for index, calendar_id in enumerate(calendar_ids):
+            if deadline is not None and monotonic() >= deadline:
+                log_warning(
+                    "Sync cycle time budget used up, "
+                    f"{len(calendar_ids) - index} calendars deferred"
+                )
+                return
+
+            self.sync_calendar(calendar_id)
+
+    def get_owned_calendar_ids(self) -> list:
+        """Gets the IDs of the calendars this processor should sync.
+
+        Without a lease manager every calendar is owned; with one, only
+        the calendars in the shards this worker holds leases on.
+
+        Returns:
+            list: The calendar IDs.
+        """
+
+        calendar_ids: list = self._db_handler.get_distinct_values(
+            "calendar_events", "calendar_id"
+        )
+
+        if not self._lease_manager:
+            return calendar_ids
+
+        return [
+            calendar_id
+            for calendar_id in calendar_ids
+            if self._lease_manager.owns(calendar_id)
+        ]
+
+    def sync_calendar(self, calendar_id: str) -> None:
+        """Syncs the changed events of a single calendar.
+
+        Falls back to a full resync if the calendar has no sync token or
+        its token has expired. The changed events are requested with the
+        mirror's fields and stored in the event mirror.
+
+        Args:
+            calendar_id (str): The ID of the calendar to sync.
+        """
+
+        with self._tracer.span("sync_calendar", calendar_id=calendar_id):
+            self._sync_calendar(calendar_id)
+
+    def _sync_calendar(self, calendar_id: str) -> None:
+        """Syncs the changed events of a single calendar, in traced phases.
+
+        Args:
+            calendar_id (str): The ID of the calendar to sync.
+        """
+
+        with self._tracer.span("db_fetch", collection="sync_tokens"):
+            token_document: Optional[dict] = self._db_handler.get_document(
+                "sync_tokens", {"calendar_id": calendar_id}
+            )
+        changed_events: Optional[list] = None
+        dirty_calendar_events: dict = {}
+
+        if token_document:
+            try:
+                with self._tracer.span("calendar_fetch") as span:
+                    response_bytes: int = self.response_bytes()
+                    changed_events, sync_token = (
+                        self._calendar_handler.list_changed_events(
+                            token_document["sync_token"],
+                            calendar_id,
+                            MIRROR_PROFILE,
+                        )
+                    )
+                    span.update(
+                        changed=len(changed_events),
+                        response_bytes=self.response_bytes() - response_bytes,
+                    )
+
+                with self._tracer.span("db_fetch") as span:
+                    events: list = self._db_handler.get_documents(
+                        "calendar_events",
+                        {
+                            "event_id": {
+                                "$in": [e["id"] for e in changed_events]
+                            }
+                        },
+                        SYNC_PROJECTION,
+                    )
+                    dirty_events: list = self._db_handler.get_documents(
+                        "calendar_events",
+                        {
+                            **IN_CALENDAR_QUERY,
+                            "calendar_id": calendar_id,
+                            "dirty": True,
+                            "event_id": {
+                                **IN_CALENDAR_QUERY["event_id"],
+                                "$nin": [e["id"] for e in changed_events],
+                            },
+                        },
+                        SYNC_PROJECTION,
+                    )
+                    span.update(events=len(events), dirty=len(dirty_events))
+
+                dirty_events, dirty_calendar_events = (
+                    self.fetch_calendar_events(dirty_events)
+                )
+                events.extend(dirty_events)
+            except SyncTokenExpiredError:
+                changed_events = None
+
+        if changed_events is None:
+            with self._tracer.span("db_fetch") as span:
+                # The full resync needs the events' times for its range.
+                events = self._db_handler.get_documents(
+                    "calendar_events",
+                    {**IN_CALENDAR_QUERY, "calendar_id": calendar_id},
+                    SCHEDULE_PROJECTION,
+                )
+                span["events"] = len(events)
+
+            with self._tracer.span("calendar_fetch", full_resync=True) as span:
+                response_bytes = self.response_bytes()
+                changed_events, sync_token = self.full_resync(
+                    calendar_id, events
+                )
+                span.update(
+                    changed=len(changed_events),
+                    response_bytes=self.response_bytes() - response_bytes,
+                )
+
+        calendar_events: dict = {
+            event["id"]: event
+            for event in changed_events
+            if event.get("status") != "cancelled"
+        }
+        calendar_events.update(dirty_calendar_events)
+        self.check_events(calendar_events, events)
+
+        with self._tracer.span("db_write", events=len(changed_events)):
+            self.update_mirror(changed_events)
+            self._db_handler.update_document(
+                "sync_tokens",
+                {"calendar_id": calendar_id},
+                {"sync_token": sync_token, "updated_at": datetime.utcnow()},
+                upsert=True,
+            )
+
+    def full_resync(
+        self, calendar_id: str, events: list[dict]
+    ) -> tuple[list, str]:
+        """Fetches every tracked event in a calendar and a new sync token.
+
+        The time range covers all the tracked events and is split into
+        windows that are fetched in parallel.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+            events (list[dict]): The tracked events in the calendar.
+
+        Returns:
+            tuple[list, str]: The calendar events and the new sync token.
+        """
+
+        if not events:
+            return [], self._calendar_handler.get_sync_token(calendar_id)
+
+        time_min: datetime = min(
+            event["start_datetime"] for event in events
+        ) - timedelta(days=1)
+        time_max: datetime = max(
+            event["end_datetime"] for event in events
+        ) + timedelta(days=1)
+
+        return self._calendar_handler.full_resync(
+            time_min,
+            time_max,
+            calendar_id,
+            self._resync_windows,
+            MIRROR_PROFILE,
+        )
+
+    def update_mirror(self, calendar_events: list) -> None:
+        """Stores changed calendar events in the event mirror.
+
+        Cancelled events are stored too, so reads of them see that they
+        were cancelled.
+
+        Args:
+            calendar_events (list): The changed calendar events, as
+            listed with the mirror's fields.
+        """
+
+        self._db_handler.bulk_update_documents(
+            "calendar_events",
+            [
+                mirror_update({"event_id": event["id"]}, event)
+                for event in calendar_events
+            ],
+        )
 
     def get_calendar_events(self, events: list[dict]) -> dict:
         """Gets the events from the calendar.
 
+        The fetched events also refresh their mirrored bodies, including
+        those cancelled, so the mirror does not depend on the incremental
+        sync to stay current.
+
         Returns:
-            dict: The calendar events.
+            dict: The calendar events, without the cancelled ones.
         """
 
-        event_ids: list = [event["event_id"] for event in events]
+        event_ids_by_calendar: dict[str, list] = defaultdict(list)
+        for event in events:
+            event_ids_by_calendar[event.get("calendar_id", "primary")].append(
+                event["event_id"]
+            )
+
+        calendar_events: dict = {}
+        for calendar_id, event_ids in event_ids_by_calendar.items():
+            calendar_events.update(
+                self._calendar_handler.get_events_by_ids(
+                    event_ids, calendar_id
+                )
+            )
 
-        calendar_events: dict = self._calendar_handler.get_events_by_ids(
-            event_ids
+        mirror_updates: list[tuple[dict, dict]] = self.mirror_merges(
+            calendar_events
         )
-        return calendar_events
+        if mirror_updates:
+            with self._tracer.span("db_write", events=len(mirror_updates)):
+                self._db_handler.bulk_update_documents(
+                    "calendar_events", mirror_updates
+                )
+
+        return {
+            event_id: calendar_event
+            for event_id, calendar_event in calendar_events.items()
+            if calendar_event.get("status") != "cancelled"
+        }
+
+    def mirror_merges(self, calendar_events: dict) -> list[tuple[dict, dict]]:
+        """Builds the updates refreshing the mirror from fetched events.
+
+        Args:
+            calendar_events (dict): The calendar events, as requested
+            with the sync's fields, keyed by event ID.
+
+        Returns:
+            list[tuple[dict, dict]]: The updates of the mirrored bodies.
+        """
+
+        return [
+            update
+            for event_id, calendar_event in calendar_events.items()
+            if (update := mirror_merge({"event_id": event_id}, calendar_event))
+        ]
+
+    def check_events(self, calendar_events: dict, events: list[dict]) -> list:
+        """Compares the events, syncing up those that have drifted.
+
+        The events found in sync are recorded as synced, with their
+        calendar event's ETag, so later cycles can skip them. The events
+        missing from the calendar are recorded as missing, as patching
+        them can only fail.
+
+        Args:
+            calendar_events (dict): The calendar events.
+            events (list[dict]): The board events.
+
+        Returns:
+            list: The events that were out of sync.
+        """
+
+        events_to_sync: list = self.compare_events(calendar_events, events)
+        missing_events: list[dict] = [
+            event
+            for event in events
+            if event["event_id"] not in calendar_events
+        ]
+
+        if missing_events:
+            self.record_missing_events(missing_events)
+
+        if events_to_sync:
+            self.sync_up_events(events_to_sync)
+            SYNC_DRIFTED_EVENTS.inc(len(events_to_sync))
+            self._cycle_drifted += len(events_to_sync)
+            self._tracer.count("drifted_events", len(events_to_sync))
+
+        drifted_ids: set = {event["event_id"] for event in events_to_sync}
+        updates: list[tuple[dict, dict]] = [
+            mark_synced(event, calendar_events[event["event_id"]].get("etag"))
+            for event in events
+            if event["event_id"] in calendar_events
+            and event["event_id"] not in drifted_ids
+            and not is_clean(
+                event, calendar_events[event["event_id"]].get("etag")
+            )
+        ]
+        if updates:
+            with self._tracer.span("db_write", events=len(updates)):
+                self._db_handler.bulk_update_documents(
+                    "calendar_events", updates
+                )
+
+        return events_to_sync
 
     def compare_events(
         self, calendar_events: dict, events: list[dict]
     ) -> list:
         """Compares the events to check if they are in sync.
 
+        Events missing from the calendar are not synced, as there is no
+        event to update.
+
         Args:
             calendar_events (dict): The calendar events.
             events (list[dict]): The board events.
@@ -79,25 +788,147 @@ class SyncProcessor:
         """
 
         events_to_sync: list = []
+        missing: int = 0
 
-        for event in events:
-            event_id: str = event["event_id"]
+        with self._tracer.span("compare", events=len(events)) as span:
+            for event in events:
+                event_id: str = event["event_id"]
 
-            if event_id not in calendar_events:
-                events_to_sync.append(event)
-            else:
-                if not self._config.get_status_colour_id(
-                    event["current_status"]
-                ) == int(calendar_events[event_id]["colorId"]):
+                if event_id not in calendar_events:
+                    missing += 1
+                elif str(
+                    self._config.get_status_colour_id(event["current_status"])
+                ) != str(calendar_events[event_id].get("colorId")):
                     events_to_sync.append(event)
-                    print("Event out of sync")
-                else:
-                    print("Event in sync")
+
+            span.update(
+                in_sync=len(events) - len(events_to_sync) - missing,
+                out_of_sync=len(events_to_sync),
+                missing=missing,
+            )
 
         return events_to_sync
 
+    def record_missing_events(self, missing_events: list[dict]) -> None:
+        """Records the board events whose calendar events are missing.
+
+        The calendar events have been deleted, cancelled or cannot be
+        found, so the board events are left out of later syncs rather
+        than retried every cycle. They are synced again if their calendar
+        event comes back in an incremental sync.
+
+        Args:
+            missing_events (list[dict]): The board events.
+        """
+
+        missing_since: datetime = datetime.utcnow()
+
+        with self._tracer.span("db_write", events=len(missing_events)):
+            self._db_handler.bulk_update_documents(
+                "calendar_events",
+                [
+                    (
+                        {"event_id": event["event_id"]},
+                        {
+                            "dirty": False,
+                            "missing_since": missing_since,
+                            "last_sync_error": "Not found in the calendar",
+                        },
+                    )
+                    for event in missing_events
+                ],
+            )
+
+        log_warning(
+            f"{len(missing_events)} events are missing from the calendar"
+        )
+
     def sync_up_events(self, events_to_sync: list):
-        """Syncs up the out of sync board and calendar events."""
+        """Syncs up the out of sync board and calendar events.
+
+        The colors of all the events are patched with batched requests
+        and the outcome of each update is recorded with one bulk write.
+
+        Args:
+            events_to_sync (list): The out of sync board events.
+        """
+
+        colour_ids: dict = {
+            event["event_id"]: self._config.get_status_colour_id(
+                event["current_status"]
+            )
+            for event in events_to_sync
+        }
+        with self._tracer.span("sync_up", events=len(events_to_sync)) as span:
+            updated_events, failed_updates = (
+                self._calendar_handler.patch_event_colors(
+                    [
+                        (
+                            event["event_id"],
+                            colour_ids[event["event_id"]],
+                            event.get("calendar_id", "primary"),
+                        )
+                        for event in events_to_sync
+                    ]
+                )
+            )
+            span.update(
+                updated=len(updated_events), failed=len(failed_updates)
+            )
+
+        events_by_id: dict = {
+            event["event_id"]: event for event in events_to_sync
+        }
+        synced_at: datetime = datetime.utcnow()
+        updates: list[tuple[dict, dict]] = []
+
+        for event_id, calendar_event in updated_events.items():
+            query, synced_values = mark_synced(
+                events_by_id[event_id], calendar_event.get("etag")
+            )
+            updates.append(
+                (
+                    query,
+                    {
+                        **synced_values,
+                        "synced_colour_id": colour_ids[event_id],
+                        "last_synced_at": synced_at,
+                        "last_sync_error": None,
+                    },
+                )
+            )
+
+        # Failed events are marked dirty so the next cycle retries them,
+        # including incremental cycles, which only sweep dirty events,
+        # until they run out of attempts. The query matches the synced
+        # fields as they were read, so a local write made meanwhile is
+        # not overwritten.
+        for event_id, error in failed_updates.items():
+            synced_fields: dict = {
+                field_name: events_by_id[event_id].get(field_name)
+                for field_name in SYNCED_FIELDS
+            }
+            attempts: int = events_by_id[event_id].get("sync_attempts", 0) + 1
+            values: dict = {
+                **mark_dirty(synced_fields),
+                "sync_attempts": attempts,
+                "last_sync_error": str(error),
+                "last_synced_at": synced_at,
+            }
+            if attempts >= self._max_sync_attempts:
+                values.update(dirty=False, sync_failed_at=synced_at)
+            updates.append(({"event_id": event_id, **synced_fields}, values))
+        # The patched events' new colours go into their mirrored bodies.
+        updates.extend(self.mirror_merges(updated_events))
+
+        with self._tracer.span("db_write", events=len(updates)):
+            self._db_handler.bulk_update_documents("calendar_events", updates)
+
+        if failed_updates:
+            log_warning(
+                f"Failed to sync {len(failed_updates)} of "
+                f"{len(events_to_sync)} out of sync events"
+            )
 
 
 if __name__ == "__main__":
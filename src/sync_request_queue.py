@@ -0,0 +1,69 @@
+"""Queue of targeted sync requests shared by the API and sync workers."""
+
+from datetime import datetime
+from mongodb_handler import MongoDbHandler
+
+SYNC_REQUESTS_COLLECTION: str = "sync_requests"
+
+
+class SyncRequestQueue:
+    """Queue of calendars waiting for a targeted incremental sync.
+
+    There is at most one request per calendar, so a burst of
+    notifications for a calendar results in a single sync.
+
+    Args:
+        db_handler (MongoDbHandler): The database handler.
+    """
+
+    def __init__(self, db_handler: MongoDbHandler):
+        self._db_handler: MongoDbHandler = db_handler
+
+    def request_sync(self, calendar_id: str) -> bool:
+        """Ask for a calendar to be synced.
+
+        Args:
+            calendar_id (str): The ID of the calendar.
+
+        Returns:
+            bool: True if the request was queued.
+        """
+
+        return self._db_handler.update_document(
+            SYNC_REQUESTS_COLLECTION,
+            {"calendar_id": calendar_id},
+            {"requested_at": datetime.utcnow()},
+            upsert=True,
+        )
+
+    def claim_requests(self, calendar_ids: list) -> list:
+        """Take the pending requests for some calendars off the queue.
+
+        A request made after it was read is left on the queue, so a
+        change notified during a sync is picked up by the next one.
+
+        Args:
+            calendar_ids (list): The IDs of the calendars to claim
+            requests for.
+
+        Returns:
+            list: The IDs of the calendars to sync.
+        """
+
+        requests: list = self._db_handler.get_documents(
+            SYNC_REQUESTS_COLLECTION,
+            {"calendar_id": {"$in": calendar_ids}},
+            {"_id": 0, "calendar_id": 1, "requested_at": 1},
+        )
+
+        return [
+            request["calendar_id"]
+            for request in requests
+            if self._db_handler.delete_document(
+                SYNC_REQUESTS_COLLECTION,
+                {
+                    "calendar_id": request["calendar_id"],
+                    "requested_at": request["requested_at"],
+                },
+            )
+        ]
@@ -0,0 +1,208 @@
+"""Schedules when each event should next be checked for drift."""
+
+from dataclasses import dataclass
+from datetime import datetime
+from heapq import heappop, heappush
+from typing import Iterable, Optional
+
+# Check intervals in seconds, by how far away an event's start is.
+_INTERVALS_BY_LEAD_TIME: list[tuple[float, float]] = [
+    (60 * 60, 60),
+    (24 * 60 * 60, 5 * 60),
+    (7 * 24 * 60 * 60, 30 * 60),
+]
+_DISTANT_INTERVAL: float = 3 * 60 * 60
+_PAST_INTERVAL: float = 6 * 60 * 60
+
+
+@dataclass
+class ScheduledEvent:
+    """An event tracked by the scheduler."""
+
+    event: dict
+    due_at: float
+    drift_score: float = 0.0
+    version: int = 0
+
+
+class SyncScheduler:
+    """Keeps a priority queue of events keyed by when they are next due.
+
+    Events starting soon are checked often and events months away
+    rarely. Events that keep drifting are checked more often, and the
+    extra attention fades again once they stay in sync.
+
+    Args:
+        min_interval (float): The shortest time in seconds between two
+        checks of the same event.
+    """
+
+    def __init__(self, min_interval: float = 60):
+        self._min_interval: float = min_interval
+        self._events: dict[str, ScheduledEvent] = {}
+        self._queue: list[tuple[float, int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def refresh(self, events: Iterable[dict], now: float) -> None:
+        """Bring the tracked events in line with the database.
+
+        New events are due immediately, known events keep their due time
+        and events that are no longer in the database are dropped. The
+        events are consumed one at a time, so they can be streamed from
+        the database.
+
+        Args:
+            events (Iterable[dict]): All the events that should be tracked.
+            now (float): The current time as a UNIX timestamp.
+        """
+
+        current_ids: set = set()
+
+        for event in events:
+            event_id: str = event["event_id"]
+            current_ids.add(event_id)
+
+            if event_id in self._events:
+                self._events[event_id].event = event
+            else:
+                self._events[event_id] = ScheduledEvent(event, now)
+                self._push(event_id)
+
+        for event_id in set(self._events) - current_ids:
+            del self._events[event_id]
+
+    def pop_due(self, now: float, limit: int) -> list[dict]:
+        """Take the events that are due, most overdue first.
+
+        Args:
+            now (float): The current time as a UNIX timestamp.
+            limit (int): The maximum number of events to take.
+
+        Returns:
+            list[dict]: The due events. They are provisionally due again
+            after the minimum interval, in case the check never completes,
+            until reschedule is called for them.
+        """
+
+        due_events: list[dict] = []
+
+        while self._queue and len(due_events) < limit:
+            due_at, version, event_id = self._queue[0]
+
+            if due_at > now:
+                break
+
+            heappop(self._queue)
+            scheduled: Optional[ScheduledEvent] = self._events.get(event_id)
+
+            # Skip entries for dropped or already rescheduled events.
+            if scheduled is None or scheduled.version != version:
+                continue
+
+            due_events.append(scheduled.event)
+            scheduled.due_at = now + self._min_interval
+            self._push(event_id)
+
+        return due_events
+
+    def reschedule(self, event_id: str, drifted: bool, now: float) -> None:
+        """Schedule the next check of an event after it has been checked.
+
+        Args:
+            event_id (str): The ID of the event.
+            drifted (bool): Whether the event was out of sync.
+            now (float): The current time as a UNIX timestamp.
+        """
+
+        scheduled: Optional[ScheduledEvent] = self._events.get(event_id)
+
+        if scheduled is None:
+            return
+
+        scheduled.drift_score = scheduled.drift_score / 2 + (
+            1.0 if drifted else 0.0
+        )
+        scheduled.due_at = now + self.interval_for(scheduled, now)
+        self._push(event_id)
+
+    def next_due_at(self) -> Optional[float]:
+        """Get when the next event is due.
+
+        Returns:
+            Optional[float]: The due time as a UNIX timestamp, None if no
+            events are scheduled.
+        """
+
+        while self._queue:
+            due_at, version, event_id = self._queue[0]
+            scheduled: Optional[ScheduledEvent] = self._events.get(event_id)
+
+            if scheduled is not None and scheduled.version == version:
+                return due_at
+
+            heappop(self._queue)
+
+        return None
+
+    def interval_for(self, scheduled: ScheduledEvent, now: float) -> float:
+        """Work out how long to wait before checking an event again.
+
+        Args:
+            scheduled (ScheduledEvent): The scheduled event.
+            now (float): The current time as a UNIX timestamp.
+
+        Returns:
+            float: The interval in seconds.
+        """
+
+        start: Optional[datetime] = scheduled.event.get("start_datetime")
+        end: Optional[datetime] = scheduled.event.get("end_datetime")
+
+        if start is None:
+            interval: float = _DISTANT_INTERVAL
+        elif end is not None and _timestamp(end) < now:
+            interval = _PAST_INTERVAL
+        else:
+            lead_time: float = _timestamp(start) - now
+            interval = next(
+                (
+                    lead_interval
+                    for max_lead_time, lead_interval in _INTERVALS_BY_LEAD_TIME
+                    if lead_time < max_lead_time
+                ),
+                _DISTANT_INTERVAL,
+            )
+
+        interval /= 1 + 2 * scheduled.drift_score
+        return max(self._min_interval, interval)
+
+    def _push(self, event_id: str) -> None:
+        """Add an event to the queue at its due time.
+
+        Any earlier queue entry for the event becomes stale and is
+        skipped when it reaches the front of the queue.
+
+        Args:
+            event_id (str): The ID of the event.
+        """
+
+        scheduled: ScheduledEvent = self._events[event_id]
+        scheduled.version += 1
+        heappush(self._queue, (scheduled.due_at, scheduled.version, event_id))
+
+
+def _timestamp(value: datetime) -> float:
+    """Convert a datetime to a UNIX timestamp, treating naive ones as UTC.
+
+    Args:
+        value (datetime): The datetime.
+
+    Returns:
+        float: The UNIX timestamp.
+    """
+
+    if value.tzinfo is None:
+        return (value - datetime(1970, 1, 1)).total_seconds()
+    return value.timestamp()
@@ -0,0 +1,123 @@
+"""Tracks which calendar_events documents have unsynced local changes."""
+
+from hashlib import sha1
+from json import dumps as json_dumps
+
+# The document fields that are pushed to the calendar by the sync.
+SYNCED_FIELDS: tuple = ("current_status",)
+
+# Selects the documents whose event has been added to the calendar and
+# is still worth syncing. Events still waiting in the outbox have no
+# event ID yet, and events that are missing from the calendar, or that
+# failed to sync too many times, are left alone until they change.
+IN_CALENDAR_QUERY: dict = {
+    "event_id": {"$type": "string"},
+    "missing_since": None,
+    "sync_failed_at": None,
+}
+
+# The fields of a document that the sync needs to tell whether it is
+# clean.
+SYNC_STATE_PROJECTION: dict = {
+    "dirty": 1,
+    "local_hash": 1,
+    "synced_hash": 1,
+    "etag": 1,
+    "sync_attempts": 1,
+}
+
+
+def content_hash(event: dict) -> str:
+    """Hash the synced fields of an event document.
+
+    Args:
+        event (dict): The event document, or the values being written to
+        it, including every synced field.
+
+    Returns:
+        str: The hash.
+    """
+
+    return sha1(
+        json_dumps(
+            [event.get(field_name) for field_name in SYNCED_FIELDS],
+            default=str,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def mark_dirty(values: dict) -> dict:
+    """Add the sync state of a local write to the values being written.
+
+    A local write gives an event that failed to sync a fresh set of
+    attempts.
+
+    Args:
+        values (dict): The values being written, including every synced
+        field.
+
+    Returns:
+        dict: The values with the new local hash and the dirty flag.
+    """
+
+    return {
+        **values,
+        "local_hash": content_hash(values),
+        "dirty": True,
+        "sync_attempts": 0,
+        "sync_failed_at": None,
+    }
+
+
+def mark_synced(event: dict, etag: str) -> tuple[dict, dict]:
+    """Build the update that records an event as in sync.
+
+    The query matches the synced fields as they were read, so a local
+    write made while the event was being synced leaves it dirty. An
+    event that was missing from the calendar and has come back is
+    synced again from then on.
+
+    Args:
+        event (dict): The event document as it was read.
+        etag (str): The calendar event's ETag after the sync.
+
+    Returns:
+        tuple[dict, dict]: The query and the values to set.
+    """
+
+    local_hash: str = content_hash(event)
+    query: dict = {"event_id": event["event_id"]}
+    query.update(
+        {field_name: event.get(field_name) for field_name in SYNCED_FIELDS}
+    )
+
+    return query, {
+        "local_hash": local_hash,
+        "synced_hash": local_hash,
+        "dirty": False,
+        "etag": etag,
+        "sync_attempts": 0,
+        "sync_failed_at": None,
+        "missing_since": None,
+    }
+
+
+def is_clean(event: dict, remote_etag: str) -> bool:
+    """Check whether an event is known to be in sync without fetching it.
+
+    Args:
+        event (dict): The event document.
+        remote_etag (str): The calendar event's current ETag.
+
+    Returns:
+        bool: True if there is no local change since the last sync and
+        the calendar event has not changed either.
+    """
+
+    return (
+        not event.get("dirty", False)
+        and event.get("local_hash") is not None
+        and event["local_hash"] == event.get("synced_hash")
+        and remote_etag is not None
+        and event.get("etag") == remote_etag
+    )
@@ -0,0 +1,162 @@
+"""A lean JSON client for the Trello REST API."""
+
+from time import sleep
+from typing import Optional
+from exceptions import BoardApiError
+from rate_limiter import RateLimiter, bucket_key
+from requests import RequestException, Response, Session
+
+TRELLO_API_URL: str = "https://api.trello.com/1"
+
+# The rate limits Trello applies, as (requests, window in seconds).
+TRELLO_RATE_LIMITS: dict[str, tuple[int, float]] = {
+    "trello_token": (100, 10.0),
+    "trello_key": (300, 10.0),
+}
+
+TOO_MANY_REQUESTS: int = 429
+
+
+def retry_after(response: Response, attempt: int) -> float:
+    """Work out how long to back off after a rate limited response.
+
+    Args:
+        response (Response): The rate limited response.
+        attempt (int): The number of the failed attempt, from 0.
+
+    Returns:
+        float: The Retry-After header's delay, or an exponential backoff
+        if there is none.
+    """
+
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return float(min(2**attempt, 30))
+
+
+class TrelloApiClient:
+    """Sends authenticated requests to the Trello REST API.
+
+    Requests share one session, so connections are kept alive between
+    calls, and responses are returned as plain JSON. With a rate limiter,
+    every request waits for both the token's and the API key's bucket,
+    and a 429 blocks the token's bucket for its Retry-After time before
+    the request is retried.
+
+    Args:
+        api_key (str): The API key for the Trello API.
+        token (str): The token for the Trello API.
+        timeout (float): The request timeout in seconds.
+        rate_limiter (Optional[RateLimiter]): The shared rate limiter.
+        max_retries (int): How many times to retry a rate limited
+        request.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        token: str,
+        timeout: float = 30.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = 3,
+    ):
+        self._auth: dict[str, str] = {"key": api_key, "token": token}
+        self._token_key: str = bucket_key(token)
+        self._api_key_key: str = bucket_key(api_key)
+        self._timeout: float = timeout
+        self._rate_limiter: Optional[RateLimiter] = rate_limiter
+        self._max_retries: int = max_retries
+        self._session: Session = Session()
+        self._session.headers["Accept"] = "application/json"
+
+    def get(self, path: str, params: Optional[dict] = None) -> dict | list:
+        """Send a GET request.
+
+        Args:
+            path (str): The path relative to the API URL.
+            params (Optional[dict]): The query parameters.
+
+        Returns:
+            dict | list: The response body.
+        """
+
+        return self.request("GET", path, params)
+
+    def put(self, path: str, params: Optional[dict] = None) -> dict | list:
+        """Send a PUT request.
+
+        Args:
+            path (str): The path relative to the API URL.
+            params (Optional[dict]): The query parameters.
+
+        Returns:
+            dict | list: The response body.
+        """
+
+        return self.request("PUT", path, params)
+
+    def request(
+        self, method: str, path: str, params: Optional[dict] = None
+    ) -> dict | list:
+        """Send a request and decode its JSON response.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path relative to the API URL.
+            params (Optional[dict]): The query parameters.
+
+        Returns:
+            dict | list: The response body.
+
+        Raises:
+            BoardApiError: If the request fails or returns an error
+            status.
+        """
+
+        url: str = f"{TRELLO_API_URL}{path}"
+        attempt: int = 0
+
+        while True:
+            if self._rate_limiter:
+                self._rate_limiter.acquire("trello_token", self._token_key)
+                self._rate_limiter.acquire("trello_key", self._api_key_key)
+
+            try:
+                response: Response = self._session.request(
+                    method,
+                    url,
+                    params={**(params or {}), **self._auth},
+                    timeout=self._timeout,
+                )
+            except RequestException as error:
+                raise BoardApiError(
+                    f"Request to {path} failed: {error}"
+                ) from error
+
+            if (
+                response.status_code != TOO_MANY_REQUESTS
+                or attempt >= self._max_retries
+            ):
+                break
+
+            delay: float = retry_after(response, attempt)
+            if self._rate_limiter:
+                self._rate_limiter.block(
+                    "trello_token", self._token_key, delay
+                )
+            else:
+                sleep(delay)
+            attempt += 1
+
+        if response.status_code != 200:
+            raise BoardApiError(
+                f"{response.text} at {path}", response.status_code
+            )
+
+        return response.json()
+
+    def close(self) -> None:
+        """Close the session's connections."""
+
+        self._session.close()
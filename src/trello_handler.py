@@ -3,78 +3,17 @@ This module contains the TrelloHandler class, which is responsible
 for all interactions with the Trello API.
 """
 
-from json import dumps as json_dumps
-import trello
+from typing import Optional
 from board_handler import BoardHandler
-from data_models import Board, BoardCard, BoardList
-from trello import Board as TrelloBoard
-from trello import Card as TrelloCard
-from trello import List as TrelloList
-from trello import TrelloClient
-
-
-def patched_fetch_json(
-    self,
-    uri_path,
-    http_method="GET",
-    headers=None,
-    query_params=None,
-    post_args=None,
-    files=None,
-):
-    """Fetch some JSON from Trello"""
-
-    # explicit values here to avoid mutable default values
-    if headers is None:
-        headers = {}
-    if query_params is None:
-        query_params = {}
-    if post_args is None:
-        post_args = {}
-
-    # if files specified, we don't want any data
-    data = None
-    if files is None and post_args != {}:
-        data = json_dumps(post_args)
-
-    # set content type and accept headers to handle JSON
-    if http_method in ("POST", "PUT", "DELETE") and not files:
-        headers["Content-Type"] = "application/json; charset=utf-8"
-
-    headers["Accept"] = "application/json"
-
-    # construct the full URL without query parameters
-    if uri_path[0] == "/":
-        uri_path = uri_path[1:]
-    url = "https://api.trello.com/1/%s" % uri_path
-
-    if self.oauth is None:
-        query_params["key"] = self.api_key
-        query_params["token"] = self.api_secret
-
-    # perform the HTTP requests, if possible uses OAuth authentication
-    response = self.http_service.request(
-        http_method,
-        url,
-        params=query_params,
-        headers=headers,
-        data=data,
-        auth=self.oauth,
-        files=files,
-        proxies=self.proxies,
-    )
-
-    if response.status_code == 401:
-        raise trello.Unauthorized("%s at %s" % (response.text, url), response)
-    if response.status_code != 200:
-        raise trello.ResourceUnavailable(
-            "%s at %s" % (response.text, url), response
-        )
-
-    return response.json()
+from data_models import Board, BoardCard, BoardList, BoardSnapshot
+from rate_limiter import RateLimiter
+from trello_api_client import TrelloApiClient
 
-
-trello.TrelloClient.fetch_json = patched_fetch_json
+# The fields requested for each kind of object, so responses only carry
+# what the data models use.
+BOARD_FIELDS: str = "id,name,closed"
+LIST_FIELDS: str = "id,name,closed"
+CARD_FIELDS: str = "id,name,desc,idList,idBoard"
 
 
 class TrelloHandler(BoardHandler):
@@ -82,15 +21,21 @@ class TrelloHandler(BoardHandler):
 
     Args:
         api_key: The API key for the Trello API.
-        api_secret: The API secret for the Trello API.
         token: The token for the Trello API.
+        rate_limiter: The rate limiter shared with the other processes
+        using the same key and token.
     """
 
-    def __init__(self, api_key: str, api_secret: str, token: str):
-        self.client = TrelloClient(
+    def __init__(
+        self,
+        api_key: str,
+        token: str,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.client: TrelloApiClient = TrelloApiClient(
             api_key=api_key,
-            api_secret=api_secret,
             token=token,
+            rate_limiter=rate_limiter,
         )
 
     def get_cards_in_list(
@@ -108,14 +53,14 @@ class TrelloHandler(BoardHandler):
             A list of all cards in the list.
         """
 
-        board: TrelloBoard = self.client.get_board(board_id)
-        target_list: TrelloList = board.get_list(list_id)
-        trello_cards = target_list.list_cards()
+        trello_cards: list = self.client.get(
+            f"/lists/{list_id}/cards", {"fields": CARD_FIELDS}
+        )
         return [
             BoardCard(
-                id=card.id,
-                name=card.name,
-                desc=card.desc,
+                id=card["id"],
+                name=card["name"],
+                desc=card["desc"],
                 list_id=list_id,
                 board_id=board_id,
             )
@@ -128,12 +73,14 @@ class TrelloHandler(BoardHandler):
         Returns:
             A list of all boards accessible to the user.
         """
-        trello_boards = self.client.list_boards()
+        trello_boards: list = self.client.get(
+            "/members/me/boards", {"fields": BOARD_FIELDS}
+        )
         return [
             Board(
-                id=board.id,
-                name=board.name,
-                closed=board.closed,
+                id=board["id"],
+                name=board["name"],
+                closed=board["closed"],
             )
             for board in trello_boards
         ]
@@ -148,21 +95,66 @@ class TrelloHandler(BoardHandler):
             A list of all lists on the board.
         """
 
-        board: TrelloBoard = self.client.get_board(board_id)
-        trello_lists = board.list_lists()
+        trello_lists: list = self.client.get(
+            f"/boards/{board_id}/lists",
+            {"filter": "all", "fields": LIST_FIELDS},
+        )
         return [
             BoardList(
-                id=list.id,
-                name=list.name,
-                closed=list.closed,
+                id=trello_list["id"],
+                name=trello_list["name"],
+                closed=trello_list["closed"],
                 board_id=board_id,
             )
-            for list in trello_lists
+            for trello_list in trello_lists
         ]
 
+    def get_board_snapshot(self, board_id: str) -> BoardSnapshot:
+        """Gets a board with its open lists and cards in one request.
+
+        Args:
+            board_id: The ID of the board.
+
+        Returns:
+            The board, its open lists and its open cards.
+        """
+
+        trello_board: dict = self.client.get(
+            f"/boards/{board_id}",
+            {
+                "fields": BOARD_FIELDS,
+                "lists": "open",
+                "list_fields": LIST_FIELDS,
+                "cards": "open",
+                "card_fields": CARD_FIELDS,
+            },
+        )
+        return BoardSnapshot(
+            board=Board(
+                id=trello_board["id"],
+                name=trello_board["name"],
+                closed=trello_board["closed"],
+            ),
+            lists=[
+                BoardList(
+                    id=trello_list["id"],
+                    name=trello_list["name"],
+                    closed=trello_list["closed"],
+                    board_id=board_id,
+                )
+                for trello_list in trello_board.get("lists", [])
+            ],
+            cards=[
+                self._to_board_card(card)
+                for card in trello_board.get("cards", [])
+            ],
+        )
+
     def update_card_list(self, card_id: str, new_list_id: str) -> BoardCard:
         """Moves a card to a different list (column).
 
+        The move is a single request, which returns the updated card.
+
         Args:
             card_id: The ID of the card to move.
             new_list_id: The ID of the list to move the card to.
@@ -170,16 +162,11 @@ class TrelloHandler(BoardHandler):
         Returns:
             The updated card.
         """
-        card: TrelloCard = self.client.get_card(card_id)
-        new_list: TrelloList = self.client.get_list(new_list_id)
-        card.change_list(new_list.id)
-        return BoardCard(
-            id=card.id,
-            name=card.name,
-            desc=card.desc,
-            list_id=new_list.id,
-            board_id=card.idBoard,
+        card: dict = self.client.put(
+            f"/cards/{card_id}",
+            {"idList": new_list_id, "fields": CARD_FIELDS},
         )
+        return self._to_board_card(card)
 
     def get_card(self, card_id: str) -> BoardCard:
         """Gets a card by its ID.
@@ -190,11 +177,25 @@ class TrelloHandler(BoardHandler):
         Returns:
             The card with the given ID.
         """
-        card: TrelloCard = self.client.get_card(card_id)
+        card: dict = self.client.get(
+            f"/cards/{card_id}", {"fields": CARD_FIELDS}
+        )
+        return self._to_board_card(card)
+
+    @staticmethod
+    def _to_board_card(card: dict) -> BoardCard:
+        """Converts a Trello card to a board card.
+
+        Args:
+            card: The card as returned by the API.
+
+        Returns:
+            The board card.
+        """
         return BoardCard(
-            id=card.id,
-            name=card.name,
-            desc=card.desc,
-            list_id=card.idList,
-            board_id=card.idBoard,
+            id=card["id"],
+            name=card["name"],
+            desc=card["desc"],
+            list_id=card["idList"],
+            board_id=card["idBoard"],
         )
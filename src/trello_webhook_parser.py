@@ -0,0 +1,41 @@
+"""Extracts the fields the service uses from Trello webhook payloads."""
+
+from json import JSONDecodeError
+from json import loads as json_loads
+from typing import Optional
+from data_models import BoardAction
+
+
+def parse_board_action(body: bytes) -> Optional[BoardAction]:
+    """Parse a Trello webhook payload into a board action.
+
+    Trello sends the whole board model with every action, so the payload
+    is only decoded, never validated or copied, and just the action type,
+    board, card and destination list are read from it.
+
+    Args:
+        body (bytes): The raw request body.
+
+    Returns:
+        Optional[BoardAction]: The action, None if the body is not a
+        valid webhook payload.
+    """
+
+    try:
+        action: dict = json_loads(body)["action"]
+        action_type: str = action["type"]
+    except (JSONDecodeError, UnicodeDecodeError, KeyError, TypeError):
+        return None
+
+    data: dict = action.get("data") or {}
+    board: dict = data.get("board") or {}
+    card: dict = data.get("card") or {}
+    list_after: dict = data.get("listAfter") or {}
+
+    return BoardAction(
+        action_type=action_type,
+        board_id=board.get("id"),
+        card_id=card.get("id"),
+        list_after_id=list_after.get("id"),
+        list_after_name=list_after.get("name"),
+    )
@@ -0,0 +1,103 @@
+"""A bounded, time limited cache for rarely changing API reads."""
+
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """A least recently used cache whose entries also expire.
+
+    Entries are evicted when they are older than the time to live or
+    when the cache is full, least recently used first. Invalidating an
+    entry while it is being loaded stops the stale value from being
+    stored.
+
+    Args:
+        max_entries (int): The most entries to keep.
+        ttl (float): How long an entry is served for, in seconds.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 300.0):
+        self._max_entries: int = max_entries
+        self._ttl: float = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._generation: int = 0
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+        self._lock: Lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """Get an entry, loading and storing it if missing or expired.
+
+        Args:
+            key (Hashable): The key of the entry.
+            load (Callable[[], Any]): Loads the value on a miss.
+
+        Returns:
+            Any: The value.
+        """
+
+        now: float = monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+
+            self._misses += 1
+            generation: int = self._generation
+
+        value: Any = load()
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (now + self._ttl, value)
+                self._entries.move_to_end(key)
+
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove an entry.
+
+        Args:
+            key (Hashable): The key of the entry.
+        """
+
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Get the size and hit counters of the cache.
+
+        Returns:
+            dict: The number of entries, hits, misses and evictions.
+        """
+
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
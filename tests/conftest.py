@@ -0,0 +1,6 @@
+"""Makes the service's modules importable from the tests."""
+
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,66 @@
+"""Checks the declared indexes against a test MongoDB server.
+
+The server is read from TEST_DB_HOST and TEST_DB_PORT, and the tests are
+skipped if it cannot be reached. Each test uses a database of its own,
+which is dropped afterwards.
+"""
+
+from os import environ
+from typing import Iterator
+from uuid import uuid4
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from exceptions import SchemaError
+from mongodb_handler import MongoDbHandler
+from schema_manager import HOT_QUERIES, INDEXES, SchemaManager
+
+TEST_DB_HOST: str = environ.get("TEST_DB_HOST", "localhost")
+TEST_DB_PORT: int = int(environ.get("TEST_DB_PORT", "27017"))
+
+
+@pytest.fixture(name="db_handler")
+def fixture_db_handler() -> Iterator[MongoDbHandler]:
+    """Connect to a fresh database on the test server."""
+
+    try:
+        MongoClient(
+            TEST_DB_HOST, TEST_DB_PORT, serverSelectionTimeoutMS=1000
+        ).admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"No MongoDB server at {TEST_DB_HOST}:{TEST_DB_PORT}")
+
+    db_name: str = f"test_{uuid4().hex}"
+    db_handler: MongoDbHandler = MongoDbHandler(
+        TEST_DB_HOST, TEST_DB_PORT, db_name
+    )
+    yield db_handler
+    db_handler.client.drop_database(db_name)
+    db_handler.close()
+
+
+def test_hot_queries_use_indexes(db_handler: MongoDbHandler) -> None:
+    """Every hot query is served by a declared index."""
+
+    schema_manager: SchemaManager = SchemaManager(db_handler)
+    schema_manager.reconcile()
+
+    results: dict[str, bool] = schema_manager.verify_query_plans()
+
+    assert set(results) == {hot_query.name for hot_query in HOT_QUERIES}
+    assert all(results.values()), results
+
+
+def test_unique_rebuild_keeps_index_on_duplicates(
+    db_handler: MongoDbHandler,
+) -> None:
+    """A unique index that cannot be built leaves the old index in place."""
+
+    db_handler.create_index("calendar_events", [("card_id", 1)])
+    for card_id in ("card", "card"):
+        db_handler.add_document("calendar_events", {"card_id": card_id})
+
+    with pytest.raises(SchemaError):
+        SchemaManager(db_handler, INDEXES[:1]).reconcile()
+
+    assert "card_id_1" in db_handler.get_indexes("calendar_events")